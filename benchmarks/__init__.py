@@ -0,0 +1,3 @@
+# benchmarks/__init__.py
+# 性能基准测试，在项目根目录下运行，例如：
+#   python -m benchmarks.bench_codecs
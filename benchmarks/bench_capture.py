@@ -0,0 +1,59 @@
+import argparse
+import time
+import tracemalloc
+import numpy as np
+from server.capture import CAPTURE_BACKENDS, create_capture_backend
+
+# 屏幕捕获后端基准测试：帧率与每帧内存分配
+# 无显示器环境下 mss/imagegrab 会被跳过，fake 后端总是可以运行
+# 每帧分配量包括 mss 为原始 BGRA 数据分配的缓冲区，ring allocs 只统计轮换缓冲区
+
+
+def bench_backend(name: str, frames: int, width: int, height: int):
+    kwargs = {'width': width, 'height': height} if name == 'fake' else {}
+    backend = create_capture_backend(name, buffers=4, **kwargs)
+    try:
+        backend.grab()  # 预热：打开会话、分配缓冲区
+        start = time.perf_counter()
+        for _ in range(frames):
+            backend.grab()
+        fps = frames / (time.perf_counter() - start)
+
+        # 统计每帧的内存分配（numpy 数组分配会被 tracemalloc 记录）
+        tracemalloc.start()
+        allocated = 0
+        large_allocations = 0
+        for _ in range(frames):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            frame = backend.grab()
+            _, peak = tracemalloc.get_traced_memory()
+            allocated += peak - before
+            if peak - before >= frame.nbytes // 2:
+                large_allocations += 1
+            del frame
+        tracemalloc.stop()
+        return fps, allocated / frames, large_allocations / frames, backend.allocations
+    finally:
+        backend.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="屏幕捕获后端基准测试")
+    parser.add_argument('--frames', type=int, default=100)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    args = parser.parse_args()
+
+    print(f"{'backend':<10} {'fps':>8} {'alloc KB/frame':>15} {'frame allocs/frame':>19} {'ring allocs':>12}")
+    for name in CAPTURE_BACKENDS:
+        try:
+            fps, alloc, large, ring = bench_backend(name, args.frames, args.width, args.height)
+        except Exception as e:
+            print(f"{name:<10} 跳过: {e}")
+            continue
+        print(f"{name:<10} {fps:>8.1f} {alloc / 1024:>15.1f} {large:>19.2f} {ring:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+import argparse
+import pickle
+import time
+import zlib
+from typing import Callable, Tuple
+from common.codecs import available_codecs, create_codec
+from .synthetic import FRAME_GENERATORS
+
+
+def _time(func: Callable, repeat: int) -> Tuple[float, object]:
+    result = None
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="编解码器基准测试：编码/解码耗时与数据量")
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--quality', type=int, default=75)
+    parser.add_argument('--level', type=int, default=1)
+    args = parser.parse_args()
+
+    print(f"{'frame':<8} {'codec':<16} {'encode ms':>10} {'decode ms':>10} {'bytes':>12} {'ratio':>8}")
+    for frame_name, generator in FRAME_GENERATORS.items():
+        frame = generator(args.width, args.height)
+        raw_size = frame.nbytes
+
+        # 原有传输方式：pickle + zlib(6)
+        enc, data = _time(lambda: zlib.compress(pickle.dumps({'image': frame}), 6), args.repeat)
+        dec, _ = _time(lambda: pickle.loads(zlib.decompress(data)), args.repeat)
+        print(f"{frame_name:<8} {'pickle+zlib6':<16} {enc * 1000:>10.2f} {dec * 1000:>10.2f} "
+              f"{len(data):>12} {raw_size / len(data):>8.1f}")
+
+        for name in available_codecs():
+            codec = create_codec(name, args.level)
+            enc, data = _time(lambda: codec.encode(frame, args.quality), args.repeat)
+            dec, _ = _time(lambda: codec.decode(data), args.repeat)
+            print(f"{frame_name:<8} {name:<16} {enc * 1000:>10.2f} {dec * 1000:>10.2f} "
+                  f"{len(data):>12} {raw_size / len(data):>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+import argparse
+import json
+import platform
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+
+# 端到端基准测试：在本机运行服务器和客户端，对每种工作负载测量帧率、捕获到显示的延迟、每帧字节数、
+# 各阶段耗时和 CPU 占用。结果可以保存为 JSON 基线，之后的运行与基线比较，指标变差超过容差时以非零状态退出。
+#   python -m benchmarks.bench_end_to_end --save benchmarks/baselines/end_to_end.json
+#   python -m benchmarks.bench_end_to_end --compare benchmarks/baselines/end_to_end.json
+from .harness import WORKLOADS, run_workload
+
+# 比较的指标：(名称, 读取函数, 越大越好, 允许变差的比例)
+CHECKS: List[Tuple[str, Any, bool, float]] = [
+    ('fps', lambda r: r['fps'], True, 0.15),
+    ('latency p99', lambda r: r['latency_ms']['p99'], False, 0.30),
+    ('bytes/frame', lambda r: r['bytes_per_frame'], False, 0.10),
+    ('cpu', lambda r: r['cpu_percent'].get('process', 0.0), False, 0.30),
+]
+
+
+def compare(baseline: Dict[str, Any], results: Dict[str, Any]) -> List[str]:
+    """返回超过容差的退化项"""
+    regressions = []
+    for name, result in results.items():
+        base = baseline.get('workloads', {}).get(name)
+        if not base:
+            continue
+        for metric, read, higher_is_better, tolerance in CHECKS:
+            old, new = read(base), read(result)
+            if not old:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            if worse > tolerance:
+                regressions.append(f"{name}: {metric} {old} -> {new} ({change:+.0%}，容差 {tolerance:.0%})")
+    return regressions
+
+
+def print_results(results: Dict[str, Any]) -> None:
+    print(f"{'workload':<10} {'fps':>6} {'p50 ms':>7} {'p99 ms':>7} {'KB/frame':>9} {'kbps':>8} {'cpu %':>6}  stages p50/p99 ms")
+    for name, result in results.items():
+        stages = ' '.join(f"{stage}={times['p50']:.1f}/{times['p99']:.1f}"
+                          for stage, times in result['stages_ms'].items())
+        print(f"{name:<10} {result['fps']:>6.1f} {result['latency_ms']['p50']:>7.1f} {result['latency_ms']['p99']:>7.1f} "
+              f"{result['bytes_per_frame'] / 1024:>9.1f} {result['bandwidth_kbps']:>8.0f} "
+              f"{result['cpu_percent'].get('process', 0):>6.0f}  {stages}")
+        threads = ', '.join(f"{group}={value:.0f}%" for group, value in result['cpu_percent'].items()
+                            if group != 'process')
+        print(f"{'':<10} cpu by thread: {threads}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="服务器 + 客户端端到端基准测试（本机回环，合成画面）")
+    parser.add_argument('--workloads', nargs='+', default=list(WORKLOADS), choices=list(WORKLOADS))
+    parser.add_argument('--duration', type=float, default=5.0, help="每种工作负载的测量时间（秒）")
+    parser.add_argument('--warmup', type=float, default=1.0, help="测量前的预热时间（秒），跳过第一个关键帧")
+    parser.add_argument('--codec', default='zlib')
+    parser.add_argument('--interval', type=float, default=1 / 30, help="服务器捕获间隔（秒）")
+    parser.add_argument('--save', help="把结果保存为 JSON 基线")
+    parser.add_argument('--compare', help="与 JSON 基线比较，有指标退化时以状态 1 退出")
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {}
+    for name in args.workloads:
+        results[name] = run_workload(WORKLOADS[name](), args.duration, args.warmup, args.codec,
+                                     server_options={'screen_capture_interval': args.interval})
+    print_results(results)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({
+                'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+                'machine': {'platform': platform.platform(), 'python': platform.python_version(),
+                            'processor': platform.processor() or platform.machine()},
+                'config': {'duration': args.duration, 'warmup': args.warmup, 'codec': args.codec,
+                           'interval': args.interval},
+                'workloads': results,
+            }, f, indent=2, ensure_ascii=False)
+        print(f"基线已保存: {args.save}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results)
+        for line in regressions:
+            print(f"退化: {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"与基线 {args.compare} 相比没有超过容差的退化")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+import argparse
+import socket
+import threading
+import time
+from common.protocol import MESSAGE_HEADER, MSG_FRAME, FrameReader, pack_message, recv_exact
+
+# 帧接收吞吐量基准测试：通过本地 socketpair 比较原有的 bytes 拼接循环、recv_exact 和 FrameReader
+
+FRAME_SIZES = {
+    '1080p': 1920 * 1080 * 3,
+    '4k': 3840 * 2160 * 3,
+}
+
+
+def read_concat(sock: socket.socket, buffer_size: int):
+    """原有的接收循环：每次 recv 最多 buffer_size 字节并拼接到 bytes"""
+    data_length, msg_type = MESSAGE_HEADER.unpack(recv_exact(sock, MESSAGE_HEADER.size))
+    img_data = b''
+    while len(img_data) < data_length:
+        chunk = sock.recv(min(buffer_size, data_length - len(img_data)))
+        if not chunk:
+            raise ConnectionError("连接已断开")
+        img_data += chunk
+    return msg_type, img_data
+
+
+def read_exact(sock: socket.socket, buffer_size: int):
+    """recv_exact：bytearray 追加后再复制为 bytes"""
+    data_length, msg_type = MESSAGE_HEADER.unpack(recv_exact(sock, MESSAGE_HEADER.size))
+    return msg_type, recv_exact(sock, data_length)
+
+
+def _sender(sock: socket.socket, message: bytes, stop: threading.Event):
+    try:
+        while not stop.is_set():
+            sock.sendall(message)
+    except OSError:
+        pass
+
+
+def run(readers, size: int, duration: float, buffer_size: int):
+    """持续发送 size 字节的帧，接收端至少读取一帧并持续 duration 秒，返回 (帧数, MB/s)"""
+    sender_sock, receiver_sock = socket.socketpair()
+    stop = threading.Event()
+    message = pack_message(MSG_FRAME, bytes(size))
+    thread = threading.Thread(target=_sender, args=(sender_sock, message, stop), daemon=True)
+    thread.start()
+    read = readers(receiver_sock, buffer_size)
+    frames = 0
+    start = time.perf_counter()
+    try:
+        while True:
+            _, payload = read()
+            assert len(payload) == size
+            frames += 1
+            elapsed = time.perf_counter() - start
+            if elapsed >= duration:
+                break
+    finally:
+        stop.set()
+        receiver_sock.close()
+        thread.join(timeout=5)
+        sender_sock.close()
+    return frames, frames * size / elapsed / 1024 / 1024
+
+
+READERS = {
+    'concat': lambda sock, buffer_size: lambda: read_concat(sock, buffer_size),
+    'recv_exact': lambda sock, buffer_size: lambda: read_exact(sock, buffer_size),
+    'FrameReader': lambda sock, buffer_size: FrameReader(sock, buffers=2, initial_size=buffer_size).read,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="帧接收吞吐量（本地 socketpair）")
+    parser.add_argument('--duration', type=float, default=2.0, help="每项测试的最短时长（秒）")
+    parser.add_argument('--buffer-size', type=int, default=4096, help="原有循环的 recv 大小 / FrameReader 初始缓冲区大小")
+    args = parser.parse_args()
+
+    print(f"{'frame':<8} {'reader':<12} {'frames':>7} {'MB/s':>10}")
+    for frame_name, size in FRAME_SIZES.items():
+        for reader_name, readers in READERS.items():
+            frames, throughput = run(readers, size, args.duration, args.buffer_size)
+            print(f"{frame_name:<8} {reader_name:<12} {frames:>7} {throughput:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
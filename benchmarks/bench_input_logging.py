@@ -0,0 +1,82 @@
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+# handle_input 吞吐量基准测试：原有的逐事件同步日志 vs 队列日志 + 事件计数
+# pyautogui 和 pynput 替换为空实现，只测量事件分发和日志本身的开销
+from .stubs import install_input_stubs
+
+install_input_stubs()
+from server import utils  # noqa: E402
+from common import logs  # noqa: E402
+
+
+def sample_events(count: int):
+    """模拟拖动：以鼠标移动为主，夹杂按下/释放"""
+    events = []
+    for i in range(count):
+        if i % 100 == 0:
+            events.append({'type': 'mouse', 'action': 'press', 'x': i % 1920, 'y': i % 1080, 'button': 'left'})
+        elif i % 100 == 99:
+            events.append({'type': 'mouse', 'action': 'release', 'x': i % 1920, 'y': i % 1080, 'button': 'left'})
+        else:
+            events.append({'type': 'mouse', 'action': 'move', 'x': i % 1920, 'y': i % 1080})
+    return events
+
+
+def legacy_handle_input(event, client_screen=None):
+    """原有实现：每个事件两条 info 日志"""
+    try:
+        utils.logger.info(f"收到输入事件: {event}")
+        utils.apply_input(event, client_screen)
+        utils.logger.info(f"输入事件处理完成: {event['type']} {event['action']}")
+    except Exception as e:
+        utils.logger.error(f"处理输入事件时出错: {e}")
+
+
+def _sync_logging(console, log_file: str):
+    """原有的日志配置：控制台和文件处理器在调用线程中同步写入"""
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    formatter = logging.Formatter(logs.LOG_FORMAT)
+    for handler in (logging.StreamHandler(console), logging.FileHandler(log_file)):
+        handler.setFormatter(formatter)
+        root.addHandler(handler)
+    root.setLevel(logging.INFO)
+
+
+def run(handle, events) -> float:
+    start = time.perf_counter()
+    for event in events:
+        handle(event, (1920, 1080))
+    return len(events) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="handle_input 每秒可处理的事件数（pyautogui 为空实现）")
+    parser.add_argument('--events', type=int, default=50000)
+    args = parser.parse_args()
+
+    events = sample_events(args.events)
+    results = []
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, 'w') as console:
+        _sync_logging(console, os.path.join(directory, 'legacy.log'))
+        results.append(('sync logging (legacy)', run(legacy_handle_input, events)))
+
+        logs.setup_logging(os.path.join(directory, 'queue.log'), stream=console)
+        results.append(('queue + counters', run(utils.handle_input, events)))
+        logs.setup_logging(debug=True)
+        results.append(('queue + debug trace', run(utils.handle_input, events)))
+        logs.stop_logging()
+
+    baseline = results[0][1]
+    print(f"{'mode':<24} {'events/s':>12} {'speedup':>8}")
+    for name, rate in results:
+        print(f"{name:<24} {rate:>12,.0f} {rate / baseline:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
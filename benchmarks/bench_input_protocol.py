@@ -0,0 +1,76 @@
+import argparse
+import pickle
+import time
+from common.protocol import MessageDecoder, decode_inputs, encode_inputs
+
+# 输入事件协议基准测试：定长二进制记录 + 长度前缀 vs 原有的逐条 pickle
+# binary 为每条消息一个事件（最坏情况），binary/N 为每条消息 N 个事件（客户端批量发送）
+
+
+def sample_events(count: int):
+    """模拟输入流：以鼠标移动为主，夹杂点击、滚轮和按键"""
+    events = []
+    for i in range(count):
+        if i % 50 == 0:
+            events.append({'type': 'mouse', 'action': 'press', 'x': i % 1920, 'y': i % 1080, 'button': 'left'})
+        elif i % 50 == 1:
+            events.append({'type': 'mouse', 'action': 'scroll', 'x': i % 1920, 'y': i % 1080, 'dx': 0, 'dy': -1})
+        elif i % 50 == 2:
+            events.append({'type': 'keyboard', 'action': 'press', 'key': "'a'"})
+        else:
+            events.append({'type': 'mouse', 'action': 'move', 'x': i % 1920, 'y': i % 1080})
+    return events
+
+
+def bench_pickle(events):
+    start = time.perf_counter()
+    packets = [pickle.dumps(event) for event in events]
+    encode = time.perf_counter() - start
+    start = time.perf_counter()
+    decoded = [pickle.loads(packet) for packet in packets]
+    decode = time.perf_counter() - start
+    assert len(decoded) == len(events)
+    return encode, decode, sum(len(packet) for packet in packets)
+
+
+def bench_binary(events, chunk_size: int, batch: int = 1):
+    """batch 为每条消息的事件数：1 为逐事件发送，客户端合并鼠标移动、批量发送时每条消息包含多个事件"""
+    start = time.perf_counter()
+    packets = [encode_inputs(events[i:i + batch]) for i in range(0, len(events), batch)]
+    encode = time.perf_counter() - start
+    # 按任意大小切分后送入流式解码器，模拟 TCP 合并/拆分
+    stream = b''.join(packets)
+    start = time.perf_counter()
+    decoder = MessageDecoder()
+    decoded = 0
+    for offset in range(0, len(stream), chunk_size):
+        for _, payload in decoder.feed(stream[offset:offset + chunk_size]):
+            decoded += len(decode_inputs(payload))
+    decode = time.perf_counter() - start
+    assert decoded == len(events)
+    return encode, decode, len(stream)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="输入事件编码/解码吞吐量")
+    parser.add_argument('--events', type=int, default=200000)
+    parser.add_argument('--chunk', type=int, default=1024, help="模拟的 recv 大小")
+    parser.add_argument('--repeat', type=int, default=5, help="重复次数，取最快的一次")
+    parser.add_argument('--batch', type=int, default=16, help="批量发送时每条消息的事件数")
+    args = parser.parse_args()
+
+    events = sample_events(args.events)
+    print(f"{'protocol':<10} {'encode ev/s':>14} {'decode ev/s':>14} {'bytes/event':>12}")
+    benches = (('pickle', lambda: bench_pickle(events)),
+               ('binary', lambda: bench_binary(events, args.chunk)),
+               (f'binary/{args.batch}', lambda: bench_binary(events, args.chunk, args.batch)))
+    for name, bench in benches:
+        results = [bench() for _ in range(max(1, args.repeat))]
+        encode = min(result[0] for result in results)
+        decode = min(result[1] for result in results)
+        size = results[0][2]
+        print(f"{name:<10} {len(events) / encode:>14,.0f} {len(events) / decode:>14,.0f} {size / len(events):>12.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+import argparse
+import logging
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Tuple
+import numpy as np
+
+# 断线重连基准测试：客户端经本机 TCP 中继连接服务器，中继反复切断所有连接模拟网络中断（如 VPN 重连）。
+# 比较服务器保留会话（客户端恢复会话后只接收断线期间变化的分块）和不保留会话（重连后重新发送关键帧）时，
+# 从断线到重连后合并第一帧的时间和数据量；最后停止输入，检查客户端帧缓冲区与服务器屏幕逐像素一致。
+# 另有一组长时间断线（超过关键帧间隔，期间中继拒绝连接），恢复会话后仍应只补发变化的分块。
+from .harness import Typing, _free_port, _stub_display
+import pyautogui  # noqa: E402
+from server.server import RemoteDesktopServer  # noqa: E402
+from server.utils import set_capture_backend  # noqa: E402
+from client.client import RemoteDesktopClient  # noqa: E402
+
+
+class TcpRelay:
+    """本机 TCP 中继：把客户端的连接转发给服务器，cut() 同时切断所有连接并可在一段时间内拒绝新连接"""
+
+    def __init__(self, target: Tuple[str, int], host: str = '127.0.0.1'):
+        self.target = target
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.bind((host, 0))
+        self.sock.listen(8)
+        self.sock.settimeout(0.2)
+        self.address = self.sock.getsockname()
+        self.downstream = 0  # 服务器发给客户端的字节数
+        self.connections = 0
+        self._pairs: List[Tuple[socket.socket, socket.socket]] = []
+        self._lock = threading.Lock()
+        self._running = False
+        self._down_until = 0.0
+
+    def start(self) -> 'TcpRelay':
+        self._running = True
+        threading.Thread(target=self._accept_loop, name='relay', daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._running = False
+        self.cut()
+        self.sock.close()
+
+    def cut(self, outage: float = 0.0) -> None:
+        """切断所有连接，之后 outage 秒内接受的连接立即关闭"""
+        with self._lock:
+            self._down_until = time.monotonic() + outage
+            pairs, self._pairs = self._pairs, []
+        for pair in pairs:
+            for sock in pair:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                sock.close()
+
+    def _accept_loop(self) -> None:
+        while self._running:
+            try:
+                client, _ = self.sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if time.monotonic() < self._down_until:
+                client.close()
+                continue
+            server = socket.create_connection(self.target)
+            with self._lock:
+                self._pairs.append((client, server))
+                self.connections += 1
+            threading.Thread(target=self._pipe, args=(client, server, False), daemon=True).start()
+            threading.Thread(target=self._pipe, args=(server, client, True), daemon=True).start()
+
+    def _pipe(self, source: socket.socket, destination: socket.socket, downstream: bool) -> None:
+        try:
+            while True:
+                data = source.recv(1 << 16)
+                if not data:
+                    break
+                destination.sendall(data)
+                if downstream:
+                    self.downstream += len(data)
+        except OSError:
+            pass
+
+
+def run(resume: bool, cuts: int, interval: float, outage: float = 0.0, warmup: float = 1.0) -> Dict[str, Any]:
+    """
+    运行一次服务器和客户端，打字的同时切断连接 cuts 次，每次间隔 interval 秒
+
+    Args:
+        outage: 每次切断后中继拒绝连接的时间（秒）
+
+    Returns:
+        每次中继恢复后重连并合并第一帧的耗时和期间的下行数据量，以及最终画面是否与服务器一致
+    """
+    workload = Typing()
+    port = _free_port()
+    server = RemoteDesktopServer(host='127.0.0.1', port=port, exit_key=None, capture_backend='fake',
+                                 resume_timeout=30.0 if resume else 0)
+    set_capture_backend(workload)
+    pyautogui.keyDown = lambda key, **kwargs: workload.key_down(key)
+    server_thread = threading.Thread(target=server.start, daemon=True)
+    server_thread.start()
+    while not server.running:
+        time.sleep(0.01)
+    relay = TcpRelay(('127.0.0.1', port)).start()
+
+    _stub_display()
+    client = RemoteDesktopClient('127.0.0.1', relay.address[1], codecs=['zlib'], reconnect_delay=0.05,
+                                 max_reconnect_delay=0.2)
+    # 断线重连会输出警告，基准测试只保留错误
+    logging.getLogger().setLevel(logging.ERROR)
+    result: Dict[str, Any] = {'recover_ms': [], 'recover_bytes': []}
+    stop, typing = threading.Event(), threading.Event()
+
+    def measure():
+        while not client.running or not client.receiver:
+            if stop.wait(0.01):
+                return
+        driver = threading.Thread(target=workload.drive, args=(client, typing), name='input-driver', daemon=True)
+        driver.start()
+        time.sleep(warmup)
+        for _ in range(cuts):
+            receiver, before = client.receiver, relay.downstream
+            # 从中继恢复时开始计时
+            start = time.perf_counter() + outage
+            relay.cut(outage)
+            # 重连完成：新的接收流水线合并了第一帧
+            while not stop.is_set() and (client.receiver is receiver or not client.receiver.frames_decoded):
+                time.sleep(0.001)
+            result['recover_ms'].append((time.perf_counter() - start) * 1000)
+            result['recover_bytes'].append(relay.downstream - before)
+            time.sleep(interval)
+        # 停止输入，等画面静止后比较客户端帧缓冲区与服务器屏幕
+        typing.set()
+        driver.join(timeout=2.0)
+        time.sleep(1.0)
+        with client.receiver.image_lock:
+            image = client.receiver.framebuffers[0].image
+            result['match'] = image is not None and np.array_equal(image, workload.screen)
+        result['connections'] = relay.connections
+        stop.set()
+        client.stop()
+
+    measure_thread = threading.Thread(target=measure, name='measure', daemon=True)
+    measure_thread.start()
+    try:
+        client.start()
+    finally:
+        stop.set()
+        typing.set()
+        measure_thread.join(timeout=cuts * (interval + outage + 5) + warmup + 5)
+        relay.stop()
+        server.stop()
+        server_thread.join(timeout=3.0)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="断线重连：恢复会话与重新发送完整画面")
+    parser.add_argument('--cuts', type=int, default=5, help="切断连接的次数")
+    parser.add_argument('--interval', type=float, default=1.0, help="两次切断之间的间隔（秒）")
+    parser.add_argument('--outage', type=float, default=6.0,
+                        help="长时间断线的时长（秒），应超过服务器的关键帧间隔（默认 5 秒）")
+    parser.add_argument('--outage-cuts', type=int, default=2, help="长时间断线的次数，0 表示不测试")
+    args = parser.parse_args()
+
+    scenarios = [('drop', args.cuts, 0.0)]
+    if args.outage_cuts > 0:
+        scenarios.append((f'outage {args.outage:g}s', args.outage_cuts, args.outage))
+    print(f"{'case':<12} {'mode':<8} {'recover ms p50/max':>19} {'KB/recover avg':>15} {'connections':>12} "
+          f"{'match':>6}")
+    for case, cuts, outage in scenarios:
+        for mode, resume in (('resume', True), ('full', False)):
+            result = run(resume, cuts, args.interval, outage)
+            if not result['recover_ms']:
+                print(f"{case:<12} {mode:<8} 没有完成测量")
+                continue
+            recover = sorted(result['recover_ms'])
+            print(f"{case:<12} {mode:<8} {recover[len(recover) // 2]:>9.1f}/{recover[-1]:<9.1f} "
+                  f"{sum(result['recover_bytes']) / len(result['recover_bytes']) / 1024:>15.1f} "
+                  f"{result.get('connections', 0):>12} {str(result.get('match')):>6}")
+
+
+if __name__ == '__main__':
+    main()
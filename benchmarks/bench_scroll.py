@@ -0,0 +1,60 @@
+import argparse
+import time
+import numpy as np
+from common.codecs import create_codec
+from common.frames import decode_frame, encode_frame
+from common.tiles import FrameBuffer, TileDiffer
+from .synthetic import SCROLL_KINDS, scroll_sequence
+
+# 滚动/拖动检测（复制矩形）基准测试：合成的滚动画面序列分别用纯分块差异和分块差异 + 复制矩形编码，
+# 比较每帧数据量和服务器端耗时，并在客户端帧缓冲区上重建画面，确认与原始画面一致
+
+
+def run(frames, detect_motion: bool, codec, quality: int, tile_size: int):
+    differ = TileDiffer(tile_size, keyframe_interval=3600, detect_motion=detect_motion)
+    framebuffer = FrameBuffer()
+    total_bytes = 0
+    elapsed = 0.0
+    copy_frames = 0
+    exact = True
+    # 第一帧是关键帧，两种方式相同，不计入统计
+    for index, frame in enumerate(frames):
+        start_time = time.perf_counter()
+        frame_data = differ.encode(frame)
+        frame_data['resolution'] = (frame.shape[1], frame.shape[0])
+        message = encode_frame(frame_data, codec, quality)
+        if index:
+            elapsed += time.perf_counter() - start_time
+            total_bytes += len(message)
+            copy_frames += bool(frame_data.get('copies'))
+        image = framebuffer.apply(decode_frame(message))
+        exact = exact and np.array_equal(image, frame)
+    count = max(1, len(frames) - 1)
+    return total_bytes / count, elapsed / count, copy_frames, exact
+
+
+def main():
+    parser = argparse.ArgumentParser(description="滚动/拖动画面的编码数据量和耗时：分块差异 vs 分块差异 + 复制矩形")
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--frames', type=int, default=30)
+    parser.add_argument('--step', type=int, default=24, help="每帧滚动的像素数")
+    parser.add_argument('--codec', default='zlib')
+    parser.add_argument('--quality', type=int, default=75)
+    parser.add_argument('--tile-size', type=int, default=64)
+    args = parser.parse_args()
+
+    codec = create_codec(args.codec, 1)
+    print(f"{'sequence':<10} {'mode':<12} {'KB/frame':>10} {'ms/frame':>10} {'copy frames':>12} {'exact':>6} {'saving':>8}")
+    for kind in SCROLL_KINDS:
+        frames = list(scroll_sequence(kind, args.width, args.height, args.frames + 1, args.step))
+        baseline = None
+        for name, detect_motion in (('tiles', False), ('copy-rect', True)):
+            size, elapsed, copy_frames, exact = run(frames, detect_motion, codec, args.quality, args.tile_size)
+            baseline = baseline or size
+            print(f"{kind:<10} {name:<12} {size / 1024:>10.1f} {elapsed * 1000:>10.2f} "
+                  f"{copy_frames:>12} {str(exact):>6} {baseline / max(size, 1):>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,175 @@
+import argparse
+import multiprocessing
+import socket
+import threading
+import time
+from typing import Any, Dict, List
+from common.codecs import create_codec
+from common.frames import encode_frame, decode_frame
+from common.protocol import MSG_FRAME, FrameReader, send_message
+from common.shm import SharedFrameRing, SharedFrameReader
+from .synthetic import desktop_frame
+
+# 本机传输基准测试：把 1080p 原始帧交给同一台机器上的读取端
+#   tcp+zlib：编码为帧消息（zlib 关键帧）经回环 socket 发送，读取端接收并解码（原有的 socket 路径）
+#   shm copy / shm zero-copy：写入共享内存帧环，读取端复制像素或直接使用共享内存上的视图
+# 另外测量多个读取进程同时读取时写入端的开销，确认增加读取端不增加捕获和写入开销
+
+
+def _frames(width: int, height: int, count: int = 4) -> List[Dict[str, Any]]:
+    return [{'image': desktop_frame(width, height, seed), 'resolution': (width, height)} for seed in range(count)]
+
+
+def bench_tcp(frames: List[Dict[str, Any]], duration: float, level: int) -> Dict[str, float]:
+    """写入线程编码并发送，读取端接收并解码；返回读取端帧率和每帧 CPU 时间（两端合计）"""
+    codec = create_codec('zlib', level)
+    sender, receiver = socket.socketpair()
+    stop = threading.Event()
+
+    def produce():
+        index = 0
+        try:
+            while not stop.is_set():
+                send_message(sender, MSG_FRAME, encode_frame(frames[index % len(frames)], codec))
+                index += 1
+        except OSError:
+            pass
+
+    thread = threading.Thread(target=produce, daemon=True)
+    reader = FrameReader(receiver)
+    cpu_start, start = time.process_time(), time.perf_counter()
+    thread.start()
+    count = 0
+    while time.perf_counter() - start < duration:
+        _, payload = reader.read()
+        decode_frame(payload)
+        count += 1
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+    stop.set()
+    receiver.close()
+    thread.join(timeout=5)
+    sender.close()
+    return {'fps': count / elapsed, 'cpu_ms': cpu / count * 1000}
+
+
+def bench_shm(frames: List[Dict[str, Any]], duration: float, copy: bool) -> Dict[str, float]:
+    """写入线程连续写入，读取端读取每个新帧；返回读取端帧率、每帧 CPU 时间和放弃的帧数"""
+    name = f'rd-bench-{multiprocessing.current_process().pid}'
+    ring = SharedFrameRing(name, frames[0]['image'].nbytes)
+    stop = threading.Event()
+
+    def produce():
+        index = 0
+        while not stop.is_set():
+            ring.publish(frames[index % len(frames)])
+            index += 1
+
+    reader = SharedFrameReader(name)
+    thread = threading.Thread(target=produce, daemon=True)
+    cpu_start, start = time.process_time(), time.perf_counter()
+    thread.start()
+    count = 0
+    seq = 0
+    while time.perf_counter() - start < duration:
+        frame = reader.read(after=seq, copy=copy, poll_interval=0)
+        seq = frame['seq']
+        if not copy:
+            # 模拟使用画面：读取每一行的第一个像素
+            frame['image'][:, 0].sum()
+            del frame
+        count += 1
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+    stop.set()
+    thread.join(timeout=5)
+    reader.close()
+    ring.close()
+    return {'fps': count / elapsed, 'cpu_ms': cpu / count * 1000, 'torn': reader.frames_torn}
+
+
+def _consumer(name: str, ready, stop, results) -> None:
+    reader = SharedFrameReader(name)
+    ready.put(True)
+    seq = 0
+    frames = 0
+    cpu_start, start = time.process_time(), time.perf_counter()
+    while not stop.is_set():
+        frame = reader.read(after=seq, timeout=0.1, copy=False)
+        if frame is None:
+            continue
+        seq = frame['seq']
+        frame['image'][:, 0].sum()
+        if reader.valid(frame):
+            frames += 1
+        del frame
+    elapsed = time.perf_counter() - start
+    results.put((frames / elapsed, (time.process_time() - cpu_start) / elapsed * 100, reader.frames_torn))
+    reader.close()
+
+
+def bench_consumers(frames: List[Dict[str, Any]], consumers: int, duration: float,
+                    interval: float) -> Dict[str, float]:
+    """写入端按 interval 写入，consumers 个读取进程零拷贝读取；返回写入端每帧耗时和读取端的平均帧率、CPU 占用"""
+    name = f'rd-bench-consumers-{multiprocessing.current_process().pid}'
+    ring = SharedFrameRing(name, frames[0]['image'].nbytes)
+    context = multiprocessing.get_context('spawn')
+    ready, results, stop = context.Queue(), context.Queue(), context.Event()
+    processes = [context.Process(target=_consumer, args=(name, ready, stop, results))
+                 for _ in range(consumers)]
+    for process in processes:
+        process.start()
+    # 读取进程都映射好之后再开始计时，不计入进程启动时间
+    for _ in processes:
+        ready.get(timeout=30)
+    publish_time = 0.0
+    published = 0
+    start = time.perf_counter()
+    next_time = start
+    while time.perf_counter() - start < duration:
+        begin = time.perf_counter()
+        ring.publish(frames[published % len(frames)])
+        publish_time += time.perf_counter() - begin
+        published += 1
+        next_time += interval
+        time.sleep(max(0.0, next_time - time.perf_counter()))
+    stop.set()
+    stats = [results.get(timeout=10) for _ in processes]
+    for process in processes:
+        process.join(timeout=5)
+    ring.close()
+    return {
+        'publish_ms': publish_time / published * 1000,
+        'fps': sum(fps for fps, _, _ in stats) / len(stats),
+        'cpu_percent': sum(cpu for _, cpu, _ in stats) / len(stats),
+        'torn': sum(torn for _, _, torn in stats),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本机传输：socket + zlib 与共享内存帧环")
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--duration', type=float, default=2.0, help="每项测试的时长（秒）")
+    parser.add_argument('--level', type=int, default=1, help="zlib 压缩级别")
+    parser.add_argument('--consumers', type=int, nargs='+', default=[1, 2, 4, 8], help="读取进程数")
+    parser.add_argument('--interval', type=float, default=1 / 30, help="多读取端测试的写入间隔（秒）")
+    args = parser.parse_args()
+
+    frames = _frames(args.width, args.height)
+    print(f"单个读取端（{args.width}x{args.height}，写入端不限速）")
+    print(f"{'path':<16} {'fps':>8} {'cpu ms/frame':>13} {'torn':>6}")
+    for path, run in (('tcp+zlib', lambda: bench_tcp(frames, args.duration, args.level)),
+                      ('shm copy', lambda: bench_shm(frames, args.duration, True)),
+                      ('shm zero-copy', lambda: bench_shm(frames, args.duration, False))):
+        result = run()
+        print(f"{path:<16} {result['fps']:>8.1f} {result['cpu_ms']:>13.2f} {result.get('torn', 0):>6}")
+
+    print(f"\n多个读取进程（写入间隔 {args.interval * 1000:.1f} ms，零拷贝读取）")
+    print(f"{'consumers':>9} {'publish ms':>11} {'fps/consumer':>13} {'cpu %/consumer':>15} {'torn':>6}")
+    for consumers in args.consumers:
+        result = bench_consumers(frames, consumers, args.duration, args.interval)
+        print(f"{consumers:>9} {result['publish_ms']:>11.2f} {result['fps']:>13.1f} "
+              f"{result['cpu_percent']:>15.1f} {result['torn']:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+import argparse
+import socket
+import threading
+import time
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+# 数据报传输在丢失和乱序下的表现：服务器（合成画面）和最小客户端在本机运行，数据报经过有损 UDP 中继。
+# 画面滚动一段时间后静止，测量静止后客户端画面与服务器画面一致所需的时间（丢失的分块由丢失报告触发刷新，
+# 关键帧间隔设得足够长，不依赖关键帧修复），以及数据报丢失、乱序和过期分块的数量。
+from .stubs import install_input_stubs
+
+WIDTH, HEIGHT = 1280, 720
+install_input_stubs(screen=(WIDTH, HEIGHT))
+from server.server import RemoteDesktopServer  # noqa: E402
+from server.capture import CaptureBackend  # noqa: E402
+from server.utils import set_capture_backend  # noqa: E402
+from client.pipeline import FrameReceiver  # noqa: E402
+from client.datagram import DatagramReceiver  # noqa: E402
+from common.protocol import FrameReader, send_control, send_json, recv_json  # noqa: E402
+from .lossy_relay import LossyRelay  # noqa: E402
+from .synthetic import scroll_sequence  # noqa: E402
+
+
+class ScriptedBackend(CaptureBackend):
+    """循环返回预先生成的帧；停止播放后一直返回当前帧"""
+
+    name = 'scripted'
+
+    def __init__(self, frames: List[np.ndarray]):
+        super().__init__()
+        self.frames = frames
+        self.current = frames[0]
+        self.playing = True
+        self._index = 0
+
+    def grab(self, region: Optional[Tuple[int, int, int, int]] = None, stream: Any = 0) -> np.ndarray:
+        if self.playing:
+            self._index = (self._index + 1) % len(self.frames)
+            self.current = self.frames[self._index]
+        return self.current
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run(frames: List[np.ndarray], loss: float, reorder: float, delay: float, duration: float,
+        settle: float) -> Dict[str, Any]:
+    backend = ScriptedBackend(frames)
+    port = _free_port()
+    server = RemoteDesktopServer(host='127.0.0.1', port=port, screen_capture_interval=1 / 30,
+                                 compression_level=1, exit_key=None, capture_backend='fake',
+                                 adaptive_bitrate=False, cursor_interval=0, keyframe_interval=3600,
+                                 udp=True)
+    set_capture_backend(backend)
+    server_thread = threading.Thread(target=server.start, daemon=True)
+    server_thread.start()
+
+    while not server.running:
+        time.sleep(0.01)
+    sock = socket.create_connection(('127.0.0.1', port), timeout=5)
+    send_json(sock, {'codecs': ['zlib'], 'screen': [WIDTH, HEIGHT], 'cursor': False, 'udp': True})
+    reply = recv_json(sock)
+    sock.settimeout(None)
+    send_lock = threading.Lock()
+
+    def control(message):
+        with send_lock:
+            send_control(sock, message)
+
+    relay = LossyRelay(('127.0.0.1', reply['udp']['port']), loss=loss, reorder=reorder, delay=delay).start()
+    reader = FrameReader(sock)
+
+    def read_message():
+        length, msg_type = reader.read_header()
+        return msg_type, reader.read_body(length)
+
+    receiver = FrameReceiver(read_message, lambda: control({'keyframe': True}))
+    receiver.start()
+    datagrams = DatagramReceiver(relay.address, reply['udp']['token'], receiver,
+                                 lambda seqs: control({'lost': seqs}))
+    datagrams.start()
+
+    start = time.perf_counter()
+    time.sleep(duration)
+    backend.playing = False
+    frozen = time.perf_counter()
+    reference = backend.current
+    converged: Optional[float] = None
+    mismatch = 0
+    while time.perf_counter() - frozen < settle:
+        with receiver.image_lock:
+            framebuffer = receiver.framebuffers.get(0)
+            image = framebuffer.image if framebuffer else None
+            if image is not None and image.shape == reference.shape:
+                mismatch = int(np.count_nonzero((image != reference).any(axis=2)))
+            else:
+                mismatch = reference.shape[0] * reference.shape[1]
+        if mismatch == 0:
+            converged = time.perf_counter() - frozen
+            break
+        time.sleep(0.01)
+
+    stats = datagrams.stats()
+    result = {
+        'loss': loss,
+        'reorder': reorder,
+        'frames': receiver.frames_received,
+        'fps': receiver.frames_received / (frozen - start),
+        'bytes': server.bytes_sent,
+        'datagrams': stats['received'],
+        'lost': stats['lost'],
+        'reordered': stats['reordered'],
+        'stale_tiles': stats['stale_tiles'],
+        'relay_dropped': relay.stats()['dropped'],
+        'converged_ms': converged * 1000 if converged is not None else None,
+        'mismatch_pixels': mismatch,
+    }
+
+    datagrams.stop()
+    relay.stop()
+    server.exit_event.set()
+    sock.close()
+    receiver.stop()
+    server_thread.join(timeout=3.0)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据报传输在有损中继下的丢失修复")
+    parser.add_argument('--kind', default='window', help="画面内容：scroll_sequence 的类型")
+    parser.add_argument('--loss', type=float, nargs='+', default=[0.0, 0.01, 0.05, 0.2])
+    parser.add_argument('--reorder', type=float, default=0.05, help="乱序数据报的比例")
+    parser.add_argument('--delay', type=float, default=0.002, help="中继的固定延迟（秒）")
+    parser.add_argument('--duration', type=float, default=3.0, help="画面滚动的时间（秒）")
+    parser.add_argument('--settle', type=float, default=3.0, help="画面静止后等待一致的最长时间（秒）")
+    args = parser.parse_args()
+
+    frames = list(scroll_sequence(args.kind, WIDTH, HEIGHT, frames=60, step=12))
+    print(f"{'loss':>6} {'fps':>6} {'KB':>8} {'datagrams':>10} {'lost':>6} {'reordered':>10} "
+          f"{'stale':>6} {'converged':>10} {'mismatch':>9}")
+    for loss in args.loss:
+        result = run(frames, loss, args.reorder, args.delay, args.duration, args.settle)
+        converged = f"{result['converged_ms']:.0f} ms" if result['converged_ms'] is not None else 'no'
+        print(f"{loss:>6.0%} {result['fps']:>6.1f} {result['bytes'] / 1024:>8.0f} {result['datagrams']:>10} "
+              f"{result['lost']:>6} {result['reordered']:>10} {result['stale_tiles']:>6} "
+              f"{converged:>10} {result['mismatch_pixels']:>9}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import argparse
+import time
+from typing import Callable, Tuple
+import numpy as np
+from common.codecs import available_codecs, create_codec
+from common.palette import DEFAULT_BLOCK, DEFAULT_MAX_COLORS
+from .synthetic import UI_FRAMES
+
+# 桌面 UI 画面（终端、编辑器、仪表盘）的编码对比：整帧 zlib、JPEG 与分块调色板编码
+# 除耗时和数据量外，统计颜色少的块（文字、背景）的最大像素误差：调色板编码应为 0，JPEG 会模糊文字边缘
+
+
+def _time(func: Callable, repeat: int) -> Tuple[float, object]:
+    result = None
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func()
+    return (time.perf_counter() - start) / repeat, result
+
+
+def _text_mask(frame: np.ndarray, block: int = DEFAULT_BLOCK, max_colors: int = DEFAULT_MAX_COLORS) -> np.ndarray:
+    """颜色数不超过 max_colors 的块覆盖的像素"""
+    height, width = frame.shape[:2]
+    mask = np.zeros((height, width), dtype=bool)
+    for y in range(0, height, block):
+        for x in range(0, width, block):
+            tile = frame[y:y + block, x:x + block].reshape(-1, 3)
+            if len(np.unique(tile, axis=0)) <= max_colors:
+                mask[y:y + block, x:x + block] = True
+    return mask
+
+
+def main():
+    parser = argparse.ArgumentParser(description="桌面 UI 画面编码：整帧 zlib 与调色板编码的压缩率和耗时")
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--quality', type=int, default=75)
+    args = parser.parse_args()
+
+    codecs = {f'zlib{level}': create_codec('zlib', level) for level in (1, 6)}
+    for name in ('jpeg', 'palette'):
+        if name in available_codecs():
+            codecs[name] = create_codec(name, 1)
+
+    print(f"{'frame':<10} {'codec':<8} {'encode ms':>10} {'decode ms':>10} {'bytes':>10} {'ratio':>7} "
+          f"{'vs zlib1':>9} {'text err':>9}")
+    for frame_name, generator in UI_FRAMES.items():
+        frame = generator(args.width, args.height)
+        mask = _text_mask(frame)
+        baseline = 0
+        for name, codec in codecs.items():
+            enc, data = _time(lambda: codec.encode(frame, args.quality), args.repeat)
+            dec, image = _time(lambda: codec.decode(data), args.repeat)
+            baseline = baseline or len(data)
+            error = int(np.abs(image.astype(np.int16) - frame)[mask].max()) if mask.any() else 0
+            print(f"{frame_name:<10} {name:<8} {enc * 1000:>10.2f} {dec * 1000:>10.2f} {len(data):>10} "
+                  f"{frame.nbytes / len(data):>7.1f} {len(data) / baseline:>9.2f} {error:>9}")
+        print(f"{frame_name:<10} 颜色不超过 {DEFAULT_MAX_COLORS} 种的块占画面的 {mask.mean() * 100:.0f}%")
+
+
+if __name__ == '__main__':
+    main()
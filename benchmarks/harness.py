@@ -0,0 +1,307 @@
+import logging
+import os
+import re
+import socket
+import threading
+import time
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# 端到端基准测试框架：RemoteDesktopServer 和 RemoteDesktopClient 在本机回环连接上运行，
+# 屏幕捕获替换为脚本化的画面（工作负载），显示（cv2.imshow）和输入（pyautogui/pynput）替换为空实现。
+# 须在导入 server 或 client 模块之前导入本模块（由它安装输入库的空实现）。
+from .stubs import install_input_stubs
+
+SCREEN = (1920, 1080)
+install_input_stubs(screen=SCREEN)
+import cv2  # noqa: E402
+import pyautogui  # noqa: E402
+from server.server import RemoteDesktopServer  # noqa: E402
+from server.capture import CaptureBackend  # noqa: E402
+from server.utils import set_capture_backend  # noqa: E402
+from client.client import RemoteDesktopClient  # noqa: E402
+from .synthetic import desktop_frame, document_page, photo_frame  # noqa: E402
+
+
+class Workload(CaptureBackend):
+    """脚本化的画面内容，作为捕获后端替换真实屏幕；每次捕获渲染到轮换使用的缓冲区中"""
+
+    name = 'workload'
+
+    def __init__(self, width: int = SCREEN[0], height: int = SCREEN[1], seed: int = 0):
+        super().__init__(buffers=8)
+        self.width = width
+        self.height = height
+        self.desktop = desktop_frame(width, height, seed)
+        self.frame_count = 0
+
+    def render(self, frame: np.ndarray) -> None:
+        """把第 frame_count 帧画面写入 frame"""
+        np.copyto(frame, self.desktop)
+
+    def grab(self, region: Optional[Tuple[int, int, int, int]] = None, stream: Any = 0) -> np.ndarray:
+        frame = self._next_buffer((self.height, self.width, 3), stream)
+        self.render(frame)
+        self.frame_count += 1
+        if region is not None:
+            x, y, width, height = region
+            return frame[y:y + height, x:x + width]
+        return frame
+
+    def key_down(self, key: str) -> None:
+        """服务器注入的按键（pyautogui.keyDown 的替代）"""
+
+    def drive(self, client: RemoteDesktopClient, stop: threading.Event) -> None:
+        """在客户端产生输入事件，直到 stop 被设置；默认没有输入"""
+
+
+class StaticDesktop(Workload):
+    """静止的桌面：画面从不变化，衡量空闲时的开销"""
+
+    name = 'static'
+
+
+class Typing(Workload):
+    """在编辑器窗口中打字：客户端发送按键，服务器注入按键后画面上出现字符"""
+
+    name = 'typing'
+
+    def __init__(self, width: int = SCREEN[0], height: int = SCREEN[1], seed: int = 0, rate: float = 15.0):
+        """
+        Args:
+            rate: 每秒按键数
+        """
+        super().__init__(width, height, seed)
+        self.rate = rate
+        self.left, self.top = width // 8, height // 8
+        self.editor_width, self.editor_height = width * 3 // 4, height * 3 // 4
+        self.screen = self.desktop.copy()
+        self._clear_editor()
+        self._rng = np.random.default_rng(seed)
+        self._cursor = 0
+        self._lock = threading.Lock()
+
+    def _clear_editor(self) -> None:
+        self.screen[self.top:self.top + self.editor_height, self.left:self.left + self.editor_width] = 255
+
+    def render(self, frame: np.ndarray) -> None:
+        with self._lock:
+            np.copyto(frame, self.screen)
+
+    def key_down(self, key: str) -> None:
+        glyph_width, glyph_height = 9, 16
+        columns = (self.editor_width - 16) // glyph_width
+        rows = (self.editor_height - 16) // glyph_height
+        with self._lock:
+            if self._cursor >= columns * rows:
+                self._clear_editor()
+                self._cursor = 0
+            row, column = divmod(self._cursor, columns)
+            x = self.left + 8 + column * glyph_width
+            y = self.top + 8 + row * glyph_height
+            # 类似字符的稀疏深色像素
+            mask = self._rng.random((glyph_height - 4, glyph_width - 2)) < 0.4
+            self.screen[y + 2:y + glyph_height - 2, x + 1:x + glyph_width - 1][mask] = (20, 20, 20)
+            self._cursor += 1
+
+    def drive(self, client: RemoteDesktopClient, stop: threading.Event) -> None:
+        keys = 'the quick brown fox jumps over the lazy dog '
+        index = 0
+        while not stop.wait(1.0 / self.rate):
+            key = keys[index % len(keys)]
+            client.input_handler.on_press(key)
+            client.input_handler.on_release(key)
+            index += 1
+
+
+class VideoPlayback(Workload):
+    """播放视频：桌面上一个 640x360 的区域每次捕获都完全变化"""
+
+    name = 'video'
+
+    def __init__(self, width: int = SCREEN[0], height: int = SCREEN[1], seed: int = 0,
+                 size: Tuple[int, int] = (640, 360), frames: int = 30):
+        super().__init__(width, height, seed)
+        self.size = size
+        self.left, self.top = (width - size[0]) // 2, (height - size[1]) // 2
+        self.clips = [photo_frame(size[0], size[1], seed + i) for i in range(frames)]
+
+    def render(self, frame: np.ndarray) -> None:
+        np.copyto(frame, self.desktop)
+        video_width, video_height = self.size
+        frame[self.top:self.top + video_height, self.left:self.left + video_width] = \
+            self.clips[self.frame_count % len(self.clips)]
+
+
+class Scrolling(Workload):
+    """在窗口中连续滚动长文档"""
+
+    name = 'scrolling'
+
+    def __init__(self, width: int = SCREEN[0], height: int = SCREEN[1], seed: int = 0, step: int = 12):
+        """
+        Args:
+            step: 每次捕获滚动的像素数
+        """
+        super().__init__(width, height, seed)
+        self.step = step
+        self.left, self.top = width // 6, height // 8
+        self.window_width, self.window_height = width // 2, height * 3 // 4
+        self.page = document_page(self.window_width, self.window_height * 4, seed)
+
+    def render(self, frame: np.ndarray) -> None:
+        np.copyto(frame, self.desktop)
+        span = self.page.shape[0] - self.window_height
+        offset = (self.frame_count * self.step) % span
+        frame[self.top:self.top + self.window_height, self.left:self.left + self.window_width] = \
+            self.page[offset:offset + self.window_height]
+
+
+WORKLOADS: Dict[str, Callable[[], Workload]] = {
+    StaticDesktop.name: StaticDesktop,
+    Typing.name: Typing,
+    VideoPlayback.name: VideoPlayback,
+    Scrolling.name: Scrolling,
+}
+
+
+def _thread_group(thread: threading.Thread) -> str:
+    """线程所属的阶段：线程池和编号的线程合并，未命名的线程按目标函数名"""
+    if thread is threading.main_thread():
+        return 'render'
+    match = re.match(r'Thread-\d+ \((\w+)\)', thread.name)
+    if match:
+        return match.group(1)
+    return re.sub(r'[-_]\d+$', '', thread.name)
+
+
+def thread_cpu_times() -> Dict[int, Tuple[str, float]]:
+    """
+    各线程已使用的 CPU 时间
+
+    Returns:
+        线程编号 -> (所属阶段, CPU 秒数)；只支持 Linux（/proc），其它平台返回空字典
+    """
+    ticks = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+    times: Dict[int, Tuple[str, float]] = {}
+    for thread in threading.enumerate():
+        try:
+            with open(f'/proc/self/task/{thread.native_id}/stat') as f:
+                # 线程名可能包含空格，从最后一个右括号之后按字段切分：utime、stime 是第 14、15 个字段
+                fields = f.read().rsplit(')', 1)[1].split()
+        except (OSError, IndexError):
+            continue
+        times[thread.native_id] = (_thread_group(thread), (int(fields[11]) + int(fields[12])) / ticks)
+    return times
+
+
+def _cpu_percent(before: Dict[int, Tuple[str, float]], after: Dict[int, Tuple[str, float]],
+                 elapsed: float) -> Dict[str, float]:
+    """两次采样之间各阶段的 CPU 占用（单核百分比）"""
+    usage: Dict[str, float] = {}
+    for thread_id, (group, cpu) in after.items():
+        start = before.get(thread_id, (group, 0.0))[1]
+        usage[group] = usage.get(group, 0.0) + (cpu - start) / elapsed * 100
+    return {group: round(value, 1) for group, value in sorted(usage.items()) if value > 0}
+
+
+def _stub_display() -> List[Tuple[str, Tuple[int, ...]]]:
+    """用空实现替换显示窗口，返回记录显示内容的列表"""
+    shown: List[Tuple[str, Tuple[int, ...]]] = []
+    cv2.imshow = lambda name, image: shown.append((name, image.shape))
+    cv2.waitKey = lambda delay: (time.sleep(delay / 1000), -1)[1]
+    cv2.destroyAllWindows = lambda: None
+    return shown
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _percentiles(snapshot: Dict[str, float]) -> Dict[str, float]:
+    return {'p50': round(snapshot['p50_ms'], 2), 'p99': round(snapshot['p99_ms'], 2)}
+
+
+def run_workload(workload: Workload, duration: float = 5.0, warmup: float = 1.0, codec: str = 'zlib',
+                 server_options: Optional[Dict[str, Any]] = None,
+                 client_options: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    在本机运行一次服务器和客户端，预热后测量 duration 秒
+
+    客户端的渲染循环在主线程中运行（客户端需要在主线程中注册信号处理）。
+
+    Returns:
+        帧率、捕获到显示的延迟、每帧字节数、各阶段耗时和各阶段 CPU 占用
+    """
+    port = _free_port()
+    server = RemoteDesktopServer(host='127.0.0.1', port=port, exit_key=None, capture_backend='fake',
+                                 **(server_options or {}))
+    set_capture_backend(workload)
+    pyautogui.keyDown = lambda key, **kwargs: workload.key_down(key)
+    server_thread = threading.Thread(target=server.start, daemon=True)
+    server_thread.start()
+    while not server.running:
+        time.sleep(0.01)
+
+    shown = _stub_display()
+    client = RemoteDesktopClient('127.0.0.1', port, codecs=[codec], **(client_options or {}))
+    # 基准测试只关心统计结果，日志只保留警告和错误
+    logging.getLogger().setLevel(logging.WARNING)
+    result: Dict[str, Any] = {}
+    stop = threading.Event()
+
+    def measure():
+        while not client.running or not client.receiver:
+            if stop.wait(0.01):
+                return
+        driver = threading.Thread(target=workload.drive, args=(client, stop), name='input-driver', daemon=True)
+        driver.start()
+        time.sleep(warmup)
+        server.metrics.reset()
+        client.metrics.reset()
+        shown.clear()
+        cpu_before, process_before = thread_cpu_times(), time.process_time()
+        start = time.perf_counter()
+        time.sleep(duration)
+        elapsed = time.perf_counter() - start
+        cpu = _cpu_percent(cpu_before, thread_cpu_times(), elapsed)
+        cpu['process'] = round((time.process_time() - process_before) / elapsed * 100, 1)
+        result.update(_collect(server, client, len(shown), elapsed, cpu))
+        stop.set()
+        client.stop()
+
+    measure_thread = threading.Thread(target=measure, name='measure', daemon=True)
+    measure_thread.start()
+    try:
+        client.start()
+    finally:
+        stop.set()
+        measure_thread.join(timeout=duration + warmup + 5)
+        server.stop()
+        server_thread.join(timeout=3.0)
+    return result
+
+
+def _collect(server: RemoteDesktopServer, client: RemoteDesktopClient, displayed: int,
+             elapsed: float, cpu: Dict[str, float]) -> Dict[str, Any]:
+    server_stats = server.metrics.snapshot()
+    client_stats = client.metrics.snapshot()
+    frames_sent = server_stats['rates'].get('frames_sent', {}).get('total', 0)
+    sent_bytes = server_stats['rates'].get('frames_sent', {}).get('total_amount', 0)
+    stages: Dict[str, Dict[str, float]] = {}
+    for histograms, names in ((server_stats['histograms'], ('capture', 'encode', 'send')),
+                              (client_stats['histograms'], ('recv', 'decode', 'render'))):
+        for name in names:
+            if histograms.get(name, {}).get('count'):
+                stages[name] = _percentiles(histograms[name])
+    return {
+        'fps': round(displayed / elapsed, 2),
+        'frames_sent': frames_sent,
+        'latency_ms': _percentiles(client_stats['histograms']['glass_to_glass']),
+        'bytes_per_frame': round(sent_bytes / frames_sent) if frames_sent else 0,
+        'bandwidth_kbps': round(sent_bytes * 8 / 1000 / elapsed, 1),
+        'stages_ms': stages,
+        'cpu_percent': cpu,
+    }
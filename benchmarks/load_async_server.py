@@ -0,0 +1,144 @@
+import argparse
+import asyncio
+import multiprocessing
+import queue
+import threading
+import time
+import traceback
+import numpy as np
+from .stubs import install_input_stubs
+from .synthetic import desktop_frame
+
+# asyncio 服务器负载测试：N 个本地模拟观看者，统计服务器进程每个观看者的 CPU 占用
+# pyautogui 等输入库替换为空实现，捕获使用合成画面，无显示器的环境下也能运行
+install_input_stubs()
+
+
+class ScriptedCapture:
+    """模拟捕获：静态桌面上一个移动的小方块（类似光标/输入）"""
+
+    def __init__(self, width: int, height: int):
+        self.frame = desktop_frame(width, height)
+        self.width, self.height = width, height
+        self.step = 0
+
+    def __call__(self):
+        self.step += 1
+        frame = self.frame.copy()
+        x = (self.step * 17) % (self.width - 40)
+        y = (self.step * 11) % (self.height - 40)
+        frame[y:y + 40, x:x + 40] = (255, 0, 0)
+        return {'image': frame, 'resolution': (self.width, self.height)}
+
+
+def _run_server(port: int, duration: float, args, result_queue):
+    try:
+        _serve(port, duration, args, result_queue)
+    except BaseException:
+        # 把服务器进程的异常交给父进程报告，而不是让父进程只看到等待结果超时
+        result_queue.put({'error': traceback.format_exc()})
+        raise
+
+
+def _serve(port: int, duration: float, args, result_queue):
+    from server.async_server import AsyncRemoteDesktopServer
+    server = AsyncRemoteDesktopServer(host='127.0.0.1', port=port, max_connections=args.viewers + 1,
+                                      codec=args.codec, capture=ScriptedCapture(args.width, args.height),
+                                      capture_backend='fake', screen_capture_interval=1.0 / args.fps,
+                                      exit_key=None)
+    # 等待观看者连接完成后开始计时
+    cpu_start = []
+
+    def measure():
+        time.sleep(1.0)
+        cpu_start.append((time.perf_counter(), time.process_time()))
+        time.sleep(duration)
+        wall = time.perf_counter() - cpu_start[0][0]
+        cpu = time.process_time() - cpu_start[0][1]
+        result_queue.put({'wall': wall, 'cpu': cpu, 'frames_sent': server.frames_sent,
+                          'produced': server.source.seq if server.source else 0})
+        server.stop()
+
+    threading.Thread(target=measure, daemon=True).start()
+    server.start()
+
+
+async def _viewer(port: int, codec: str, stats: dict, stop: asyncio.Event):
+    from common.protocol import MESSAGE_HEADER, async_send_json, async_recv_json
+    for _ in range(50):
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            break
+        except ConnectionRefusedError:
+            await asyncio.sleep(0.1)
+    else:
+        return
+    await async_send_json(writer, {'codecs': [codec]})
+    await async_recv_json(reader)
+    try:
+        while not stop.is_set():
+            length, _ = MESSAGE_HEADER.unpack(await reader.readexactly(MESSAGE_HEADER.size))
+            await reader.readexactly(length)
+            stats['frames'] += 1
+            stats['bytes'] += length
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def _run_viewers(port: int, args, duration: float):
+    stop = asyncio.Event()
+    stats = [{'frames': 0, 'bytes': 0} for _ in range(args.viewers)]
+    tasks = [asyncio.create_task(_viewer(port, args.codec, s, stop)) for s in stats]
+    await asyncio.sleep(duration + 1.5)
+    stop.set()
+    await asyncio.wait(tasks, timeout=3)
+    return stats
+
+
+def run(viewers: int, port: int, args) -> dict:
+    args.viewers = viewers
+    result_queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_run_server, args=(port, args.duration, args, result_queue))
+    process.start()
+    stats = asyncio.run(_run_viewers(port, args, args.duration))
+    try:
+        result = result_queue.get(timeout=10)
+    except queue.Empty:
+        process.join(timeout=1)
+        raise RuntimeError(f"服务器进程没有返回结果（退出码 {process.exitcode}）")
+    process.join(timeout=10)
+    if 'error' in result:
+        raise RuntimeError(f"服务器进程出错:\n{result['error']}")
+    result['viewers'] = viewers
+    result['frames_per_viewer'] = float(np.mean([s['frames'] for s in stats]))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="asyncio 服务器多观看者负载测试")
+    parser.add_argument('--viewers', type=int, default=50)
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--fps', type=float, default=10.0)
+    parser.add_argument('--width', type=int, default=1920)
+    parser.add_argument('--height', type=int, default=1080)
+    parser.add_argument('--codec', default='zlib')
+    parser.add_argument('--port', type=int, default=19999)
+    args = parser.parse_args()
+
+    print(f"{'viewers':>8} {'cpu %':>8} {'cpu %/viewer':>13} {'produced':>9} {'frames/viewer':>14}")
+    baseline = None
+    for index, viewers in enumerate(sorted({1, args.viewers})):
+        result = run(viewers, args.port + index, args)
+        cpu_percent = result['cpu'] / result['wall'] * 100
+        if baseline is None:
+            baseline = cpu_percent
+        marginal = (cpu_percent - baseline) / (viewers - 1) if viewers > 1 else cpu_percent
+        print(f"{viewers:>8} {cpu_percent:>8.1f} {cpu_percent / viewers:>13.2f} "
+              f"{result['produced']:>9} {result['frames_per_viewer']:>14.1f}"
+              f"   (每增加一个观看者: {marginal:.2f}%)")
+
+
+if __name__ == '__main__':
+    main()
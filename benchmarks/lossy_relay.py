@@ -0,0 +1,126 @@
+import heapq
+import random
+import socket
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# 本地有损 UDP 中继：在客户端和服务器的数据报端口之间转发，按比例丢弃、延迟和打乱顺序，
+# 用于在回环网络上测试数据报传输的丢失检测和修复
+
+
+class LossyRelay:
+    """
+    有损 UDP 中继
+
+    第一个不是来自目标地址的数据报的发送方视为客户端；客户端发来的数据报转发给目标，
+    目标发来的数据报转发给客户端。两个方向使用相同的丢失、乱序和延迟参数。
+    """
+
+    def __init__(self, target: Tuple[str, int], loss: float = 0.0, reorder: float = 0.0,
+                 delay: float = 0.0, reorder_delay: float = 0.01, seed: int = 0, host: str = '127.0.0.1'):
+        """
+        Args:
+            target: 转发的目标地址（服务器的数据报端口）
+            loss: 丢弃的比例（0-1）
+            reorder: 额外延迟 reorder_delay 的比例，之后的数据报会先于它到达
+            delay: 所有数据报的固定延迟（秒）
+            reorder_delay: 乱序数据报的额外延迟（秒）
+            seed: 随机数种子，相同参数下丢弃和乱序的选择可以复现
+        """
+        self.target = target
+        self.loss = loss
+        self.reorder = reorder
+        self.delay = delay
+        self.reorder_delay = reorder_delay
+        self._random = random.Random(seed)
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        for option in (socket.SO_RCVBUF, socket.SO_SNDBUF):
+            try:
+                self.sock.setsockopt(socket.SOL_SOCKET, option, 4 * 1024 * 1024)
+            except OSError:
+                pass
+        self.sock.bind((host, 0))
+        self.sock.settimeout(0.2)
+        self.address = self.sock.getsockname()
+        self.client: Optional[Tuple[str, int]] = None
+
+        self.forwarded = 0
+        self.dropped = 0
+        self.reordered = 0
+        # (发送时间, 序号, 数据报, 目标地址)
+        self._scheduled: List[Tuple[float, int, bytes, Tuple[str, int]]] = []
+        self._count = 0
+        self._cond = threading.Condition()
+        self._running = False
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> 'LossyRelay':
+        self._running = True
+        self._threads = [threading.Thread(target=self._receive_loop, name='relay-receiver', daemon=True),
+                         threading.Thread(target=self._send_loop, name='relay-sender', daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=1.0)
+        self.sock.close()
+
+    def _receive_loop(self) -> None:
+        while self._running:
+            try:
+                data, address = self.sock.recvfrom(65536)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if address == self.target:
+                destination = self.client
+            else:
+                self.client = address
+                destination = self.target
+            if destination is None:
+                continue
+            if self._random.random() < self.loss:
+                self.dropped += 1
+                continue
+            delay = self.delay
+            if self._random.random() < self.reorder:
+                delay += self.reorder_delay
+                self.reordered += 1
+            if delay <= 0:
+                self._forward(data, destination)
+                continue
+            with self._cond:
+                self._count += 1
+                heapq.heappush(self._scheduled, (time.monotonic() + delay, self._count, data, destination))
+                self._cond.notify()
+
+    def _send_loop(self) -> None:
+        while self._running:
+            with self._cond:
+                if not self._scheduled:
+                    self._cond.wait(0.2)
+                    continue
+                due = self._scheduled[0][0] - time.monotonic()
+                if due > 0:
+                    self._cond.wait(due)
+                    continue
+                _, _, data, destination = heapq.heappop(self._scheduled)
+            self._forward(data, destination)
+
+    def _forward(self, data: bytes, destination: Tuple[str, int]) -> None:
+        try:
+            self.sock.sendto(data, destination)
+            self.forwarded += 1
+        except OSError:
+            self.dropped += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {'forwarded': self.forwarded, 'dropped': self.dropped, 'reordered': self.reordered}
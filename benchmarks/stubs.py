@@ -0,0 +1,50 @@
+import sys
+import types
+
+# 基准测试用的输入库空实现：不需要真正注入输入，也不依赖显示器和桌面环境
+
+
+def install_input_stubs(screen=(1920, 1080)):
+    """用空实现替换 pyautogui、pynput 和 keyboard，须在导入 server 或 client 模块之前调用"""
+    noop = lambda *args, **kwargs: None
+    pyautogui = types.ModuleType('pyautogui')
+    pyautogui.PAUSE = 0
+    pyautogui.size = lambda: screen
+    pyautogui.position = lambda: (0, 0)
+    for name in ('moveTo', 'mouseDown', 'mouseUp', 'scroll', 'keyDown', 'keyUp'):
+        setattr(pyautogui, name, noop)
+    sys.modules['pyautogui'] = pyautogui
+
+    class Controller:
+        pass
+
+    class Listener:
+        """输入监听器：不产生任何事件，基准测试直接调用 InputHandler 的回调"""
+
+        def __init__(self, **callbacks):
+            self.callbacks = callbacks
+
+        def start(self):
+            pass
+
+        def stop(self):
+            pass
+
+        def join(self, timeout=None):
+            pass
+
+    pynput = types.ModuleType('pynput')
+    mouse = types.ModuleType('pynput.mouse')
+    mouse.Controller = Controller
+    mouse.Button = type('Button', (), {})
+    mouse.Listener = Listener
+    keyboard = types.ModuleType('pynput.keyboard')
+    keyboard.Controller = Controller
+    keyboard.Key = type('Key', (), {})
+    keyboard.Listener = Listener
+    pynput.mouse, pynput.keyboard = mouse, keyboard
+    sys.modules.update({'pynput': pynput, 'pynput.mouse': mouse, 'pynput.keyboard': keyboard})
+
+    hotkeys = types.ModuleType('keyboard')
+    hotkeys.is_pressed = lambda key: False
+    sys.modules['keyboard'] = hotkeys
@@ -0,0 +1,203 @@
+import numpy as np
+from typing import Iterator
+
+# 合成帧生成器，保证基准测试可以在无显示器的环境下运行
+
+
+def desktop_frame(width: int = 1920, height: int = 1080, seed: int = 0) -> np.ndarray:
+    """类似桌面 UI 的画面：大块纯色区域、窗口边框和类似文字的细线"""
+    rng = np.random.default_rng(seed)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = (235, 235, 235)
+    frame[:32] = (45, 45, 48)  # 标题栏
+    # 窗口最大 400x300，画面较小时按画面缩小
+    max_w, max_h = min(400, width // 2), min(300, (height - 40) // 2)
+    for _ in range(6):
+        x, y = rng.integers(0, max(1, width - max_w)), rng.integers(40, max(41, height - max_h))
+        w, h = rng.integers(max_w // 2, max_w), rng.integers(max_h // 2, max_h)
+        frame[y:y + h, x:x + w] = rng.integers(0, 256, 3)
+        # 文字行：稀疏的深色像素
+        for line in range(y + 10, y + h - 10, 14):
+            mask = rng.random(max(0, w - 20)) < 0.35
+            frame[line:line + 8, x + 10:x + w - 10][:, mask] = (20, 20, 20)
+    return frame
+
+
+def photo_frame(width: int = 1920, height: int = 1080, seed: int = 0) -> np.ndarray:
+    """类似照片/视频的画面：平滑渐变叠加噪声"""
+    rng = np.random.default_rng(seed)
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    r = 128 + 100 * np.sin(xx / 97.0 + seed)
+    g = 128 + 100 * np.cos(yy / 53.0 + seed)
+    b = 128 + 100 * np.sin((xx + yy) / 151.0)
+    frame = np.stack([r, g, b], axis=2) + rng.normal(0, 12, (height, width, 3))
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def noise_frame(width: int = 1920, height: int = 1080, seed: int = 0) -> np.ndarray:
+    """完全随机的画面（最坏情况）"""
+    rng = np.random.default_rng(seed)
+    return rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+def _draw_text(frame: np.ndarray, x: int, y: int, width: int, rng: np.random.Generator,
+               colors, glyph: tuple = (9, 18), density: float = 0.8) -> None:
+    """
+    在 frame 的一行中绘制类似文字的抗锯齿字形：字形像素在前景色和背景色之间按 4 级灰度混合，
+    与真实屏幕上的文字一样，每块中除了前景色和背景色还有少量中间色
+    """
+    glyph_width, glyph_height = glyph
+    columns = width // glyph_width
+    background = frame[y:y + glyph_height, x:x + columns * glyph_width].astype(np.float32)
+    # 每个字形 (glyph_height - 6) x (glyph_width - 2) 的覆盖率，单词之间留空格
+    coverage = rng.choice([0.0, 0.0, 0.34, 0.67, 1.0], (columns, glyph_height - 6, glyph_width - 2))
+    coverage[rng.random(columns) > density] = 0
+    alpha = np.zeros((glyph_height, columns, glyph_width), dtype=np.float32)
+    alpha[3:glyph_height - 3, :, 1:glyph_width - 1] = coverage.transpose(1, 0, 2)
+    alpha = alpha.reshape(glyph_height, columns * glyph_width, 1)
+    # 每个单词一种颜色（语法高亮）
+    words = np.repeat(rng.integers(0, len(colors), -(-columns // 6)), 6)[:columns]
+    foreground = np.asarray(colors, dtype=np.float32)[np.repeat(words, glyph_width)][None]
+    frame[y:y + glyph_height, x:x + columns * glyph_width] = \
+        (background * (1 - alpha) + foreground * alpha + 0.5).astype(np.uint8)
+
+
+def terminal_frame(width: int = 1920, height: int = 1080, seed: int = 0) -> np.ndarray:
+    """终端：深色背景上满屏的等宽文字，少数几种前景色"""
+    rng = np.random.default_rng(seed)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = (30, 30, 30)
+    frame[:28] = (60, 60, 60)  # 标签栏
+    colors = [(204, 204, 204), (204, 204, 204), (106, 153, 85), (86, 156, 214), (206, 145, 120)]
+    for y in range(36, height - 18, 18):
+        length = int(rng.integers(width // 8, width - 20))
+        _draw_text(frame, 8, y, length, rng, colors)
+    return frame
+
+
+def ide_frame(width: int = 1920, height: int = 1080, seed: int = 0) -> np.ndarray:
+    """IDE：浅色主题，侧边栏文件树、标签页、行号、语法高亮的代码和选中区域"""
+    rng = np.random.default_rng(seed)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = (255, 255, 255)
+    sidebar = width // 7
+    frame[:, :sidebar] = (243, 243, 243)
+    frame[:35] = (236, 236, 236)  # 标签页
+    frame[:35, sidebar:sidebar + 180] = (255, 255, 255)
+    frame[height - 24:] = (0, 122, 204)  # 状态栏
+    frame[300:318, sidebar + 50:width - 200] = (173, 214, 255)  # 选中行
+    for y in range(44, height - 40, 22):
+        _draw_text(frame, 12, y, int(rng.integers(60, sidebar - 24)), rng, [(60, 60, 60)])
+        _draw_text(frame, sidebar + 4, y, 36, rng, [(37, 127, 153)])  # 行号
+        indent = int(rng.integers(0, 5)) * 36
+        length = int(rng.integers(0, width - sidebar - 120 - indent))
+        if length > 9:
+            _draw_text(frame, sidebar + 60 + indent, y, length, rng,
+                       [(0, 0, 255), (0, 0, 0), (163, 21, 21), (0, 128, 0), (121, 94, 38)])
+    return frame
+
+
+def dashboard_frame(width: int = 1920, height: int = 1080, seed: int = 0) -> np.ndarray:
+    """监控面板：卡片、折线图（抗锯齿）、柱状图、数字和一张照片缩略图"""
+    rng = np.random.default_rng(seed)
+    frame = np.empty((height, width, 3), dtype=np.uint8)
+    frame[:] = (24, 27, 31)
+    card_width, card_height = (width - 40) // 3, (height - 80) // 2
+    for row in range(2):
+        for column in range(3):
+            x, y = 10 + column * (card_width + 10), 60 + row * (card_height + 10)
+            frame[y:y + card_height, x:x + card_width] = (17, 18, 23)
+            _draw_text(frame, x + 10, y + 8, 200, rng, [(204, 204, 220)])
+            chart = frame[y + 40:y + card_height - 10, x + 10:x + card_width - 10]
+            chart_height, chart_width = chart.shape[:2]
+            if (row + column) % 3 == 0:
+                # 柱状图
+                for bar in range(0, chart_width - 12, 16):
+                    top = int(rng.integers(chart_height // 4, chart_height))
+                    chart[top:, bar:bar + 12] = (87, 148, 242)
+            elif (row + column) % 3 == 1:
+                # 抗锯齿折线：线两侧按距离混合
+                values = np.cumsum(rng.normal(0, 3, chart_width)) + chart_height / 2
+                distance = np.abs(np.arange(chart_height)[:, None] - values[None])
+                alpha = np.clip(1.5 - distance, 0, 1)[:, :, None]
+                chart[:] = (chart * (1 - alpha) + np.array([115, 191, 105]) * alpha).astype(np.uint8)
+            else:
+                chart[:] = photo_frame(chart_width, chart_height, seed + row)
+    _draw_text(frame, 10, 20, 600, rng, [(255, 255, 255)])
+    return frame
+
+
+# 典型的桌面 UI 截图：用于比较面向 UI 内容的编码
+UI_FRAMES = {
+    'terminal': terminal_frame,
+    'ide': ide_frame,
+    'dashboard': dashboard_frame,
+}
+
+FRAME_GENERATORS = {
+    'desktop': desktop_frame,
+    'photo': photo_frame,
+    'noise': noise_frame,
+    **UI_FRAMES,
+}
+
+
+def document_page(width: int, height: int, seed: int = 0) -> np.ndarray:
+    """长文档页面：白底上的文字行，夹杂几张插图"""
+    rng = np.random.default_rng(seed)
+    page = np.full((height, width, 3), 250, dtype=np.uint8)
+    for line in range(8, height - 12, 18):
+        length = int(rng.integers(width // 3, max(width // 3 + 1, width - 40)))
+        mask = rng.random(length) < 0.4
+        page[line:line + 10, 20:20 + length][:, mask] = (30, 30, 30)
+    # 插图 360x240，页面较窄（较矮）时缩小到页面内
+    image_w, image_h = max(1, min(360, width - 40)), max(1, min(240, height - 20))
+    for _ in range(max(1, height // 1500)):
+        y = int(rng.integers(0, max(1, height - image_h - 60)))
+        x = int(rng.integers(0, max(1, width - image_w - 40)))
+        page[y:y + image_h, x:x + image_w] = photo_frame(image_w, image_h, int(rng.integers(1000)))
+    return page
+
+
+def scroll_sequence(kind: str, width: int = 1920, height: int = 1080, frames: int = 60,
+                    step: int = 24, seed: int = 0) -> Iterator[np.ndarray]:
+    """
+    滚动和拖动的画面序列
+
+    Args:
+        kind: 'document'（全屏文档垂直滚动，顶部标题栏不动）、'window'（桌面上一个窗口内的内容滚动）、
+              'pan'（宽表格水平平移）或 'drag'（窗口在桌面上水平拖动）
+        step: 每帧移动的像素数
+    """
+    if kind == 'document':
+        page = document_page(width, height + frames * step, seed)
+        frame = desktop_frame(width, height, seed)
+        for i in range(frames):
+            frame[32:] = page[i * step:i * step + height - 32]
+            yield frame.copy()
+    elif kind == 'window':
+        left, top, win_w, win_h = width // 6, height // 8, width // 2, height * 3 // 4
+        page = document_page(win_w, win_h + frames * step, seed)
+        frame = desktop_frame(width, height, seed)
+        for i in range(frames):
+            frame[top:top + win_h, left:left + win_w] = page[i * step:i * step + win_h]
+            yield frame.copy()
+    elif kind == 'pan':
+        sheet = document_page(height, width + frames * step, seed).swapaxes(0, 1).copy()
+        for i in range(frames):
+            yield sheet[:, i * step:i * step + width].copy()
+    elif kind == 'drag':
+        background = desktop_frame(width, height, seed)
+        window = document_page(width // 3, height // 2, seed + 1)
+        win_h, win_w = window.shape[:2]
+        top = height // 4
+        for i in range(frames):
+            left = min(20 + i * step, width - win_w)
+            frame = background.copy()
+            frame[top:top + win_h, left:left + win_w] = window
+            yield frame
+    else:
+        raise ValueError(f"未知的滚动序列: {kind}")
+
+
+SCROLL_KINDS = ('document', 'window', 'pan', 'drag')
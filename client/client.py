@@ -1,42 +1,87 @@
+import random
 import socket
-import zlib
-import pickle
 import cv2
 import logging
 import signal
 import sys
 import time
 import numpy as np
-from .utils import start_input_listener
+from .utils import InputHandler
+from .pipeline import FrameReceiver
+from .cursor import CursorOverlay
+from .datagram import DatagramReceiver
+from common.codecs import DEFAULT_CODEC_PREFERENCE, available_codecs
+from common.metrics import MetricsRegistry, MetricsServer
+from common.logs import setup_logging
+from common.protocol import MSG_CURSOR, FrameReader, enable_keepalive, send_json, recv_json
 
 class RemoteDesktopClient:
     def __init__(self, host='192.168.1.100', port=9999, buffer_size=4096,
-                 target_fps=30, compression_quality=50):
+                 target_fps=30, compression_quality=50, codecs=None, move_interval=0.01,
+                 viewport=None, roi=None, decode_workers=2, max_pending=4, metrics_port=None,
+                 debug=False, monitors=None, input_monitor=None, show_cursor=True, udp=False, udp_address=None,
+                 reconnect_timeout=60.0, reconnect_delay=0.5, max_reconnect_delay=10.0, connect_timeout=10.0):
         self.host = host
         self.port = port
-        self.buffer_size = buffer_size
+        self.buffer_size = buffer_size  # 接收缓冲区初始大小，收到更大的帧时按需增长
         self.client_socket = None
         self.running = False
         self.mouse_listener = None 
         self.keyboard_listener = None
+        self.input_handler = None
+        self.move_interval = move_interval  # 鼠标移动合并窗口（秒）
+        self.viewport = viewport  # 显示窗口大小 (宽, 高)，服务器按此缩小画面；None 表示按服务器分辨率显示
+        self.roi = roi  # 放大查看的服务器屏幕区域 (x, y, 宽, 高)；None 表示整个屏幕
+        # 订阅的服务器显示器：编号或 {'id': 编号, 'interval': 捕获间隔（秒）} 的列表，每个显示器单独一个窗口；
+        # None 表示把整个屏幕作为一个画面
+        self.monitors = monitors
+        self.input_monitor = input_monitor  # 本地输入映射到的显示器编号，None 表示第一个订阅的显示器
+        self.server_monitors = []  # 服务器在握手时发来的显示器列表
+        # 远程指针由服务器作为单独的消息发送，在本地绘制到最后一帧上
+        self.cursor = CursorOverlay() if show_cursor else None
+        self._last_frames = {}  # 画面流编号 -> 最近显示的一帧，指针移动时重新绘制
+        # 帧分块通过 UDP 数据报接收（服务器支持时），丢失的分块由服务器在下一帧刷新；输入仍通过 TCP 发送
+        self.udp = udp
+        self.udp_address = udp_address  # 数据报发往的地址 (主机, 端口)，默认为服务器地址和握手时分配的端口
+        self.datagrams = None
+        self.decode_workers = decode_workers  # 解码线程数
+        self.max_pending = max_pending  # 允许积压的未解码帧数，超过时丢弃并请求关键帧
+        self.frame_reader = None
+        self.receiver = None
+        # 连接断开后自动重连：间隔从 reconnect_delay 起按指数增长到 max_reconnect_delay（加随机抖动），
+        # 持续 reconnect_timeout 秒仍连不上时退出；为 0 时不重连
+        self.reconnect_timeout = reconnect_timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.connect_timeout = connect_timeout  # 建立连接和握手的超时（秒）
+        # 服务器分配的会话令牌，重连时带上以恢复会话：服务器只补发断线期间变化的内容，不重新发送完整画面
+        self.session = None
+        
+        # 编解码器偏好顺序，连接时与服务器协商
+        self.codecs = codecs or [name for name in DEFAULT_CODEC_PREFERENCE if name in available_codecs()]
+        self.codec = None
         
         # 性能控制参数
         self.target_fps = target_fps
         self.frame_time = 1.0 / target_fps
-        self.compression_quality = compression_quality
-        self.last_frame_time = 0
-        self.fps_stats = []
-        self.bandwidth_stats = []
+        self.compression_quality = compression_quality  # 图像质量上限，连接时告知服务器
+        # 统计窗口内的接收字节数和接收耗时（读取线程写入，渲染线程读取后清零），用于反馈给服务器
+        self.window_bytes = 0
+        self.window_recv_time = 0.0
+        
+        # 性能统计：接收、渲染耗时，捕获到显示的延迟（依赖两端时钟同步）和本地接收到显示的延迟
+        self.metrics = MetricsRegistry()
+        self.recv_time = self.metrics.histogram('recv')
+        self.render_time = self.metrics.histogram('render')
+        self.glass_latency = self.metrics.histogram('glass_to_glass')
+        self.display_latency = self.metrics.histogram('receive_to_display')
+        self.receive_rate = self.metrics.rate('frames_received')
+        self.display_rate = self.metrics.rate('frames_displayed')
+        self.metrics_port = metrics_port  # 本地 HTTP 统计端点端口，为 None 时不启动
+        self.metrics_server = None
         
-        # 设置日志
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.StreamHandler(),
-                logging.FileHandler('remote_desktop_client.log')
-            ]
-        )
+        # 设置日志：控制台和文件写入在后台线程完成；debug 为 True 时输出逐个输入事件的跟踪
+        setup_logging('remote_desktop_client.log', debug=debug)
         self.logger = logging.getLogger(__name__)
 
     def signal_handler(self, signum, frame):
@@ -50,105 +95,320 @@ class RemoteDesktopClient:
         self.running = False
         cv2.destroyAllWindows()
         
-        if self.mouse_listener:
-            self.mouse_listener.stop()
-        if self.keyboard_listener:
-            self.keyboard_listener.stop()
+        if self.input_handler:
+            self.input_handler.stop()
             
-        if self.client_socket:
-            try:
-                self.client_socket.close()
-            except Exception as e:
-                self.logger.error(f"关闭socket时出错: {e}")
-            self.client_socket = None
+        self._disconnect()
+            
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
             
         # 打印性能统计
-        if self.fps_stats:
-            avg_fps = sum(self.fps_stats) / len(self.fps_stats)
-            self.logger.info(f"平均FPS: {avg_fps:.2f}")
-        if self.bandwidth_stats:
-            avg_bandwidth = sum(self.bandwidth_stats) / len(self.bandwidth_stats)
-            self.logger.info(f"平均带宽: {avg_bandwidth/1024/1024:.2f} MB/s")
+        if self.display_rate.total:
+            self.logger.info(f"平均FPS: {self.display_rate.rates()['avg_per_sec']:.2f}")
+            self.logger.info(f"平均带宽: {self.receive_rate.rates()['avg_amount_per_sec']/1024/1024:.2f} MB/s")
             
         self.logger.info("客户端已停止")
 
-    def adjust_quality(self, current_fps):
-        """根据当前FPS动态调整图像质量"""
-        if current_fps < self.target_fps * 0.8:  # FPS过低
-            self.compression_quality = max(10, self.compression_quality - 5)
-        elif current_fps > self.target_fps * 1.2:  # FPS过高
-            self.compression_quality = min(95, self.compression_quality + 5)
+    def set_viewport(self, viewport):
+        """设置显示窗口大小，服务器之后只发送该大小的画面"""
+        self.viewport = tuple(viewport) if viewport else None
+        if self.input_handler:
+            self.input_handler.send_control({'viewport': list(viewport) if viewport else None})
+
+    def set_roi(self, roi):
+        """设置放大查看的服务器屏幕区域 (x, y, 宽, 高)，为 None 时恢复查看整个屏幕"""
+        self.roi = tuple(roi) if roi else None
+        if self.input_handler:
+            self.input_handler.send_control({'roi': list(roi) if roi else None})
+
+    def subscribe_monitors(self, monitors):
+        """订阅服务器显示器（编号或 {'id', 'interval'} 的列表），为 None 时恢复查看整个屏幕"""
+        self.monitors = list(monitors) if monitors else None
+        if self.input_handler:
+            self.input_handler.send_control({'monitors': self.monitors})
+
+    def set_input_monitor(self, monitor):
+        """设置本地鼠标和键盘输入映射到的服务器显示器"""
+        self.input_monitor = monitor
+        if self.input_handler:
+            self.input_handler.send_control({'input_monitor': monitor})
+
+    @staticmethod
+    def _window_name(stream):
+        return 'Remote Desktop' if not stream else f'Remote Desktop - 显示器 {stream}'
+
+    def _read_message(self):
+        """读取一条完整的消息，返回 (消息类型, 消息体视图)（在读取线程中执行）"""
+        data_length, msg_type = self.frame_reader.read_header()
+        recv_start = time.perf_counter()
+        payload = self.frame_reader.read_body(data_length)
+        elapsed = time.perf_counter() - recv_start
+        self.recv_time.record(elapsed)
+        self.receive_rate.add(data_length)
+        self.window_recv_time += elapsed
+        self.window_bytes += data_length
+        return msg_type, payload
+
+    def _handle_message(self, msg_type, payload):
+        """处理帧以外的消息（在读取线程中执行）"""
+        if msg_type == MSG_CURSOR and self.cursor:
+            self.cursor.update(payload)
+            # 唤醒渲染线程重新绘制指针
+            self.receiver.latest.wakeup()
+
+    def _render_frame(self, frame, cursor_only=False):
+        """
+        显示帧缓冲区的当前内容；服务器可能发送缩小或裁剪后的画面，调整到视口大小（默认为服务器分辨率）
+
+        Args:
+            frame: 合并线程发布的帧信息
+            cursor_only: 只是指针移动，重新绘制最后一帧，不计入帧率和延迟统计
+        """
+        display_size = tuple(self.viewport or frame['resolution'])
+        start_time = time.perf_counter()
+        with self.receiver.image_lock:
+            img = self.receiver.framebuffers[frame['stream']].image
+            if img.shape[1] != display_size[0] or img.shape[0] != display_size[1]:
+                img = cv2.resize(img, display_size)
+            else:
+                # 合并线程会继续修改帧缓冲区，显示前复制一份
+                img = img.copy()
+        if self.cursor:
+            self.cursor.draw(frame['stream'], img)
+        cv2.imshow(self._window_name(frame['stream']), img)
+        self._last_frames[frame['stream']] = frame
+        if cursor_only:
+            return
+        self.render_time.record(time.perf_counter() - start_time)
+        self.display_rate.add()
+        now = time.time()
+        self.glass_latency.record(now - frame['timestamp'])
+        self.display_latency.record(now - frame['received_at'])
+
+    def _render_loop(self):
+        """
+        渲染循环：总是显示最新合并好的一帧，来不及显示的旧帧直接丢弃
+
+        不再按目标帧率休眠，休眠只会让数据积压在 socket 中并增加延迟。
+
+        Returns:
+            用户是否按下 q 退出（否则为连接断开或客户端被停止）
+        """
+        frame_count = 0
+        last_stats_time = time.time()
+
+        while self.running:
+            alive = self.receiver.is_alive()
+            frames = self.receiver.latest.take(timeout=0.05)
+            for frame in frames:
+                self._render_frame(frame)
+            frame_count += len(frames)
+            if self.cursor:
+                rendered = {frame['stream'] for frame in frames}
+                for stream in self.cursor.take_dirty() - rendered:
+                    if stream in self._last_frames:
+                        self._render_frame(self._last_frames[stream], cursor_only=True)
+            if not frames and not alive:
+                break
+
+            current_time = time.time()
+            if current_time - last_stats_time >= 1.0:
+                self._report_stats(frame_count, current_time - last_stats_time)
+                frame_count = 0
+                last_stats_time = current_time
+
+            if cv2.waitKey(1) == ord('q'):
+                self.logger.info("用户按下q键，正在退出...")
+                return True
+        return False
+
+    def _report_stats(self, frame_count, elapsed):
+        """记录一个统计窗口的性能数据，并反馈给服务器"""
+        fps = frame_count / elapsed
+        bandwidth = self.window_bytes / elapsed
+
+        glass = self.glass_latency.snapshot()
+        display = self.display_latency.snapshot()
+        decode = self.receiver.decode_time.snapshot()
+        stats = self.receiver.stats()
+        self.logger.info(f"FPS: {fps:.2f}, 带宽: {bandwidth/1024/1024:.2f} MB/s, "
+                         f"延迟(捕获->显示) p50/p99: {glass['p50_ms']:.1f}/{glass['p99_ms']:.1f}ms, "
+                         f"接收->显示: {display['p50_ms']:.1f}/{display['p99_ms']:.1f}ms, "
+                         f"解码: {decode['p50_ms']:.1f}/{decode['p99_ms']:.1f}ms, "
+                         f"丢弃帧: 未显示 {stats['dropped']} / 解码积压 {stats['discarded']}")
+        if self.datagrams:
+            datagrams = self.datagrams.stats()
+            self.logger.info(f"数据报: 接收 {datagrams['received']}, 丢失 {datagrams['lost']}, "
+                             f"乱序 {datagrams['reordered']}, 过期分块 {datagrams['stale_tiles']}")
+        if self.input_handler:
+            self.input_handler.refresh_geometry()
+
+            # 反馈给服务器的自适应码率控制器
+            self.input_handler.send_control({'feedback': {
+                'fps': fps,
+                'decode_ms': decode['recent_ms'],
+                'throughput': self.window_bytes / max(self.window_recv_time, 1e-3)
+            }})
+        self.window_bytes = 0
+        self.window_recv_time = 0.0
+
+    def _connect(self):
+        """
+        连接服务器并握手，启动接收流水线
+
+        之前有会话时带上会话令牌和各画面流合并到的帧序号，服务器恢复会话后只发送之后变化的内容；
+        帧缓冲区沿用之前的，重连期间窗口继续显示断线前的画面。
+        """
+        sock = socket.create_connection((self.host, self.port), timeout=self.connect_timeout)
+        try:
+            enable_keepalive(sock)
+            if self.input_handler is None:
+                self.input_handler = InputHandler(sock, self.move_interval)
+            hello = {
+                'codecs': self.codecs,
+                'quality': self.compression_quality,
+                'screen': [self.input_handler.screen_width, self.input_handler.screen_height],
+                'viewport': list(self.viewport) if self.viewport else None,
+                'roi': list(self.roi) if self.roi else None,
+                'monitors': self.monitors,
+                'input_monitor': self.input_monitor,
+                'cursor': self.cursor is not None,
+                'udp': self.udp
+            }
+            previous = self.receiver
+            if self.session and previous:
+                hello['resume'] = {'session': self.session,
+                                   'frames': {str(stream): seq for stream, seq in previous.applied.items()}}
+            # 协商编解码器，交换屏幕分辨率
+            send_json(sock, hello)
+            reply = recv_json(sock)
+            sock.settimeout(None)
+        except BaseException:
+            sock.close()
+            raise
+        if 'error' in reply:
+            sock.close()
+            # 服务器拒绝连接，重试也没有用
+            raise RuntimeError(reply['error'])
+        self.client_socket = sock
+        self.codec = reply['codec']
+        self.server_monitors = reply.get('monitors', [])
+        self.session = reply.get('session')
+        resumed = {int(stream): int(seq) for stream, seq in (reply.get('resumed') or {}).items()}
+        self.logger.info(f"已连接到服务器 {self.host}:{self.port}")
+        self.logger.info(f"使用编解码器: {self.codec}, 服务器分辨率: {reply.get('screen')}")
+        if previous:
+            if resumed:
+                self.logger.info(f"已恢复会话，画面流 {sorted(resumed)} 从断线前合并到的帧继续")
+            else:
+                self.logger.info("服务器没有恢复会话，重新接收完整画面")
+        else:
+            for monitor in self.server_monitors:
+                self.logger.info(f"服务器显示器 {monitor['id']}: {monitor['width']}x{monitor['height']} "
+                                 f"@ ({monitor['x']}, {monitor['y']}){'（主显示器）' if monitor.get('primary') else ''}")
+        self.input_handler.set_socket(sock)
+
+        # 消息体视图在解码完成前不能被覆盖：积压的帧、正在解码的帧、正在合并的帧和正在读取的帧各占一个缓冲区
+        self.frame_reader = FrameReader(sock, buffers=self.max_pending + self.decode_workers + 2,
+                                        initial_size=self.buffer_size)
+        self.receiver = FrameReceiver(self._read_message,
+                                      lambda: self.input_handler.send_control({'keyframe': True}),
+                                      self.decode_workers, self.max_pending, metrics=self.metrics,
+                                      on_message=self._handle_message,
+                                      framebuffers=previous.framebuffers if previous else None,
+                                      applied=resumed)
+        self.receiver.start()
+        if reply.get('udp'):
+            address = self.udp_address or (self.host, reply['udp']['port'])
+            self.datagrams = DatagramReceiver(address, reply['udp']['token'], self.receiver,
+                                              lambda seqs: self.input_handler.send_control({'lost': seqs}))
+            self.datagrams.start()
+            self.logger.info(f"通过 UDP 接收画面: {address[0]}:{address[1]}")
+        elif self.udp:
+            self.logger.warning("服务器不支持数据报传输，画面通过 TCP 接收")
+
+    def _disconnect(self):
+        """关闭当前连接和接收线程；帧缓冲区、窗口和输入监听保留，供重连后继续使用"""
+        if self.input_handler:
+            self.input_handler.set_socket(None)
+
+        sock, self.client_socket = self.client_socket, None
+        if sock:
+            try:
+                # 先关闭连接，让阻塞在 recv 上的读取线程退出
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            try:
+                sock.close()
+            except Exception as e:
+                self.logger.error(f"关闭socket时出错: {e}")
+
+        if self.datagrams:
+            self.datagrams.stop()
+            self.datagrams = None
+
+        if self.receiver:
+            self.receiver.stop()
+
+    def _wait(self, seconds):
+        """等待 seconds 秒，期间窗口保持响应；用户按下 q 或客户端被停止时返回 False"""
+        deadline = time.monotonic() + seconds
+        while self.running and time.monotonic() < deadline:
+            if cv2.waitKey(1) == ord('q'):
+                self.logger.info("用户按下q键，正在退出...")
+                return False
+            time.sleep(min(0.05, max(0.0, deadline - time.monotonic())))
+        return self.running
+
+    def _reconnect(self):
+        """连接断开后按指数退避重连，返回是否重新连接成功"""
+        deadline = time.monotonic() + self.reconnect_timeout
+        delay = self.reconnect_delay
+        attempt = 0
+        while self.running:
+            attempt += 1
+            try:
+                self._connect()
+                return True
+            except OSError as e:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.logger.error(f"重连失败 {attempt} 次，放弃: {e}")
+                    return False
+                # 随机抖动避免多个客户端在服务器恢复时同时重连
+                wait = min(delay * random.uniform(0.5, 1.0), remaining)
+                self.logger.warning(f"重连失败（第 {attempt} 次）: {e}，{wait:.1f} 秒后重试")
+                if not self._wait(wait):
+                    return False
+                delay = min(delay * 2, self.max_reconnect_delay)
+        return False
 
     def start(self):
-        """启动客户端"""
+        """启动客户端；连接断开时自动重连，并尽量恢复会话"""
         signal.signal(signal.SIGINT, self.signal_handler)
         signal.signal(signal.SIGTERM, self.signal_handler)
 
         try:
-            self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.client_socket.connect((self.host, self.port))
-            self.logger.info(f"已连接到服务器 {self.host}:{self.port}")
+            self._connect()
             
             # 启动输入监听
-            self.mouse_listener, self.keyboard_listener = start_input_listener(self.client_socket)
+            self.mouse_listener, self.keyboard_listener = self.input_handler.start()
             self.running = True
             
-            frame_count = 0
-            start_time = time.time()
-            last_stats_time = start_time
-
-            while self.running:
-                try:
-                    current_time = time.time()
-                    elapsed = current_time - self.last_frame_time
-                    
-                    # 控制帧率
-                    if elapsed < self.frame_time:
-                        time.sleep(self.frame_time - elapsed)
-                    
-                    # 接收屏幕数据
-                    data_length = int.from_bytes(self.client_socket.recv(4), 'big')
-                    img_data = b''
-                    while len(img_data) < data_length:
-                        chunk = self.client_socket.recv(self.buffer_size)
-                        if not chunk:
-                            raise ConnectionError("服务器断开连接")
-                        img_data += chunk
-
-                    # 解压并显示图像
-                    frame_data = pickle.loads(zlib.decompress(img_data))
-                    img = frame_data['image']
-                    server_resolution = frame_data['resolution']
-                    
-                    # 调整图像大小以匹配服务器分辨率
-                    if img.shape[1] != server_resolution[0] or img.shape[0] != server_resolution[1]:
-                        img = cv2.resize(img, server_resolution)
-                    
-                    cv2.imshow('Remote Desktop', img)
-                    
-                    # 更新性能统计
-                    frame_count += 1
-                    if current_time - last_stats_time >= 1.0:
-                        fps = frame_count / (current_time - last_stats_time)
-                        bandwidth = len(img_data) / (current_time - last_stats_time)
-                        
-                        self.fps_stats.append(fps)
-                        self.bandwidth_stats.append(bandwidth)
-                        
-                        self.logger.info(f"FPS: {fps:.2f}, 带宽: {bandwidth/1024/1024:.2f} MB/s")
-                        self.adjust_quality(fps)
-                        
-                        frame_count = 0
-                        last_stats_time = current_time
-                    
-                    self.last_frame_time = current_time
-                    
-                    if cv2.waitKey(1) == ord('q'):
-                        self.logger.info("用户按下q键，正在退出...")
-                        break
-
-                except Exception as e:
-                    self.logger.error(f"接收/显示数据时出错: {e}")
+            if self.metrics_port is not None:
+                self.metrics_server = MetricsServer(self.metrics, self.metrics_port).start()
+                self.logger.info(f"统计信息: http://127.0.0.1:{self.metrics_server.port}/metrics")
+            while not self._render_loop() and self.running:
+                if self.reconnect_timeout <= 0:
+                    if self.receiver.error:
+                        self.logger.error(f"接收/解码数据时出错: {self.receiver.error}")
+                    break
+                self.logger.warning(f"连接中断（{self.receiver.error}），正在重连...")
+                self._disconnect()
+                if not self._reconnect():
                     break
 
         except Exception as e:
@@ -0,0 +1,58 @@
+import threading
+import numpy as np
+from typing import Any, Dict, Set, Tuple
+from common.cursor import decode_cursor
+
+
+class CursorOverlay:
+    """
+    远程指针：保存服务器发来的指针位置和形状，显示时绘制在画面上
+
+    指针移动只需重新绘制最后一帧，不需要等待服务器捕获和编码新的画面。
+    """
+
+    def __init__(self):
+        # 形状编号 -> (热点, RGBA 像素)
+        self.shapes: Dict[int, Tuple[Tuple[int, int], np.ndarray]] = {}
+        # 画面流编号 -> 最新的指针消息
+        self.cursors: Dict[int, Dict[str, Any]] = {}
+        self._dirty: Set[int] = set()
+        self._lock = threading.Lock()
+
+    def update(self, payload: bytes) -> None:
+        """应用一条指针消息（在读取线程中执行）"""
+        cursor = decode_cursor(payload)
+        with self._lock:
+            if 'image' in cursor:
+                self.shapes[cursor['shape']] = (cursor['hotspot'], cursor['image'])
+            self.cursors[cursor['stream']] = cursor
+            self._dirty.add(cursor['stream'])
+
+    def take_dirty(self) -> Set[int]:
+        """取出指针发生变化、需要重新绘制的画面流"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            return dirty
+
+    def draw(self, stream: int, image: np.ndarray) -> None:
+        """把画面流 stream 的指针绘制到已缩放到显示大小的画面上（原地修改）"""
+        with self._lock:
+            cursor = self.cursors.get(stream)
+            shape = self.shapes.get(cursor['shape']) if cursor else None
+        if shape is None:
+            return
+        (hot_x, hot_y), pixels = shape
+        region_width, region_height = cursor['region']
+        height, width = image.shape[:2]
+        x = int(cursor['position'][0] * width / max(region_width, 1)) - hot_x
+        y = int(cursor['position'][1] * height / max(region_height, 1)) - hot_y
+
+        # 裁剪到画面范围内，按 alpha 混合
+        left, top = max(x, 0), max(y, 0)
+        right, bottom = min(x + pixels.shape[1], width), min(y + pixels.shape[0], height)
+        if left >= right or top >= bottom:
+            return
+        patch = pixels[top - y:bottom - y, left - x:right - x]
+        alpha = patch[:, :, 3:4].astype(np.uint16)
+        target = image[top:bottom, left:right]
+        target[:] = ((patch[:, :, :3] * alpha + target * (255 - alpha)) // 255).astype(np.uint8)
@@ -0,0 +1,208 @@
+import socket
+import threading
+import time
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from common.datagram import DATAGRAM_HEADER, DATAGRAM_LAST, REGISTER_DATAGRAM, decode_datagram
+from common.tiles import FrameBuffer
+from common.metrics import MetricsRegistry
+from .pipeline import FrameReceiver
+
+
+class DatagramReceiver:
+    """
+    数据报接收：帧的分块通过 UDP 到达，直接应用到 FrameReceiver 的帧缓冲区
+
+    丢失的数据报不等待重传：按数据报序号检测缺口，超过乱序等待时间仍未到达的序号通过可靠连接报告给服务器，
+    服务器在下一帧重新发送这些分块的最新内容。每个分块位置记录最后应用的帧序号，
+    乱序晚到的旧分块不会覆盖更新的内容。
+    """
+
+    def __init__(self, address: Tuple[str, int], token: int, receiver: FrameReceiver,
+                 report_lost: Callable[[List[int]], None],
+                 reorder_window: float = 0.03,
+                 max_report: int = 1024,
+                 receive_buffer: int = 4 * 1024 * 1024,
+                 metrics: Optional[MetricsRegistry] = None):
+        """
+        Args:
+            address: 服务器的数据报地址（或测试用中继的地址）
+            token: 握手时服务器分配的会话令牌
+            receiver: 帧缓冲区、最新帧槽位所在的接收流水线
+            report_lost: 通过可靠连接报告丢失的数据报序号
+            reorder_window: 缺失的序号等待乱序到达的时间（秒），超过后报告丢失
+            max_report: 一次报告的最大序号数，丢失更多时改为请求关键帧
+            receive_buffer: 套接字接收缓冲区大小，关键帧会一次到达大量数据报
+            metrics: 记录数据报计数的统计注册表，为 None 时使用 receiver 的注册表
+        """
+        self.address = address
+        self.token = token
+        self.receiver = receiver
+        self.report_lost = report_lost
+        self.reorder_window = reorder_window
+        self.max_report = max_report
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer)
+        except OSError:
+            pass
+        self.sock.bind(('0.0.0.0', 0))
+        self.sock.settimeout(self.reorder_window)
+
+        self.metrics = metrics or receiver.metrics
+        self.rate = self.metrics.rate('datagrams_received')
+        self.metrics.gauge('datagrams', self.stats)
+        self.datagrams_received = 0
+        self.datagrams_lost = 0
+        self.datagrams_reordered = 0
+        self.stale_tiles = 0  # 乱序晚到、已被更新内容覆盖的分块
+        self.invalid = 0
+        self.registered = False
+
+        self._next_seq: Optional[int] = None
+        self._missing: Dict[int, float] = {}  # 缺失的序号 -> 发现缺失的时间
+        # 画面流编号 -> {分块位置: 最后应用的帧序号}
+        self._tile_frames: Dict[int, Dict[Tuple[int, int], int]] = {}
+        # 画面流编号 -> 已应用但尚未发布的帧信息 / 最后发布的帧序号
+        self._unpublished: Dict[int, Dict[str, Any]] = {}
+        self._published: Dict[int, int] = {}
+        self._running = False
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self._running = True
+        self._thread = threading.Thread(target=self._receive_loop, name='datagram-receiver', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(timeout=1.0)
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+    def _register(self) -> None:
+        """从接收端口向服务器发送登记数据报，服务器据此得知发送地址"""
+        try:
+            self.sock.sendto(REGISTER_DATAGRAM.pack(self.token), self.address)
+        except OSError:
+            pass
+
+    def _receive_loop(self) -> None:
+        buffer = bytearray(65536)
+        last_register = 0.0
+        while self._running:
+            # 登记数据报也可能丢失，收到第一个帧数据报之前定期重发
+            if not self.registered and time.monotonic() - last_register >= 0.5:
+                self._register()
+                last_register = time.monotonic()
+            try:
+                size, _ = self.sock.recvfrom_into(buffer)
+            except socket.timeout:
+                size = 0
+            except OSError:
+                break
+            if size >= DATAGRAM_HEADER.size:
+                try:
+                    self._handle(bytes(buffer[:size]), time.time())
+                except Exception:
+                    # 截断或损坏的数据报按丢失处理
+                    self.invalid += 1
+            self._report()
+
+    def _handle(self, data: bytes, received_at: float) -> None:
+        datagram = decode_datagram(data)
+        if datagram['token'] != self.token:
+            return
+        self.registered = True
+        self.datagrams_received += 1
+        self.rate.add(len(data))
+        self._track(datagram['seq'])
+
+        stream, frame_seq = datagram['stream'], datagram['frame']
+        width, height = datagram['size']
+        with self.receiver.image_lock:
+            framebuffer = self.receiver.framebuffers.get(stream)
+            if framebuffer is None:
+                framebuffer = self.receiver.framebuffers[stream] = FrameBuffer()
+            image = framebuffer.image
+            tile_frames = self._tile_frames.setdefault(stream, {})
+            if image is None or image.shape[0] != height or image.shape[1] != width:
+                # 画面大小变化（视口、缩放比例或显示器变化）：分块会逐渐填满新的画面
+                image = framebuffer.image = np.zeros((height, width, 3), dtype=np.uint8)
+                tile_frames.clear()
+            for x, y, tile in datagram['tiles']:
+                if tile_frames.get((x, y), -1) > frame_seq:
+                    self.stale_tiles += 1
+                    continue
+                tile_frames[(x, y)] = frame_seq
+                image[y:y + tile.shape[0], x:x + tile.shape[1]] = tile
+
+        # 帧的最后一个数据报到达时发布；最后一个数据报丢失时，由下一帧的数据报发布。
+        # 乱序晚到的旧帧数据报已经应用到画面上，随下一次发布显示
+        if frame_seq <= self._published.get(stream, 0):
+            return
+        pending = self._unpublished.get(stream)
+        if pending and pending['frame'] < frame_seq:
+            self._publish(pending)
+        frame = {
+            'stream': stream,
+            'frame': frame_seq,
+            'resolution': datagram['resolution'],
+            'timestamp': datagram['timestamp'],
+            'received_at': received_at,
+        }
+        if datagram['flags'] & DATAGRAM_LAST:
+            self._publish(frame)
+        else:
+            self._unpublished[stream] = frame
+
+    def _publish(self, frame: Dict[str, Any]) -> None:
+        self._unpublished.pop(frame['stream'], None)
+        self._published[frame['stream']] = frame['frame']
+        self.receiver.frames_received += 1
+        self.receiver.latest.publish(frame)
+
+    def _track(self, seq: int) -> None:
+        """按数据报序号检测缺口，晚到的数据报从缺失列表中移除"""
+        if self._next_seq is None or seq >= self._next_seq:
+            if self._next_seq is not None and seq > self._next_seq:
+                now = time.monotonic()
+                if seq - self._next_seq > self.max_report:
+                    # 丢失过多（例如长时间中断），逐个报告不如直接重新同步
+                    self._missing.clear()
+                    self.datagrams_lost += seq - self._next_seq
+                    self.receiver.keyframe_requests += 1
+                    self.receiver.request_keyframe()
+                else:
+                    for missing in range(self._next_seq, seq):
+                        self._missing[missing] = now
+            self._next_seq = seq + 1
+        elif self._missing.pop(seq, None) is not None:
+            self.datagrams_reordered += 1
+
+    def _report(self) -> None:
+        """报告等待超过乱序窗口的缺失序号"""
+        if not self._missing:
+            return
+        deadline = time.monotonic() - self.reorder_window
+        lost = [seq for seq, since in self._missing.items() if since <= deadline]
+        if not lost:
+            return
+        for seq in lost:
+            del self._missing[seq]
+        self.datagrams_lost += len(lost)
+        for start in range(0, len(lost), self.max_report):
+            self.report_lost(lost[start:start + self.max_report])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'received': self.datagrams_received,
+            'lost': self.datagrams_lost,
+            'reordered': self.datagrams_reordered,
+            'stale_tiles': self.stale_tiles,
+            'invalid': self.invalid,
+        }
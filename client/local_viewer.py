@@ -0,0 +1,59 @@
+import argparse
+import logging
+import time
+import cv2
+from common.shm import SharedFrameReader
+from common.logs import setup_logging
+
+
+def view(name: str, viewport=None) -> None:
+    """
+    显示本机服务器写入共享内存帧环的画面，直到按下 q
+
+    Args:
+        name: 服务器 shared_memory 参数指定的共享内存名称
+        viewport: 显示窗口大小 (宽, 高)，None 表示按原始大小显示
+    """
+    logger = logging.getLogger(__name__)
+    reader = SharedFrameReader(name)
+    window = f'Local Desktop ({name})'
+    seq = 0
+    frames = 0
+    last_report = time.time()
+    try:
+        while True:
+            frame = reader.read(after=seq, timeout=0.1, copy=False)
+            if frame is not None:
+                seq = frame['seq']
+                image = frame['image']
+                # 零拷贝视图在写入端写满一圈之前有效：缩放或显示会复制像素，之后确认没有被覆盖
+                if viewport and (image.shape[1], image.shape[0]) != tuple(viewport):
+                    image = cv2.resize(image, tuple(viewport))
+                else:
+                    image = image.copy()
+                if reader.valid(frame):
+                    cv2.imshow(window, image)
+                    frames += 1
+            now = time.time()
+            if now - last_report >= 5.0:
+                logger.info(f"FPS={frames / (now - last_report):.1f}, 放弃的帧={reader.frames_torn}")
+                frames = 0
+                last_report = now
+            if cv2.waitKey(1) == ord('q'):
+                break
+    finally:
+        reader.close()
+        cv2.destroyAllWindows()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="显示本机服务器共享内存帧环中的画面")
+    parser.add_argument('name', help="服务器 shared_memory 参数指定的共享内存名称")
+    parser.add_argument('--viewport', type=int, nargs=2, metavar=('WIDTH', 'HEIGHT'))
+    args = parser.parse_args()
+    setup_logging('remote_desktop_local_viewer.log')
+    view(args.name, args.viewport)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+import collections
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+from common.tiles import FrameBuffer, FRAME_KEY
+from common.frames import decode_frame, peek_frame
+from common.protocol import MSG_FRAME
+from common.metrics import MetricsRegistry
+
+
+class LatestFrame:
+    """最新帧槽位：每个画面流只保留最新一帧，渲染线程取走之前就被新帧覆盖的帧计为丢弃"""
+
+    def __init__(self):
+        self.dropped = 0
+        self._items: Dict[int, Dict[str, Any]] = {}
+        self._cond = threading.Condition()
+
+    def publish(self, item: Dict[str, Any]) -> None:
+        with self._cond:
+            if item['stream'] in self._items:
+                self.dropped += 1
+            self._items[item['stream']] = item
+            self._cond.notify()
+
+    def take(self, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """取出各画面流的最新一帧；超时仍没有新帧时返回空列表"""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            items, self._items = self._items, {}
+            return list(items.values())
+
+    def wakeup(self) -> None:
+        with self._cond:
+            self._cond.notify_all()
+
+
+class FrameReceiver:
+    """
+    客户端接收流水线：网络读取线程 -> 解码线程池 -> 合并线程 -> 最新帧槽位
+
+    读取线程只负责读出完整的消息并提交解码，分块解码在线程池中并行执行（zlib 和 cv2 会释放 GIL），
+    合并线程按接收顺序把解码结果应用到帧缓冲区，保证增量帧不会乱序。渲染线程通过 latest 只取最新的画面。
+    服务器发送多个画面流（各个显示器）时，每个画面流有自己的帧缓冲区。
+    解码跟不上时不会越积越多：积压超过 max_pending 帧时整体丢弃，并请求服务器发送关键帧重新同步。
+    每个画面流的帧按接收顺序编号（与服务器的发送顺序一致），applied 记录帧缓冲区合并到的帧序号，
+    断线重连时据此请求服务器只补发之后的内容。
+    """
+
+    def __init__(self, read_message: Callable[[], Tuple[int, bytes]],
+                 request_keyframe: Callable[[], None],
+                 workers: int = 2,
+                 max_pending: int = 4,
+                 drop_backlog: bool = True,
+                 metrics: Optional[MetricsRegistry] = None,
+                 on_message: Optional[Callable[[int, bytes], None]] = None,
+                 framebuffers: Optional[Dict[int, FrameBuffer]] = None,
+                 applied: Optional[Dict[int, int]] = None):
+        """
+        Args:
+            read_message: 读取一条消息，返回 (消息类型, 消息体)；连接断开时抛出异常，数据源正常结束时抛出 EOFError
+            request_keyframe: 请求服务器发送关键帧
+            workers: 解码线程数
+            max_pending: 允许积压的未合并帧数
+            drop_backlog: 积压满时是否丢弃；为 False 时读取线程等待（用于回放文件等没有实时性要求的数据源）
+            metrics: 记录解码耗时和帧计数的统计注册表，为 None 时单独创建
+            on_message: 处理帧以外的消息（如指针消息），在读取线程中调用，消息体视图只在调用期间有效
+            framebuffers: 沿用的帧缓冲区（断线重连时），为 None 时新建
+            applied: 服务器恢复的画面流及其帧序号（断线重连时），这些画面流之后收到的帧从下一个序号继续编号
+        """
+        self.read_message = read_message
+        self.request_keyframe = request_keyframe
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.drop_backlog = drop_backlog
+        self.on_message = on_message
+
+        # 画面流编号 -> 帧缓冲区；合并线程修改帧缓冲区、渲染线程读取帧缓冲区时都需持有此锁
+        self.image_lock = threading.Lock()
+        self.latest = LatestFrame()
+        self.metrics = metrics or MetricsRegistry()
+        self.decode_time = self.metrics.histogram('decode')
+        self.metrics.gauge('frames', self.stats)
+        self.error: Optional[Exception] = None
+
+        self.frames_received = 0
+        self.frames_decoded = 0
+        self.frames_discarded = 0  # 因解码积压而丢弃的帧
+        self.keyframe_requests = 0
+
+        self.framebuffers: Dict[int, FrameBuffer] = framebuffers if framebuffers is not None else {}
+        # 画面流编号 -> 已合并到帧缓冲区的最后一帧的序号
+        self.applied: Dict[int, int] = dict(applied or {})
+        self._received: Dict[int, int] = dict(self.applied)  # 画面流编号 -> 最后收到的帧序号
+        self._running = False
+        self._waiting_keyframe: Set[int] = set()  # 丢弃积压后等待关键帧的画面流
+        self._applying = False
+        self._pending: Deque[Tuple[Any, float, int, int]] = collections.deque()
+        self._cond = threading.Condition()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._threads: List[threading.Thread] = []
+
+    def start(self) -> None:
+        self._running = True
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='decoder')
+        self._threads = [threading.Thread(target=self._read_loop, name='frame-reader', daemon=True),
+                         threading.Thread(target=self._apply_loop, name='frame-merger', daemon=True)]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self) -> None:
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        self.latest.wakeup()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=1.0)
+        if self._executor:
+            self._executor.shutdown(wait=False)
+
+    def is_alive(self) -> bool:
+        return self._running
+
+    def _fail(self, error: Exception) -> None:
+        if self._running and self.error is None:
+            self.error = error
+        self._running = False
+        with self._cond:
+            self._cond.notify_all()
+        self.latest.wakeup()
+
+    def _decode(self, payload: bytes) -> Dict[str, Any]:
+        start_time = time.perf_counter()
+        frame_data = decode_frame(payload)
+        self.decode_time.record(time.perf_counter() - start_time)
+        return frame_data
+
+    def _read_loop(self) -> None:
+        try:
+            while self._running:
+                msg_type, payload = self.read_message()
+                if msg_type != MSG_FRAME:
+                    if self.on_message:
+                        self.on_message(msg_type, payload)
+                    continue
+                received_at = time.time()
+                self.frames_received += 1
+                frame_type, stream = peek_frame(payload)
+                seq = self._received[stream] = self._received.get(stream, 0) + 1
+                is_key = frame_type == FRAME_KEY
+                if stream in self._waiting_keyframe and not is_key:
+                    # 丢弃积压后，帧缓冲区要等关键帧才能继续合并增量帧
+                    self.frames_discarded += 1
+                    continue
+                self._waiting_keyframe.discard(stream)
+                self._submit(payload, received_at, stream, seq, is_key)
+        except EOFError:
+            self._drain()
+        except Exception as e:
+            self._fail(e)
+
+    def _drain(self) -> None:
+        """数据源结束：等待已读取的帧全部合并后停止"""
+        with self._cond:
+            while (self._pending or self._applying) and self._running:
+                self._cond.wait(0.5)
+        self._running = False
+        self.latest.wakeup()
+
+    def _discard(self, streams: Optional[Set[int]] = None) -> Set[int]:
+        """丢弃积压中属于 streams（None 为全部）的帧，返回被丢弃帧的画面流（须持有 _cond）"""
+        discarded: Set[int] = set()
+        kept: Deque[Tuple[Any, float, int, int]] = collections.deque()
+        for item in self._pending:
+            if streams is None or item[2] in streams:
+                item[0].cancel()
+                discarded.add(item[2])
+                self.frames_discarded += 1
+            else:
+                kept.append(item)
+        self._pending = kept
+        return discarded
+
+    def _submit(self, payload: bytes, received_at: float, stream: int, seq: int, is_key: bool) -> None:
+        with self._cond:
+            if not self.drop_backlog:
+                while len(self._pending) >= self.max_pending and self._running:
+                    self._cond.wait(0.5)
+            if is_key:
+                # 关键帧会覆盖该画面流的整个画面，之前积压的同一画面流的帧不必再解码
+                self._discard({stream})
+            if len(self._pending) >= self.max_pending:
+                discarded = self._discard()
+                if not is_key:
+                    self.frames_discarded += 1
+                    discarded.add(stream)
+                if discarded:
+                    self._waiting_keyframe |= discarded
+                    self.keyframe_requests += 1
+                    self.request_keyframe()
+                if not is_key:
+                    return
+            self._pending.append((self._executor.submit(self._decode, payload), received_at, stream, seq))
+            self._cond.notify()
+
+    def _apply_loop(self) -> None:
+        try:
+            while self._running:
+                with self._cond:
+                    if not self._pending:
+                        self._cond.wait(0.5)
+                    if not self._pending:
+                        continue
+                    future, received_at, stream, seq = self._pending.popleft()
+                    self._applying = True
+                    self._cond.notify_all()
+                frame_data = future.result()
+                with self.image_lock:
+                    framebuffer = self.framebuffers.get(stream)
+                    if framebuffer is None:
+                        framebuffer = self.framebuffers[stream] = FrameBuffer()
+                    image = framebuffer.apply(frame_data)
+                self.frames_decoded += 1
+                if image is not None:
+                    self.applied[stream] = seq
+                    self.latest.publish({
+                        'stream': stream,
+                        'resolution': frame_data['resolution'],
+                        'timestamp': frame_data['timestamp'],
+                        'received_at': received_at,
+                    })
+                with self._cond:
+                    self._applying = False
+                    self._cond.notify_all()
+        except Exception as e:
+            self._fail(e)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'received': self.frames_received,
+            'decoded': self.frames_decoded,
+            'dropped': self.latest.dropped,
+            'discarded': self.frames_discarded,
+            'keyframe_requests': self.keyframe_requests,
+        }
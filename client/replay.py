@@ -0,0 +1,92 @@
+import argparse
+import time
+from .client import RemoteDesktopClient
+from .pipeline import FrameReceiver
+from common.protocol import MSG_INPUT, MSG_CONTROL, decode_inputs, decode_control
+from common.recording import SessionReader
+
+
+class SessionPlayer(RemoteDesktopClient):
+    """
+    会话回放：把录制的帧流按时间戳（可加速）送入客户端的解码和渲染流程
+
+    从 start 指定的时间点之前最近的关键帧开始读取，关键帧到 start 之间的帧只合并不等待。
+    """
+
+    def __init__(self, path: str, speed: float = 4.0, start: float = 0.0,
+                 viewport=None, decode_workers: int = 2):
+        """
+        Args:
+            path: 会话录制文件
+            speed: 回放速度倍数，为 0 时不等待、尽快回放
+            start: 从录制开始后的第几秒开始回放
+            viewport: 显示窗口大小 (宽, 高)，None 表示按录制时的画面大小显示
+        """
+        super().__init__(host='', port=0, viewport=viewport, decode_workers=decode_workers, max_pending=8)
+        self.path = path
+        self.speed = speed
+        self.start_offset = start
+        self.reader = None  # 录制文件读取器（self.session 是父类保存的会话恢复令牌）
+        self._records = None
+        self._begin = 0.0
+        self._wall_start = 0.0
+
+    def _read_message(self):
+        """读取下一条记录，按录制时间间隔（除以回放速度）等待（在读取线程中执行）"""
+        record = next(self._records, None)
+        if record is None:
+            raise EOFError
+        timestamp, msg_type, payload = record
+        if self.speed > 0 and timestamp > self._begin:
+            delay = (timestamp - self._begin) / self.speed - (time.perf_counter() - self._wall_start)
+            if delay > 0:
+                time.sleep(delay)
+        if msg_type == MSG_INPUT:
+            self.logger.debug(f"[{timestamp - self._begin:+.3f}s] 输入: {decode_inputs(payload)}")
+        elif msg_type == MSG_CONTROL:
+            self.logger.debug(f"[{timestamp - self._begin:+.3f}s] 控制: {decode_control(payload)}")
+        self.window_bytes += len(payload)
+        return msg_type, payload
+
+    def start(self):
+        """开始回放，直到文件结束或按下 q"""
+        self.reader = SessionReader(self.path)
+        try:
+            first = self.reader.start_time
+            if first is None:
+                self.logger.info("录制文件为空")
+                return
+            self._begin = first + self.start_offset
+            self._records = self.reader.records(self.reader.seek(self._begin))
+            self._wall_start = time.perf_counter()
+            self.logger.info(f"回放 {self.path}（关键帧 {self.reader.keyframes} 个，速度 {self.speed}x）")
+
+            self.running = True
+            # 回放没有实时性要求，积压时等待解码而不是丢帧
+            self.receiver = FrameReceiver(self._read_message, lambda: None, self.decode_workers,
+                                          self.max_pending, drop_backlog=False, metrics=self.metrics,
+                                          on_message=self._handle_message)
+            self.receiver.start()
+            self._render_loop()
+            if self.receiver.error and self.running:
+                self.logger.error(f"回放出错: {self.receiver.error}")
+            else:
+                self.logger.info(f"回放结束: {self.receiver.stats()}")
+        finally:
+            self.stop()
+            self._records = None
+            self.reader.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="回放远程桌面会话录制文件")
+    parser.add_argument('path')
+    parser.add_argument('--speed', type=float, default=4.0, help="回放速度倍数，0 表示尽快回放")
+    parser.add_argument('--start', type=float, default=0.0, help="从录制开始后的第几秒开始")
+    parser.add_argument('--viewport', type=int, nargs=2, metavar=('WIDTH', 'HEIGHT'))
+    args = parser.parse_args()
+    SessionPlayer(args.path, args.speed, args.start, args.viewport).start()
+
+
+if __name__ == "__main__":
+    main()
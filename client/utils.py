@@ -1,33 +1,121 @@
-import pickle
 import socket
+import threading
+import time
 import pyautogui
 from pynput.mouse import Listener as MouseListener, Button
 from pynput.keyboard import Listener as KeyboardListener, Key
-from typing import Dict, Any, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 import logging
+from common.protocol import encode_inputs, send_control
+from common.logs import EventSampler
+
+logger = logging.getLogger(__name__)
 
 class InputHandler:
-    def __init__(self, client_socket: socket.socket):
+    def __init__(self, client_socket: socket.socket, move_interval: float = 0.01):
+        """
+        Args:
+            client_socket: 与服务器的连接
+            move_interval: 鼠标移动合并窗口（秒），窗口内的连续移动只发送最后一个位置；为 0 时逐个发送
+        """
         self.client_socket = client_socket
+        self.move_interval = move_interval
         self.mouse_listener = None
         self.keyboard_listener = None
         self.screen_width, self.screen_height = pyautogui.size()
+        # 输入监听线程和主线程共用同一个socket，待发送的鼠标移动也由此锁保护
+        self.send_lock = threading.Lock()
+        self.pending_move: Optional[Dict[str, Any]] = None
+        self.move_event = threading.Event()
+        self.running = False
+        # 发送的事件只计数并定期汇总，逐个事件的跟踪只在调试级别输出
+        self.sent_events = EventSampler(logger, "已发送输入事件")
 
     def send_input(self, event: Dict[str, Any]) -> None:
-        """发送输入事件到服务器"""
+        """立即发送输入事件到服务器，之前尚未发送的鼠标移动会在同一次写入中先发送"""
+        self.send_inputs([event])
+
+    def send_inputs(self, events: List[Dict[str, Any]]) -> None:
+        """在一次写入中发送一批输入事件"""
+        sock = None
         try:
-            # 添加客户端屏幕分辨率信息
-            event['screen_width'] = self.screen_width
-            event['screen_height'] = self.screen_height
-            event_data = pickle.dumps(event)
-            print(f"Sending event: {event}")  # 添加日志输出
-            self.client_socket.sendall(event_data)
+            with self.send_lock:
+                if self.pending_move is not None:
+                    events = [self.pending_move] + events
+                    self.pending_move = None
+                sock = self.client_socket
+                if not events or sock is None:
+                    return
+                self.sent_events.trace("发送输入事件: %s", events)
+                sock.sendall(encode_inputs(events))
+            self.sent_events.count('events', len(events))
+        except OSError as e:
+            self._connection_lost(sock, e)
         except Exception as e:
-            print(f"发送输入事件失败: {e}")
+            logger.error(f"发送输入事件失败: {e}")
+
+    def set_socket(self, client_socket: Optional[socket.socket]) -> None:
+        """
+        切换到重新建立的连接；为 None 时（连接断开期间）丢弃输入事件和控制消息，
+        断线期间的输入不在重连后补发，几何信息等状态在重连握手时重新发送
+        """
+        with self.send_lock:
+            self.client_socket = client_socket
+            self.pending_move = None
+
+    def refresh_geometry(self) -> bool:
+        """重新查询本机屏幕分辨率，变化时通知服务器；返回是否发生变化"""
+        screen = tuple(pyautogui.size())
+        if screen == (self.screen_width, self.screen_height):
+            return False
+        self.screen_width, self.screen_height = screen
+        self.send_control({'screen': list(screen)})
+        return True
+
+    def queue_move(self, event: Dict[str, Any]) -> None:
+        """记录鼠标移动，由合并线程在窗口结束时发送最新位置"""
+        if self.move_interval <= 0:
+            self.send_input(event)
+            return
+        with self.send_lock:
+            self.pending_move = event
+        self.move_event.set()
+
+    def _flush_moves(self) -> None:
+        """鼠标移动合并线程"""
+        while self.running:
+            if not self.move_event.wait(0.5):
+                continue
+            time.sleep(self.move_interval)
+            self.move_event.clear()
+            self.send_inputs([])
+
+    def send_control(self, message: Dict[str, Any]) -> None:
+        """发送控制消息到服务器"""
+        sock = None
+        try:
+            with self.send_lock:
+                sock = self.client_socket
+                if sock is None:
+                    return
+                send_control(sock, message)
+        except OSError as e:
+            self._connection_lost(sock, e)
+        except Exception as e:
+            logger.error(f"发送控制消息失败: {e}")
+
+    def _connection_lost(self, sock: Optional[socket.socket], error: Exception) -> None:
+        """发送失败说明连接已断开：之后的输入和控制消息直接丢弃，直到 set_socket() 切换到新的连接"""
+        with self.send_lock:
+            if sock is None or self.client_socket is not sock:
+                return
+            self.client_socket = None
+            self.pending_move = None
+        logger.warning(f"连接已断开，暂停发送输入: {error}")
 
     def on_mouse_move(self, x: int, y: int) -> None:
         """处理鼠标移动"""
-        self.send_input({
+        self.queue_move({
             'type': 'mouse',
             'action': 'move',
             'x': x,
@@ -83,10 +171,23 @@ class InputHandler:
             on_release=self.on_release
         )
         
+        self.running = True
+        flush_thread = threading.Thread(target=self._flush_moves)
+        flush_thread.daemon = True
+        flush_thread.start()
+        
         self.mouse_listener.start()
         self.keyboard_listener.start()
         return self.mouse_listener, self.keyboard_listener
 
+    def stop(self):
+        """停止输入监听"""
+        self.running = False
+        if self.mouse_listener:
+            self.mouse_listener.stop()
+        if self.keyboard_listener:
+            self.keyboard_listener.stop()
+
 def start_input_listener(client_socket: socket.socket):
     """创建并启动输入处理器"""
     handler = InputHandler(client_socket)
@@ -0,0 +1,8 @@
+# common/__init__.py
+print("Initializing common package...")
+
+# 定义包级别的变量
+VERSION = "1.0.0"
+
+# 服务端与客户端共用的模块
+#from .tiles import TileDiffer, FrameBuffer
@@ -0,0 +1,258 @@
+import struct
+import threading
+import zlib
+import numpy as np
+from typing import Dict, List, Optional, Type
+from .palette import DEFAULT_BLOCK, DEFAULT_MAX_COLORS, encode_palette, decode_palette
+
+try:
+    import cv2
+except ImportError:  # 服务端可以不安装 opencv，此时只提供无损原始编解码器
+    cv2 = None
+
+try:
+    import lz4.frame as lz4_frame
+except ImportError:
+    lz4_frame = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# 原始像素数据前缀：高、宽、通道数
+RAW_HEADER = struct.Struct('!HHB')
+
+
+class Codec:
+    """图像编解码器基类"""
+
+    name = ''
+    codec_id = 0
+    lossy = False
+
+    def __init__(self, level: int = 1):
+        """
+        Args:
+            level: 无损编解码器的压缩级别，有损编解码器忽略此参数
+        """
+        self.level = level
+
+    def encode(self, image: np.ndarray, quality: int = 75) -> bytes:
+        """
+        编码图像
+
+        Args:
+            image: 图像数组 (H, W, C)
+            quality: 有损编解码器的图像质量（1-100），无损编解码器忽略此参数
+        """
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> np.ndarray:
+        """解码图像"""
+        raise NotImplementedError
+
+
+class RawCodec(Codec):
+    """原始像素 + 通用压缩算法"""
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def decompress(self, data: bytes) -> bytes:
+        raise NotImplementedError
+
+    def encode(self, image: np.ndarray, quality: int = 75) -> bytes:
+        image = np.ascontiguousarray(image)
+        channels = image.shape[2] if image.ndim == 3 else 1
+        header = RAW_HEADER.pack(image.shape[0], image.shape[1], channels)
+        return header + self.compress(image.data)
+
+    def decode(self, data: bytes) -> np.ndarray:
+        height, width, channels = RAW_HEADER.unpack_from(data)
+        raw = self.decompress(memoryview(data)[RAW_HEADER.size:])
+        image = np.frombuffer(raw, dtype=np.uint8)
+        if channels == 1:
+            return image.reshape(height, width)
+        return image.reshape(height, width, channels)
+
+
+class ZlibCodec(RawCodec):
+    name = 'zlib'
+    codec_id = 1
+
+    def compress(self, data: bytes) -> bytes:
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class Lz4Codec(RawCodec):
+    name = 'lz4'
+    codec_id = 2
+
+    def compress(self, data: bytes) -> bytes:
+        return lz4_frame.compress(data, compression_level=self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return lz4_frame.decompress(data)
+
+
+class ZstdCodec(RawCodec):
+    name = 'zstd'
+    codec_id = 3
+
+    def __init__(self, level: int = 1):
+        super().__init__(level)
+        # zstandard 的压缩、解压上下文不是线程安全的，而同一个实例会被多个编码线程（解码线程）共用，
+        # 每个线程使用自己的上下文
+        self._local = threading.local()
+
+    def compress(self, data: bytes) -> bytes:
+        compressor = getattr(self._local, 'compressor', None)
+        if compressor is None:
+            compressor = self._local.compressor = zstandard.ZstdCompressor(level=self.level)
+        return compressor.compress(data)
+
+    def decompress(self, data: bytes) -> bytes:
+        decompressor = getattr(self._local, 'decompressor', None)
+        if decompressor is None:
+            decompressor = self._local.decompressor = zstandard.ZstdDecompressor()
+        return decompressor.decompress(data)
+
+
+class ImageCodec(Codec):
+    """基于 cv2.imencode/imdecode 的图像格式"""
+
+    extension = ''
+
+    def encode_params(self, quality: int) -> List[int]:
+        return []
+
+    def encode(self, image: np.ndarray, quality: int = 75) -> bytes:
+        ok, buffer = cv2.imencode(self.extension, image, self.encode_params(quality))
+        if not ok:
+            raise ValueError(f"{self.name} 编码失败")
+        return buffer.tobytes()
+
+    def decode(self, data: bytes) -> np.ndarray:
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_UNCHANGED)
+        if image is None:
+            raise ValueError(f"{self.name} 解码失败")
+        return image
+
+
+class PngCodec(ImageCodec):
+    name = 'png'
+    codec_id = 4
+    extension = '.png'
+
+    def encode_params(self, quality: int) -> List[int]:
+        return [cv2.IMWRITE_PNG_COMPRESSION, max(0, min(9, self.level))]
+
+
+class JpegCodec(ImageCodec):
+    name = 'jpeg'
+    codec_id = 5
+    lossy = True
+    extension = '.jpg'
+
+    def encode_params(self, quality: int) -> List[int]:
+        return [cv2.IMWRITE_JPEG_QUALITY, max(1, min(100, quality))]
+
+
+class WebpCodec(ImageCodec):
+    name = 'webp'
+    codec_id = 6
+    lossy = True
+    extension = '.webp'
+
+    def encode_params(self, quality: int) -> List[int]:
+        return [cv2.IMWRITE_WEBP_QUALITY, max(1, min(100, quality))]
+
+
+class PaletteCodec(Codec):
+    """
+    面向桌面 UI 的混合编码：颜色少的块（文字、纯色背景、图标）无损地编码为调色板索引的游程，
+    颜色多的照片类块拼成图集后按 JPEG 编码。文字保持清晰，照片和视频区域仍有有损压缩的码率
+    """
+
+    name = 'palette'
+    codec_id = 7
+    lossy = True
+
+    def __init__(self, level: int = 1, block: int = DEFAULT_BLOCK, max_colors: int = DEFAULT_MAX_COLORS):
+        """
+        Args:
+            level: 调色板数据的 zlib 压缩级别
+            block: 分类和编码的块边长（像素），与分块差异的分块大小一致时每个增量分块正好一块
+            max_colors: 按调色板编码的块的最大颜色数，更多颜色的块按 JPEG 编码
+        """
+        super().__init__(level)
+        self.block = block
+        self.max_colors = max_colors
+        self._atlas = JpegCodec()
+
+    def encode(self, image: np.ndarray, quality: int = 75) -> bytes:
+        return encode_palette(image, lambda atlas: self._atlas.encode(atlas, quality),
+                              self.block, self.max_colors, self.level)
+
+    def decode(self, data: bytes) -> np.ndarray:
+        return decode_palette(data, self._atlas.decode)
+
+
+# 编解码器注册表：名称 -> 类
+CODECS: Dict[str, Type[Codec]] = {}
+
+
+def register_codec(codec_class: Type[Codec]) -> Type[Codec]:
+    """注册编解码器"""
+    CODECS[codec_class.name] = codec_class
+    return codec_class
+
+
+register_codec(ZlibCodec)
+if lz4_frame is not None:
+    register_codec(Lz4Codec)
+if zstandard is not None:
+    register_codec(ZstdCodec)
+if cv2 is not None:
+    register_codec(PngCodec)
+    register_codec(JpegCodec)
+    register_codec(WebpCodec)
+    register_codec(PaletteCodec)
+
+# 默认偏好顺序：无损优先。分块差异以精确像素为参考帧，有损编码在之后没有变化的区域留下的失真
+# 要到下一个关键帧才会消除，因此有损编解码器只在客户端显式选择时使用
+DEFAULT_CODEC_PREFERENCE = ['lz4', 'zstd', 'zlib', 'png', 'jpeg', 'webp']
+
+
+def available_codecs() -> List[str]:
+    """当前环境可用的编解码器名称"""
+    return list(CODECS)
+
+
+def create_codec(name: str, level: int = 1) -> Codec:
+    """按名称创建编解码器实例"""
+    if name not in CODECS:
+        raise ValueError(f"不支持的编解码器: {name}")
+    return CODECS[name](level)
+
+
+def codec_by_id(codec_id: int) -> Type[Codec]:
+    """按编号查找编解码器类"""
+    for codec_class in CODECS.values():
+        if codec_class.codec_id == codec_id:
+            return codec_class
+    raise ValueError(f"未知的编解码器编号: {codec_id}")
+
+
+def negotiate_codec(client_codecs: List[str], server_codecs: Optional[List[str]] = None) -> str:
+    """选择客户端偏好列表中第一个服务端也支持的编解码器"""
+    if server_codecs is None:
+        server_codecs = available_codecs()
+    for name in client_codecs:
+        if name in server_codecs:
+            return name
+    return ZlibCodec.name
@@ -0,0 +1,45 @@
+import struct
+import zlib
+import numpy as np
+from typing import Any, Dict, Optional, Tuple
+
+# 指针消息（MSG_CURSOR）：指针不画进帧里，位置和形状作为单独的轻量消息发送，由客户端绘制在最后一帧上
+#   消息头：画面流编号、指针相对画面流区域左上角的位置 x、y（屏幕坐标，超出区域表示指针不在该画面中）、
+#           区域宽、高、形状编号
+#   形状变化后的第一条消息在消息头之后附带形状：热点 x、y、宽、高，以及 zlib 压缩的 RGBA 像素
+CURSOR_HEADER = struct.Struct('!BiiHHH')
+CURSOR_SHAPE = struct.Struct('!HHHH')
+
+
+def encode_cursor(stream: int, position: Tuple[int, int], region: Tuple[int, int], shape_id: int,
+                  hotspot: Optional[Tuple[int, int]] = None, image: Optional[np.ndarray] = None) -> bytes:
+    """
+    编码一条指针消息
+
+    Args:
+        stream: 画面流编号
+        position: 指针相对画面流区域左上角的位置（屏幕坐标）
+        region: 画面流区域的宽、高（屏幕坐标）
+        shape_id: 形状编号，客户端按编号缓存形状
+        hotspot: 形状的热点，与 image 一起在形状变化时附带
+        image: 形状的 (H, W, 4) RGBA 像素
+    """
+    header = CURSOR_HEADER.pack(stream, position[0], position[1], region[0], region[1], shape_id)
+    if image is None:
+        return header
+    height, width = image.shape[:2]
+    return (header + CURSOR_SHAPE.pack(hotspot[0], hotspot[1], width, height)
+            + zlib.compress(np.ascontiguousarray(image, dtype=np.uint8).tobytes()))
+
+
+def decode_cursor(payload: bytes) -> Dict[str, Any]:
+    """解码指针消息，附带形状时包含 'hotspot' 和 'image'"""
+    view = memoryview(payload)
+    stream, x, y, width, height, shape_id = CURSOR_HEADER.unpack_from(view)
+    cursor: Dict[str, Any] = {'stream': stream, 'position': (x, y), 'region': (width, height), 'shape': shape_id}
+    if len(view) > CURSOR_HEADER.size:
+        hot_x, hot_y, shape_width, shape_height = CURSOR_SHAPE.unpack_from(view, CURSOR_HEADER.size)
+        pixels = zlib.decompress(view[CURSOR_HEADER.size + CURSOR_SHAPE.size:])
+        cursor['hotspot'] = (hot_x, hot_y)
+        cursor['image'] = np.frombuffer(pixels, dtype=np.uint8).reshape(shape_height, shape_width, 4)
+    return cursor
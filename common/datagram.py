@@ -0,0 +1,111 @@
+import struct
+import numpy as np
+from typing import Any, Dict, List, Tuple
+from .codecs import Codec, codec_by_id
+from .frames import TILE_HEADER
+from .tiles import FRAME_KEY
+
+# 数据报传输：帧的分块通过 UDP 发送，每个数据报自成一体，可以独立解码和应用。
+# 丢失的数据报不重传：客户端通过可靠连接（TCP 控制消息）报告丢失的数据报序号，
+# 服务器把其中的分块标记为失效，在下一帧发送这些位置的最新内容；关键帧同样可以修复。
+#   数据报头：会话令牌、数据报序号、帧序号、画面流编号、编解码器编号、服务器屏幕宽、高、画面宽、高、
+#             捕获时间戳、标志、分块数；之后是分块（分块头与帧消息相同）
+DATAGRAM_HEADER = struct.Struct('!IIIBBHHHHdBB')
+# 客户端登记地址的数据报：会话令牌
+REGISTER_DATAGRAM = struct.Struct('!I')
+
+DATAGRAM_LAST = 0x1  # 帧的最后一个数据报
+DATAGRAM_KEY = 0x2   # 关键帧（包含全部分块）
+
+# 数据报体的目标大小，不超过常见路径 MTU；单个分块更大时单独发送（依赖 IP 分片）
+MAX_DATAGRAM_SIZE = 1200
+
+
+def split_tiles(image: np.ndarray, tile_size: int) -> List[Tuple[int, int, np.ndarray]]:
+    """把整幅画面切分为分块 (x, y, tile)，用于通过数据报发送关键帧"""
+    height, width = image.shape[:2]
+    return [(x, y, image[y:y + tile_size, x:x + tile_size])
+            for y in range(0, height, tile_size)
+            for x in range(0, width, tile_size)]
+
+
+def encode_datagrams(frame_data: Dict[str, Any], codec: Codec, quality: int, tile_size: int,
+                     max_size: int = MAX_DATAGRAM_SIZE) -> Dict[str, Any]:
+    """
+    编码帧的分块并按大小打包为数据报体（数据报头在发送时加上）
+
+    Args:
+        frame_data: 分块差异编码器输出的帧数据，须包含 'size'（画面宽、高）；增量帧不能包含复制矩形
+        max_size: 数据报体的目标大小
+
+    Returns:
+        {'stream', 'resolution', 'size', 'codec', 'timestamp', 'key', 'packets': [(分块位置列表, 数据报体), ...]}
+    """
+    is_key = frame_data.get('type', FRAME_KEY) == FRAME_KEY
+    tiles = split_tiles(frame_data['image'], tile_size) if is_key else frame_data['tiles']
+    packets: List[Tuple[List[Tuple[int, int]], bytes]] = []
+    positions: List[Tuple[int, int]] = []
+    parts: List[bytes] = []
+    size = 0
+    for x, y, tile in tiles:
+        payload = codec.encode(np.ascontiguousarray(tile), quality)
+        length = TILE_HEADER.size + len(payload)
+        if parts and (size + length > max_size or len(positions) == 255):
+            packets.append((positions, b''.join(parts)))
+            positions, parts, size = [], [], 0
+        positions.append((x, y))
+        parts.append(TILE_HEADER.pack(x, y, len(payload)))
+        parts.append(payload)
+        size += length
+    if parts:
+        packets.append((positions, b''.join(parts)))
+    return {
+        'stream': frame_data.get('stream', 0),
+        'resolution': frame_data['resolution'],
+        'size': frame_data['size'],
+        'codec': codec.codec_id,
+        'timestamp': frame_data.get('timestamp') or 0.0,
+        'key': is_key,
+        'packets': packets,
+    }
+
+
+def pack_datagram(token: int, seq: int, frame_seq: int, frame: Dict[str, Any], flags: int,
+                  count: int, body: bytes) -> bytes:
+    """加上数据报头"""
+    width, height = frame['resolution']
+    image_width, image_height = frame['size']
+    return DATAGRAM_HEADER.pack(token, seq, frame_seq, frame['stream'], frame['codec'], width, height,
+                                image_width, image_height, frame['timestamp'], flags, count) + body
+
+
+# 客户端解码器缓存：编解码器编号 -> 实例
+_decoders: Dict[int, Codec] = {}
+
+
+def decode_datagram(data: bytes) -> Dict[str, Any]:
+    """解码数据报，返回数据报头字段和 'tiles': [(x, y, tile), ...]"""
+    view = memoryview(data)
+    (token, seq, frame_seq, stream, codec_id, width, height, image_width, image_height,
+     timestamp, flags, count) = DATAGRAM_HEADER.unpack_from(view)
+    codec = _decoders.get(codec_id)
+    if codec is None:
+        codec = _decoders[codec_id] = codec_by_id(codec_id)()
+    offset = DATAGRAM_HEADER.size
+    tiles: List[Tuple[int, int, np.ndarray]] = []
+    for _ in range(count):
+        x, y, length = TILE_HEADER.unpack_from(view, offset)
+        offset += TILE_HEADER.size
+        tiles.append((x, y, codec.decode(view[offset:offset + length])))
+        offset += length
+    return {
+        'token': token,
+        'seq': seq,
+        'frame': frame_seq,
+        'stream': stream,
+        'resolution': (width, height),
+        'size': (image_width, image_height),
+        'timestamp': timestamp,
+        'flags': flags,
+        'tiles': tiles,
+    }
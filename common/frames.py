@@ -0,0 +1,94 @@
+import struct
+import time
+import numpy as np
+from typing import Any, Dict, List, Tuple
+from .codecs import Codec, codec_by_id
+from .tiles import FRAME_KEY, FRAME_DELTA
+
+# 帧消息头：帧类型、编解码器编号、服务器屏幕宽、高、分块数、捕获时间戳（服务器 time.time()）、
+# 画面流编号（0 为整个屏幕，其它为显示器编号）、复制矩形数
+FRAME_HEADER = struct.Struct('!BBHHHdBB')
+# 复制矩形：源 x、源 y、目标 x、目标 y、宽、高（在分块之前，客户端先于分块应用）
+COPY_RECT = struct.Struct('!HHHHHH')
+# 分块头：x、y、编码后数据长度
+TILE_HEADER = struct.Struct('!HHI')
+
+FRAME_TYPES = {FRAME_KEY: 0, FRAME_DELTA: 1}
+FRAME_TYPE_NAMES = {value: key for key, value in FRAME_TYPES.items()}
+
+# 客户端解码器缓存：编解码器编号 -> 实例
+_decoders: Dict[int, Codec] = {}
+
+
+def encode_frame(frame_data: Dict[str, Any], codec: Codec, quality: int = 75) -> bytes:
+    """
+    将关键帧或增量帧编码为二进制帧消息
+
+    Args:
+        frame_data: 包含 'type'、'resolution' 以及 'image' 或 'tiles' 的帧数据，
+                    可选的 'timestamp' 为捕获时间，缺省时使用当前时间；可选的 'stream' 为画面流编号
+        codec: 用于编码图像数据的编解码器
+        quality: 有损编解码器的图像质量
+    """
+    frame_type = frame_data.get('type', FRAME_KEY)
+    if frame_type == FRAME_KEY:
+        tiles = [(0, 0, frame_data['image'])]
+        copies = []
+    else:
+        tiles = frame_data['tiles']
+        copies = frame_data.get('copies', [])
+    width, height = frame_data['resolution']
+    timestamp = frame_data.get('timestamp') or time.time()
+
+    parts = [FRAME_HEADER.pack(FRAME_TYPES[frame_type], codec.codec_id, width, height, len(tiles), timestamp,
+                               frame_data.get('stream', 0), len(copies))]
+    parts.extend(COPY_RECT.pack(*rect) for rect in copies)
+    for x, y, tile in tiles:
+        payload = codec.encode(tile, quality)
+        parts.append(TILE_HEADER.pack(x, y, len(payload)))
+        parts.append(payload)
+    return b''.join(parts)
+
+
+def peek_frame_type(data: bytes) -> str:
+    """只读取帧消息头中的帧类型，不解码图像数据"""
+    return FRAME_TYPE_NAMES[FRAME_HEADER.unpack_from(data)[0]]
+
+
+def peek_frame(data: bytes) -> Tuple[str, int]:
+    """只读取帧消息头中的帧类型和画面流编号"""
+    header = FRAME_HEADER.unpack_from(data)
+    return FRAME_TYPE_NAMES[header[0]], header[6]
+
+
+def decode_frame(data: bytes) -> Dict[str, Any]:
+    """解码二进制帧消息，返回与 FrameBuffer.apply 兼容的帧数据"""
+    view = memoryview(data)
+    frame_type, codec_id, width, height, count, timestamp, stream, copy_count = FRAME_HEADER.unpack_from(view)
+    codec = _decoders.get(codec_id)
+    if codec is None:
+        codec = _decoders[codec_id] = codec_by_id(codec_id)()
+
+    offset = FRAME_HEADER.size
+    copies = [COPY_RECT.unpack_from(view, offset + i * COPY_RECT.size) for i in range(copy_count)]
+    offset += copy_count * COPY_RECT.size
+    tiles: List[Tuple[int, int, np.ndarray]] = []
+    for _ in range(count):
+        x, y, length = TILE_HEADER.unpack_from(view, offset)
+        offset += TILE_HEADER.size
+        tiles.append((x, y, codec.decode(view[offset:offset + length])))
+        offset += length
+
+    frame_data: Dict[str, Any] = {
+        'type': FRAME_TYPE_NAMES[frame_type],
+        'resolution': (width, height),
+        'codec': codec.name,
+        'timestamp': timestamp,
+        'stream': stream,
+    }
+    if frame_data['type'] == FRAME_KEY:
+        frame_data['image'] = tiles[0][2]
+    else:
+        frame_data['copies'] = copies
+        frame_data['tiles'] = tiles
+    return frame_data
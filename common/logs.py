@@ -0,0 +1,110 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+from collections import Counter
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional, TextIO
+
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# 所有日志记录先放入队列，由 QueueListener 后台线程格式化并写入控制台和文件
+_listener: Optional[QueueListener] = None
+_files: Dict[str, logging.Handler] = {}
+_setup_lock = threading.Lock()
+
+
+def setup_logging(log_file: Optional[str] = None, debug: bool = False,
+                  stream: Optional[TextIO] = None) -> None:
+    """
+    配置非阻塞日志：调用线程只把记录放入队列，控制台和文件 I/O 在后台线程完成
+
+    可以多次调用，每个日志文件只添加一次；会替换 root logger 上已有的处理器（例如 basicConfig 添加的）。
+
+    Args:
+        log_file: 日志文件，为 None 时只输出到控制台
+        debug: 是否开启调试级别日志（包括逐个输入事件的跟踪）
+        stream: 控制台输出流，默认 sys.stderr
+    """
+    global _listener
+    root = logging.getLogger()
+    with _setup_lock:
+        if _listener is None:
+            log_queue: queue.SimpleQueue = queue.SimpleQueue()
+            console = logging.StreamHandler(stream)
+            console.setFormatter(logging.Formatter(LOG_FORMAT))
+            _listener = QueueListener(log_queue, console, respect_handler_level=True)
+            for handler in root.handlers[:]:
+                root.removeHandler(handler)
+            root.addHandler(QueueHandler(log_queue))
+            _listener.start()
+            atexit.register(stop_logging)
+        if log_file:
+            add_log_file(log_file)
+        root.setLevel(logging.DEBUG if debug else logging.INFO)
+
+
+def add_log_file(path: str, logger_name: Optional[str] = None) -> None:
+    """
+    添加日志文件（须先调用 setup_logging）
+
+    Args:
+        path: 日志文件路径
+        logger_name: 只写入该 logger 及其子 logger 的记录，为 None 时写入所有记录
+    """
+    if _listener is None or path in _files:
+        return
+    handler = logging.FileHandler(path, encoding='utf-8')
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    if logger_name:
+        handler.addFilter(logging.Filter(logger_name))
+    _files[path] = handler
+    _listener.handlers = _listener.handlers + (handler,)
+
+
+def stop_logging() -> None:
+    """写完队列中剩余的日志并关闭文件"""
+    global _listener
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+        _files.clear()
+
+
+class EventSampler:
+    """
+    热路径事件计数器：按类别累计，每隔 interval 秒汇总为一行日志，代替逐个事件写日志
+
+    调试级别开启时，trace() 仍会逐个记录事件。
+    """
+
+    def __init__(self, logger: logging.Logger, name: str, interval: float = 10.0):
+        self.logger = logger
+        self.name = name
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self.total = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def count(self, key: str, amount: int = 1) -> None:
+        with self._lock:
+            self.counts[key] += amount
+            self.total += amount
+            now = time.monotonic()
+            if now - self._last_flush < self.interval:
+                return
+            counts, self.counts = self.counts, Counter()
+            elapsed, self._last_flush = now - self._last_flush, now
+        summary = ', '.join(f"{key}={value}" for key, value in counts.most_common())
+        self.logger.info(f"{self.name}（最近 {elapsed:.0f} 秒）: {summary}")
+
+    def trace(self, message: str, *args) -> None:
+        """逐个事件的调试日志，未开启调试级别时几乎没有开销"""
+        if self.logger.isEnabledFor(logging.DEBUG):
+            self.logger.debug(message, *args)
@@ -0,0 +1,285 @@
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+# 共享的性能统计：各阶段耗时直方图、滑动窗口速率、计数器
+# 记录操作只是一次二分查找加几次整数运算，可以在生产环境中常开
+
+
+def _log_bounds(low: float, high: float, factor: float) -> List[float]:
+    bounds = []
+    value = low
+    while value < high:
+        bounds.append(value)
+        value *= factor
+    bounds.append(high)
+    return bounds
+
+
+# 耗时直方图的桶上界（秒）：0.1ms 到 10s，相邻桶相差约 1.5 倍
+LATENCY_BOUNDS = _log_bounds(0.0001, 10.0, 1.5)
+# 字节数直方图的桶上界：256B 到 64MB，相邻桶相差 2 倍
+SIZE_BOUNDS = _log_bounds(256, 64 * 1024 * 1024, 2.0)
+
+
+class Histogram:
+    """固定分桶直方图，用桶上界估算分位数，内存占用固定"""
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BOUNDS, scale: float = 1000.0, unit: str = 'ms'):
+        """
+        Args:
+            bounds: 递增的桶上界（记录值的单位），超过最后一个上界的值计入溢出桶
+            scale: 输出时乘以的系数，例如秒 -> 毫秒为 1000
+            unit: 输出字段名的单位后缀
+        """
+        self.bounds = list(bounds)
+        self.scale = scale
+        self.unit = unit
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last = 0.0
+        self.recent = 0.0  # 指数滑动平均，反映最近的取值
+        self._counts = [0] * (len(self.bounds) + 1)
+        self._lock = threading.Lock()
+
+    def record(self, value: float) -> None:
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.total += value
+            self.last = value
+            self.recent = value if self.count == 1 else self.recent + 0.2 * (value - self.recent)
+            if value > self.max:
+                self.max = value
+
+    def reset(self) -> None:
+        with self._lock:
+            self.count = 0
+            self.total = self.max = self.last = self.recent = 0.0
+            self._counts = [0] * (len(self.bounds) + 1)
+
+    def percentile(self, fraction: float) -> float:
+        """估算分位数（返回所在桶的上界，溢出桶返回最大值），单位与记录值相同"""
+        with self._lock:
+            if not self.count:
+                return 0.0
+            target = fraction * self.count
+            seen = 0
+            for index, count in enumerate(self._counts):
+                seen += count
+                if seen >= target and count:
+                    return min(self.bounds[index], self.max) if index < len(self.bounds) else self.max
+            return self.max
+
+    def snapshot(self) -> Dict[str, float]:
+        unit, scale = self.unit, self.scale
+        with self._lock:
+            count, total, maximum, last, recent = self.count, self.total, self.max, self.last, self.recent
+        return {
+            'count': count,
+            f'avg_{unit}': total / count * scale if count else 0.0,
+            f'p50_{unit}': self.percentile(0.5) * scale,
+            f'p90_{unit}': self.percentile(0.9) * scale,
+            f'p99_{unit}': self.percentile(0.99) * scale,
+            f'max_{unit}': maximum * scale,
+            f'last_{unit}': last * scale,
+            f'recent_{unit}': recent * scale,
+        }
+
+
+class RollingRate:
+    """滑动窗口速率：按秒分槽统计次数和数量（如字节数），同时保留累计值"""
+
+    def __init__(self, window: int = 5):
+        """
+        Args:
+            window: 窗口长度（秒）
+        """
+        self.window = max(1, window)
+        self.total = 0
+        self.total_amount = 0
+        self.started = time.monotonic()
+        self._seconds = [-1] * (self.window + 1)
+        self._counts = [0] * (self.window + 1)
+        self._amounts = [0] * (self.window + 1)
+        self._lock = threading.Lock()
+
+    def add(self, amount: int = 0) -> None:
+        second = int(time.monotonic())
+        slot = second % len(self._seconds)
+        with self._lock:
+            if self._seconds[slot] != second:
+                self._seconds[slot] = second
+                self._counts[slot] = 0
+                self._amounts[slot] = 0
+            self._counts[slot] += 1
+            self._amounts[slot] += amount
+            self.total += 1
+            self.total_amount += amount
+
+    def reset(self) -> None:
+        with self._lock:
+            self.total = self.total_amount = 0
+            self.started = time.monotonic()
+            self._seconds = [-1] * (self.window + 1)
+
+    def rates(self) -> Dict[str, float]:
+        """最近 window 秒（不含当前未结束的一秒）的每秒次数和数量，以及累计平均值"""
+        now = time.monotonic()
+        current = int(now)
+        with self._lock:
+            count = amount = 0
+            for second, slot_count, slot_amount in zip(self._seconds, self._counts, self._amounts):
+                if current - self.window <= second < current:
+                    count += slot_count
+                    amount += slot_amount
+            total, total_amount = self.total, self.total_amount
+        span = min(self.window, max(now - self.started, 1e-3))
+        lifetime = max(now - self.started, 1e-3)
+        return {
+            'per_sec': count / span,
+            'amount_per_sec': amount / span,
+            'total': total,
+            'total_amount': total_amount,
+            'avg_per_sec': total / lifetime,
+            'avg_amount_per_sec': total_amount / lifetime,
+        }
+
+
+class Counter:
+    """单调递增计数器"""
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def reset(self) -> None:
+        with self._lock:
+            self.value = 0
+
+
+class MetricsRegistry:
+    """按名称管理直方图、速率和计数器，可导出为 JSON 或通过本地 HTTP 端点查看"""
+
+    def __init__(self):
+        self.histograms: Dict[str, Histogram] = {}
+        self.rates: Dict[str, RollingRate] = {}
+        self.counters: Dict[str, Counter] = {}
+        self.gauges: Dict[str, Callable[[], Any]] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name: str, bounds: Sequence[float] = LATENCY_BOUNDS,
+                  scale: float = 1000.0, unit: str = 'ms') -> Histogram:
+        """获取或创建耗时直方图（记录秒，输出毫秒）；字节数等其它取值可指定 bounds/scale/unit"""
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            with self._lock:
+                histogram = self.histograms.setdefault(name, Histogram(bounds, scale, unit))
+        return histogram
+
+    def size_histogram(self, name: str) -> Histogram:
+        """获取或创建字节数直方图"""
+        return self.histogram(name, SIZE_BOUNDS, 1.0, 'bytes')
+
+    def rate(self, name: str, window: int = 5) -> RollingRate:
+        rate = self.rates.get(name)
+        if rate is None:
+            with self._lock:
+                rate = self.rates.setdefault(name, RollingRate(window))
+        return rate
+
+    def counter(self, name: str) -> Counter:
+        counter = self.counters.get(name)
+        if counter is None:
+            with self._lock:
+                counter = self.counters.setdefault(name, Counter())
+        return counter
+
+    def gauge(self, name: str, read: Callable[[], Any]) -> None:
+        """注册在导出时读取的值，例如队列长度或其它对象维护的丢帧计数"""
+        self.gauges[name] = read
+
+    def reset(self) -> None:
+        """清空已记录的值（例如基准测试预热结束时），已创建的直方图、速率和计数器仍然有效"""
+        for item in list(self.histograms.values()) + list(self.rates.values()) + list(self.counters.values()):
+            item.reset()
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """记录代码块耗时到直方图 name"""
+        histogram = self.histogram(name)
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogram.record(time.perf_counter() - start_time)
+
+    def snapshot(self) -> Dict[str, Any]:
+        gauges = {}
+        for name, read in list(self.gauges.items()):
+            try:
+                gauges[name] = read()
+            except Exception as e:
+                gauges[name] = f"error: {e}"
+        return {
+            'timestamp': time.time(),
+            'histograms': {name: h.snapshot() for name, h in list(self.histograms.items())},
+            'rates': {name: r.rates() for name, r in list(self.rates.items())},
+            'counters': {name: c.value for name, c in list(self.counters.items())},
+            'gauges': gauges,
+        }
+
+    def to_json(self, indent: Optional[int] = None) -> str:
+        return json.dumps(self.snapshot(), indent=indent, ensure_ascii=False, default=str)
+
+    def dump(self, path: str) -> None:
+        """把当前统计写入 JSON 文件"""
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(self.to_json(indent=2))
+
+
+class MetricsServer:
+    """本地 HTTP 统计端点：GET /metrics 返回 JSON"""
+
+    def __init__(self, registry: MetricsRegistry, port: int, host: str = '127.0.0.1'):
+        self.registry = registry
+        registry_ref = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = registry_ref.to_json(indent=2).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # 不把每次抓取写入日志
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='metrics-http', daemon=True)
+
+    def start(self) -> 'MetricsServer':
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
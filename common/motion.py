@@ -0,0 +1,138 @@
+import numpy as np
+from typing import Callable, Optional, Tuple
+
+# 滚动/拖动检测：在发生变化的区域内按行（或列）哈希匹配上一帧，找出整体平移的内容，
+# 用“从 (源 x, 源 y) 复制矩形”的指令代替重新编码平移后的像素，只需再发送新露出的部分
+
+# 复制矩形：(源 x, 源 y, 目标 x, 目标 y, 宽, 高)
+CopyRect = Tuple[int, int, int, int, int, int]
+
+# 计算行哈希时每隔几列取一列：哈希只用于寻找候选平移量，抽样不影响结果的正确性
+HASH_SAMPLE_STEP = 4
+
+
+def changed_pixels(prev: np.ndarray, curr: np.ndarray) -> np.ndarray:
+    """逐像素比较两帧，返回 (H, W) 的布尔矩阵"""
+    diff = prev != curr
+    if diff.ndim == 3:
+        # any(axis=2) 在只有 3 个元素的最内层轴上归约很慢，逐通道按位或要快得多
+        channels = diff
+        diff = channels[..., 0]
+        for channel in range(1, channels.shape[2]):
+            diff = diff | channels[..., channel]
+    return diff
+
+
+def row_hashes(band: np.ndarray, step: int = HASH_SAMPLE_STEP) -> np.ndarray:
+    """每一行像素的哈希值，每隔 step 列取一列（只用于寻找候选平移量，匹配结果会再逐像素确认）"""
+    flat = np.ascontiguousarray(band[:, ::step]).reshape(band.shape[0], -1)
+    return np.fromiter((hash(row.tobytes()) for row in flat), dtype=np.int64, count=flat.shape[0])
+
+
+def _vote_shift(prev_hashes: np.ndarray, curr_hashes: np.ndarray) -> Optional[int]:
+    """按行哈希匹配投票，返回最可能的平移量（curr 第 i 行来自 prev 第 i + shift 行）"""
+    # 只用在上一帧中唯一的行投票：纯色背景、空行等重复的行可以匹配到任意位置
+    values, index, counts = np.unique(prev_hashes, return_index=True, return_counts=True)
+    values, index = values[counts == 1], index[counts == 1]
+    if not len(values):
+        return None
+    pos = np.minimum(np.searchsorted(values, curr_hashes), len(values) - 1)
+    found = values[pos] == curr_hashes
+    shifts = index[pos[found]] - np.flatnonzero(found)
+    shifts = shifts[shifts != 0]
+    if len(shifts) < 2:
+        return None
+    length = len(curr_hashes)
+    votes = np.bincount(shifts + length)
+    shift = int(votes.argmax())
+    if votes[shift] < 2:
+        return None
+    return shift - length
+
+
+def _longest_run(same: np.ndarray) -> Tuple[int, int]:
+    """布尔序列中最长的连续 True 区间 [start, end)，没有时返回 (0, 0)"""
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], same.astype(np.int8), [0]))))
+    if not len(edges):
+        return 0, 0
+    starts, ends = edges[0::2], edges[1::2]
+    best = int(np.argmax(ends - starts))
+    return int(starts[best]), int(ends[best])
+
+
+def _find_shift(prev_hashes: np.ndarray, curr_hashes: np.ndarray, min_length: int,
+                compare: Callable[[int, int, int], np.ndarray]) -> Optional[Tuple[int, int, int]]:
+    """
+    查找 curr 中由 prev 沿一个方向平移得到的最长连续区间
+
+    Args:
+        prev_hashes: 上一帧沿该方向每一行（或列）的哈希
+        curr_hashes: 当前帧的哈希
+        min_length: 区间的最小长度，同时要求区间内至少有这么多行与上一帧同位置不同（否则复制没有收益）
+        compare: compare(shift, low, high) 逐像素比较当前帧第 low 到 high 行与上一帧平移 shift 后的对应行
+
+    Returns:
+        (shift, start, end)；没有找到时返回 None
+    """
+    shift = _vote_shift(prev_hashes, curr_hashes)
+    if shift is None:
+        return None
+    length = len(curr_hashes)
+    low, high = max(0, -shift), min(length, length - shift)
+    start, end = _longest_run(compare(shift, low, high))
+    start, end = low + start, low + end
+    if end - start < min_length or np.count_nonzero(curr_hashes[start:end] != prev_hashes[start:end]) < min_length:
+        return None
+    return shift, start, end
+
+
+def detect_motion(prev: np.ndarray, curr: np.ndarray, diff: np.ndarray, min_size: int = 64) -> Optional[CopyRect]:
+    """
+    检测两帧之间整体平移的区域（滚动文档、拖动窗口）
+
+    先取发生变化的像素的外接矩形，在它覆盖的列中查找垂直平移；没有找到时在它覆盖的行中查找水平平移。
+
+    Args:
+        prev: 上一帧 (H, W, C)
+        curr: 当前帧
+        diff: changed_pixels(prev, curr) 的结果
+        min_size: 变化区域和平移区域的最小边长（像素），更小的变化直接按分块发送
+
+    Returns:
+        复制矩形，应用到 prev 之后该矩形与 curr 相同；没有检测到平移时返回 None
+    """
+    rows = np.flatnonzero(diff.any(axis=1))
+    if len(rows) < min_size:
+        return None
+    cols = np.flatnonzero(diff.any(axis=0))
+    if len(cols) < min_size:
+        return None
+    top, bottom = int(rows[0]), int(rows[-1]) + 1
+    left, right = int(cols[0]), int(cols[-1]) + 1
+
+    # 垂直平移：在变化区域覆盖的列中搜索整个画面高度，平移的来源可能在变化区域之外
+    prev_band, curr_band = prev[:, left:right], curr[:, left:right]
+    shift = _find_shift(row_hashes(prev_band), row_hashes(curr_band), min_size,
+                        lambda dy, low, high: (curr_band[low:high] == prev_band[low + dy:high + dy])
+                        .reshape(high - low, -1).all(axis=1))
+    if shift:
+        dy, start, end = shift
+        return left, start + dy, left, start, right - left, end - start
+
+    # 水平平移：在变化区域覆盖的行中按列查找，先抽样行再转置，只需复制少量数据
+    prev_band, curr_band = prev[top:bottom], curr[top:bottom]
+    step = HASH_SAMPLE_STEP
+    shift = _find_shift(row_hashes(prev_band[::step].swapaxes(0, 1), 1),
+                        row_hashes(curr_band[::step].swapaxes(0, 1), 1), min_size,
+                        lambda dx, low, high: (curr_band[:, low:high] == prev_band[:, low + dx:high + dx])
+                        .all(axis=0).all(axis=1))
+    if shift:
+        dx, start, end = shift
+        return start + dx, top, start, top, end - start, bottom - top
+    return None
+
+
+def apply_copy(image: np.ndarray, rect: CopyRect) -> None:
+    """在图像内复制矩形（源和目标重叠时 NumPy 会先复制源数据）"""
+    src_x, src_y, x, y, width, height = rect
+    image[y:y + height, x:x + width] = image[src_y:src_y + height, src_x:src_x + width]
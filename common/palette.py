@@ -0,0 +1,172 @@
+import struct
+import zlib
+import numpy as np
+from typing import Callable, Optional, Tuple
+
+# 面向桌面 UI 的分块调色板编码：画面按 block x block 切块，颜色少的块（纯色背景、终端和编辑器中的文字、
+# 图标）编码为调色板索引的游程，颜色多的块（照片、视频）拼成一张图集交给有损编码器。
+# 分类、调色板和游程都对所有块一次性向量化计算，不逐块循环。
+#
+# 编码格式：
+#   头部：高、宽、块边长、调色板数据长度、图集长度
+#   调色板数据（zlib 压缩）：每块的类型（0 调色板、1 图集）、每个调色板块的颜色数 - 1、
+#       所有调色板块的颜色（每个 3 字节）、每个调色板块的游程数（uint16）、游程的颜色索引（uint8）、
+#       游程长度（uint16）。块内像素按行优先顺序
+#   图集：图集块按顺序每行 ATLAS_COLUMNS 块拼成的图像，由有损编码器编码
+PALETTE_HEADER = struct.Struct('!HHBII')
+BLOCK_PALETTE = 0
+BLOCK_ATLAS = 1
+ATLAS_COLUMNS = 16
+DEFAULT_BLOCK = 64
+# 超过这个颜色数的块视为照片类内容
+DEFAULT_MAX_COLORS = 64
+
+
+def _pixel_keys(image: np.ndarray, block: int) -> Tuple[np.ndarray, int, int]:
+    """
+    把 RGB 图像转换为每个像素一个 uint32 颜色值（R | G << 8 | B << 16），按块排列
+
+    Returns:
+        (块数, block * block) 的颜色值数组、块行数、块列数；边缘不足一块的部分复制最后一行（列）补齐
+    """
+    height, width = image.shape[:2]
+    rows, cols = -(-height // block), -(-width // block)
+    # 以 3 字节为跨步的 uint32 视图让每个像素读取从它开始的 4 个字节，去掉属于下一个像素的最高字节，
+    # 比逐通道移位合并快得多；末尾多留一个字节供最后一个像素读取
+    size = height * width * 3
+    flat = np.zeros(-(-(size + 1) // 4) * 4, dtype=np.uint8)
+    flat[:size] = image.reshape(-1)
+    pixels = np.ndarray((height, width), dtype='<u4', buffer=flat, strides=(width * 3, 3))
+    keys = np.empty((rows * block, cols * block), dtype='<u4')
+    np.bitwise_and(pixels, 0xFFFFFF, out=keys[:height, :width])
+    if rows * block > height:
+        keys[height:, :width] = keys[height - 1, :width]
+    if cols * block > width:
+        keys[:, width:] = keys[:, width - 1:width]
+    return keys.reshape(rows, block, cols, block).swapaxes(1, 2).reshape(rows * cols, block * block), rows, cols
+
+
+def _keys_to_image(blocks: np.ndarray, rows: int, cols: int, height: int, width: int) -> np.ndarray:
+    """把 (块数, block, block) 的 uint32 颜色值按行优先拼回 RGB 图像并裁剪到原始大小"""
+    block = blocks.shape[1]
+    keys = blocks.reshape(rows, cols, block, block).swapaxes(1, 2).reshape(rows * block, cols * block)
+    return np.ascontiguousarray(keys[:height, :width].view(np.uint8).reshape(height, width, 4)[:, :, :3])
+
+
+def encode_palette(image: np.ndarray, encode_atlas: Optional[Callable[[np.ndarray], bytes]],
+                   block: int = DEFAULT_BLOCK, max_colors: int = DEFAULT_MAX_COLORS, level: int = 1) -> bytes:
+    """
+    编码 RGB 图像 (H, W, 3)
+
+    Args:
+        encode_atlas: 编码照片类块图集的函数；为 None 时所有块都按调色板编码（最多 256 色）
+        block: 块边长（像素，不超过 255）
+        max_colors: 调色板块的最大颜色数（不超过 256）
+        level: 调色板数据的 zlib 压缩级别
+    """
+    if image.ndim != 3 or image.shape[2] != 3:
+        raise ValueError(f"调色板编码只支持 RGB 图像，收到 {image.shape}")
+    height, width = image.shape[:2]
+    keys, rows, cols = _pixel_keys(image, block)
+    pixels = block * block
+
+    # 每块排序后相邻不同的位置即新颜色，颜色数 = 不同位置数 + 1
+    ordered = np.sort(keys, axis=1)
+    first = np.ones(ordered.shape, dtype=bool)
+    np.not_equal(ordered[:, 1:], ordered[:, :-1], out=first[:, 1:])
+    colors = first.sum(axis=1)
+    limit = min(max_colors, 256) if encode_atlas is not None else 256
+    modes = np.where(colors <= limit, BLOCK_PALETTE, BLOCK_ATLAS).astype(np.uint8)
+    if encode_atlas is None and not (modes == BLOCK_PALETTE).all():
+        raise ValueError("颜色超过 256 种的块需要有损编码器")
+
+    palette_ids = np.flatnonzero(modes == BLOCK_PALETTE)
+    parts = [modes.tobytes()]
+    if palette_ids.size:
+        count = palette_ids.size
+        block_colors = colors[palette_ids]
+        palette = ordered[palette_ids][first[palette_ids]]
+
+        # 游程：颜色变化处和每块开头
+        flat = keys[palette_ids].ravel()
+        change = np.empty(flat.size, dtype=bool)
+        change[0] = True
+        np.not_equal(flat[1:], flat[:-1], out=change[1:])
+        change[::pixels] = True
+        run_starts = np.flatnonzero(change)
+        lengths = np.diff(np.append(run_starts, flat.size))
+        run_blocks = run_starts // pixels
+        runs = np.bincount(run_blocks, minlength=count)
+
+        # 只为每个游程查找颜色索引：块编号放在颜色值的高位，所有块的调色板合成一个全局有序数组，
+        # 一次 searchsorted 得到全局索引，减去该块调色板的起点即块内索引
+        palette_blocks = np.repeat(np.arange(count, dtype=np.uint64), block_colors) << np.uint64(32)
+        starts = np.cumsum(block_colors) - block_colors
+        indices = np.searchsorted(palette_blocks | palette,
+                                  (run_blocks.astype(np.uint64) << np.uint64(32)) | flat[run_starts])
+        indices -= starts[run_blocks]
+
+        rgb = palette.view(np.uint8).reshape(-1, 4)[:, :3]
+        parts += [(block_colors - 1).astype(np.uint8).tobytes(), rgb.tobytes(), runs.astype('<u2').tobytes(),
+                  indices.astype(np.uint8).tobytes(), lengths.astype('<u2').tobytes()]
+    lossless = zlib.compress(b''.join(parts), level)
+
+    atlas = b''
+    atlas_ids = np.flatnonzero(modes == BLOCK_ATLAS)
+    if atlas_ids.size:
+        atlas_cols = min(atlas_ids.size, ATLAS_COLUMNS)
+        atlas_rows = -(-atlas_ids.size // atlas_cols)
+        tiles = np.zeros((atlas_rows * atlas_cols, block, block), dtype='<u4')
+        tiles[:atlas_ids.size] = keys[atlas_ids].reshape(-1, block, block)
+        atlas = encode_atlas(_keys_to_image(tiles, atlas_rows, atlas_cols, atlas_rows * block, atlas_cols * block))
+    return PALETTE_HEADER.pack(height, width, block, len(lossless), len(atlas)) + lossless + atlas
+
+
+def decode_palette(data: bytes, decode_atlas: Optional[Callable[[bytes], np.ndarray]]) -> np.ndarray:
+    """解码 encode_palette() 的结果，返回 RGB 图像 (H, W, 3)"""
+    view = memoryview(data)
+    height, width, block, lossless_size, atlas_size = PALETTE_HEADER.unpack_from(view)
+    rows, cols = -(-height // block), -(-width // block)
+    pixels = block * block
+    lossless = zlib.decompress(view[PALETTE_HEADER.size:PALETTE_HEADER.size + lossless_size])
+    offset = 0
+
+    def take(size: int, dtype: str = 'u1') -> np.ndarray:
+        nonlocal offset
+        array = np.frombuffer(lossless, dtype=dtype, count=size, offset=offset)
+        offset += array.nbytes
+        return array
+
+    modes = take(rows * cols)
+    palette_ids = np.flatnonzero(modes == BLOCK_PALETTE)
+    atlas_ids = np.flatnonzero(modes == BLOCK_ATLAS)
+    blocks = np.empty((rows * cols, pixels), dtype='<u4')
+    if palette_ids.size:
+        count = palette_ids.size
+        block_colors = take(count).astype(np.intp) + 1
+        rgb = take(int(block_colors.sum()) * 3).reshape(-1, 3)
+        runs = take(count, '<u2')
+        total_runs = int(runs.sum())
+        values = take(total_runs)
+        lengths = take(total_runs, '<u2')
+        # 颜色按游程查表（每块调色板在全局调色板中的起点 + 块内索引），再把每个游程的颜色展开为像素
+        palette = np.zeros((rgb.shape[0], 4), dtype=np.uint8)
+        palette[:, :3] = rgb
+        starts = np.cumsum(block_colors) - block_colors
+        run_colors = palette.view('<u4')[:, 0][np.repeat(starts, runs) + values]
+        pixels_data = np.repeat(run_colors, lengths)
+        if atlas_ids.size:
+            blocks[palette_ids] = pixels_data.reshape(count, pixels)
+        else:
+            blocks = pixels_data.reshape(count, pixels)
+
+    if atlas_ids.size:
+        if decode_atlas is None:
+            raise ValueError("调色板数据包含有损编码的图集")
+        start = PALETTE_HEADER.size + lossless_size
+        atlas_image = decode_atlas(view[start:start + atlas_size])
+        atlas_cols = min(atlas_ids.size, ATLAS_COLUMNS)
+        atlas_rows = -(-atlas_ids.size // atlas_cols)
+        tiles, _, _ = _pixel_keys(atlas_image, block)
+        blocks[atlas_ids] = tiles.reshape(atlas_rows * atlas_cols, pixels)[:atlas_ids.size]
+    return _keys_to_image(blocks.reshape(-1, block, block), rows, cols, height, width)
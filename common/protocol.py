@@ -0,0 +1,250 @@
+import asyncio
+import itertools
+import json
+import socket
+import struct
+from typing import Any, Dict, List, Tuple
+
+# 握手消息的长度前缀
+LENGTH_PREFIX_SIZE = 4
+
+# 握手之后双向通用的消息头：消息体长度、消息类型
+MESSAGE_HEADER = struct.Struct('!IB')
+
+# 消息类型
+MSG_FRAME = 1    # 服务器 -> 客户端：帧消息（见 common.frames）
+MSG_INPUT = 2    # 客户端 -> 服务器：一条或多条定长输入事件记录
+MSG_CONTROL = 3  # 双向：低频控制消息（JSON），如图像质量调整
+MSG_CURSOR = 4   # 服务器 -> 客户端：指针位置和形状（见 common.cursor）
+
+# 输入事件记录：事件类型、按钮、x、y、dx、dy、按键名
+# 客户端屏幕分辨率只在握手（或变化时的控制消息）中发送一次，不随每个事件发送
+INPUT_RECORD = struct.Struct('!BBiihh24s')
+
+# 事件类型编号 <-> (type, action)
+INPUT_KINDS = {
+    ('mouse', 'move'): 1,
+    ('mouse', 'press'): 2,
+    ('mouse', 'release'): 3,
+    ('mouse', 'scroll'): 4,
+    ('keyboard', 'press'): 5,
+    ('keyboard', 'release'): 6,
+}
+INPUT_KIND_NAMES = {value: key for key, value in INPUT_KINDS.items()}
+# 解码时按事件类型编号直接查动作名
+_MOUSE_ACTIONS = {kind: action for (event_type, action), kind in INPUT_KINDS.items() if event_type == 'mouse'}
+_KEYBOARD_ACTIONS = {kind: action for (event_type, action), kind in INPUT_KINDS.items() if event_type == 'keyboard'}
+
+MOUSE_BUTTONS = {'': 0, 'left': 1, 'right': 2, 'middle': 3}
+MOUSE_BUTTON_NAMES = {value: key for key, value in MOUSE_BUTTONS.items()}
+
+
+def recv_exact(sock: socket.socket, size: int) -> bytes:
+    """精确读取 size 字节，连接断开时抛出 ConnectionError"""
+    data = bytearray()
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError("连接已断开")
+        data += chunk
+    return bytes(data)
+
+
+def enable_keepalive(sock: socket.socket, idle: int = 10, interval: int = 3, count: int = 3) -> None:
+    """
+    开启 TCP 保活：连接空闲 idle 秒后每隔 interval 秒探测一次，连续 count 次没有响应即判定断开
+
+    画面静止时两端可能长时间没有数据，网络中断（如 VPN 重连）不会产生 RST，
+    保活让阻塞在 recv 上的一端及时发现连接已失效。平台不支持的选项跳过
+    """
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for option, value in (('TCP_KEEPIDLE', idle), ('TCP_KEEPINTVL', interval), ('TCP_KEEPCNT', count)):
+        if hasattr(socket, option):
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+            except OSError:
+                pass
+
+
+def send_json(sock: socket.socket, message: Dict[str, Any]) -> None:
+    """发送带长度前缀的 JSON 消息（用于连接握手）"""
+    payload = json.dumps(message).encode('utf-8')
+    sock.sendall(len(payload).to_bytes(LENGTH_PREFIX_SIZE, 'big') + payload)
+
+
+def recv_json(sock: socket.socket) -> Dict[str, Any]:
+    """接收带长度前缀的 JSON 消息"""
+    length = int.from_bytes(recv_exact(sock, LENGTH_PREFIX_SIZE), 'big')
+    return json.loads(recv_exact(sock, length).decode('utf-8'))
+
+
+async def async_send_json(writer: asyncio.StreamWriter, message: Dict[str, Any]) -> None:
+    """asyncio 版本的 send_json"""
+    payload = json.dumps(message).encode('utf-8')
+    writer.write(len(payload).to_bytes(LENGTH_PREFIX_SIZE, 'big') + payload)
+    await writer.drain()
+
+
+async def async_recv_json(reader: asyncio.StreamReader) -> Dict[str, Any]:
+    """asyncio 版本的 recv_json"""
+    length = int.from_bytes(await reader.readexactly(LENGTH_PREFIX_SIZE), 'big')
+    return json.loads((await reader.readexactly(length)).decode('utf-8'))
+
+
+def pack_message(msg_type: int, payload: bytes) -> bytes:
+    """为消息体加上消息头"""
+    return MESSAGE_HEADER.pack(len(payload), msg_type) + payload
+
+
+def send_message(sock: socket.socket, msg_type: int, payload: bytes) -> None:
+    """发送一条带消息头的消息"""
+    sock.sendall(pack_message(msg_type, payload))
+
+
+def send_control(sock: socket.socket, message: Dict[str, Any]) -> None:
+    """发送控制消息"""
+    send_message(sock, MSG_CONTROL, json.dumps(message).encode('utf-8'))
+
+
+def decode_control(payload: bytes) -> Dict[str, Any]:
+    """解析控制消息"""
+    return json.loads(bytes(payload).decode('utf-8'))
+
+
+class MessageDecoder:
+    """流式消息解码器：处理一次 recv 中包含多条消息或一条消息被拆分到多次 recv 的情况"""
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, data: bytes, _unpack=MESSAGE_HEADER.unpack_from, _header=MESSAGE_HEADER.size) -> List[Tuple[int, memoryview]]:
+        """
+        追加收到的数据
+
+        Returns:
+            已完整接收的消息列表 [(消息类型, 消息体), ...]；消息体是收到的数据（不可变的 bytes）上的视图，
+            不逐条复制。只有跨越两次 recv 的消息需要把剩余部分和新数据拼接一次
+        """
+        if self._buffer:
+            self._buffer += data
+            data = bytes(self._buffer)
+            self._buffer.clear()
+        elif not isinstance(data, bytes):
+            data = bytes(data)
+        view = memoryview(data)
+        messages = []
+        offset = 0
+        buffered = len(data)
+        while buffered - offset >= _header:
+            length, msg_type = _unpack(data, offset)
+            end = offset + _header + length
+            if end > buffered:
+                break
+            messages.append((msg_type, view[offset + _header:end]))
+            offset = end
+        if offset < buffered:
+            self._buffer += view[offset:]
+        return messages
+
+
+class FrameReader:
+    """
+    从阻塞 socket 按消息头读取完整消息
+
+    消息体通过 recv_into 直接读入预先分配、按需增长的缓冲区，避免逐块拼接 bytes 造成的平方级复制。
+    返回的消息体是缓冲区的 memoryview，不做复制。缓冲区轮换使用，返回的视图在之后 buffers - 1 次读取内保持有效，
+    因此 buffers 应大于同时在途（尚未处理完）的消息数。
+    """
+
+    def __init__(self, sock: socket.socket, buffers: int = 2, initial_size: int = 1 << 20):
+        """
+        Args:
+            sock: 阻塞模式的 socket
+            buffers: 轮换使用的缓冲区数量
+            initial_size: 每个缓冲区的初始大小（字节），收到更大的消息时按需增长
+        """
+        self.sock = sock
+        self.buffers = max(1, buffers)
+        self.initial_size = initial_size
+        self.allocations = 0  # 缓冲区分配次数（只在消息变大时增长）
+        self._ring: List[bytearray] = []
+        self._index = 0
+        self._header = bytearray(MESSAGE_HEADER.size)
+        self._header_view = memoryview(self._header)
+
+    def _next_buffer(self, size: int) -> bytearray:
+        """取下一个缓冲区，容量不足时按至少两倍增长"""
+        if len(self._ring) < self.buffers:
+            self._ring.append(bytearray(max(size, self.initial_size)))
+            self.allocations += 1
+            return self._ring[-1]
+        buffer = self._ring[self._index]
+        if len(buffer) < size:
+            # 旧缓冲区可能仍被之前返回的视图引用，不能原地扩容，直接替换
+            buffer = self._ring[self._index] = bytearray(max(size, len(buffer) * 2))
+            self.allocations += 1
+        self._index = (self._index + 1) % self.buffers
+        return buffer
+
+    def _recv_into(self, view: memoryview) -> None:
+        """读满 view，连接断开时抛出 ConnectionError"""
+        received = 0
+        size = len(view)
+        while received < size:
+            count = self.sock.recv_into(view[received:], size - received)
+            if not count:
+                raise ConnectionError("连接已断开")
+            received += count
+
+    def read_header(self) -> Tuple[int, int]:
+        """精确读取一个消息头，返回 (消息体长度, 消息类型)"""
+        self._recv_into(self._header_view)
+        return MESSAGE_HEADER.unpack(self._header)
+
+    def read_body(self, length: int) -> memoryview:
+        """读取 length 字节的消息体，返回缓冲区视图"""
+        view = memoryview(self._next_buffer(length))[:length]
+        self._recv_into(view)
+        return view
+
+    def read(self) -> Tuple[int, memoryview]:
+        """读取一条完整消息，返回 (消息类型, 消息体视图)"""
+        length, msg_type = self.read_header()
+        return msg_type, self.read_body(length)
+
+
+def encode_input(event: Dict[str, Any], _pack=INPUT_RECORD.pack) -> bytes:
+    """将输入事件编码为定长记录"""
+    get = event.get
+    key = get('key')
+    return _pack(
+        INPUT_KINDS[(event['type'], event['action'])],
+        MOUSE_BUTTONS[get('button', '')],
+        get('x', 0), get('y', 0), get('dx', 0), get('dy', 0),
+        key.encode('utf-8') if key else b''
+    )
+
+
+def encode_inputs(events: List[Dict[str, Any]]) -> bytes:
+    """将一批输入事件编码为一条 MSG_INPUT 消息"""
+    return pack_message(MSG_INPUT, b''.join(map(encode_input, events)))
+
+
+def _decode_input(kind: int, button: int, x: int, y: int, dx: int, dy: int, key: bytes,
+                  _mouse=_MOUSE_ACTIONS, _keyboard=_KEYBOARD_ACTIONS, _buttons=MOUSE_BUTTON_NAMES) -> Dict[str, Any]:
+    """由一条记录的字段构造输入事件，鼠标事件（绝大多数）只查一次表"""
+    action = _mouse.get(kind)
+    if action is None:
+        return {'type': 'keyboard', 'action': _keyboard[kind], 'key': key.rstrip(b'\0').decode('utf-8', 'replace')}
+    if button:
+        return {'type': 'mouse', 'action': action, 'x': x, 'y': y, 'dx': dx, 'dy': dy, 'button': _buttons[button]}
+    return {'type': 'mouse', 'action': action, 'x': x, 'y': y, 'dx': dx, 'dy': dy}
+
+
+def decode_inputs(payload: bytes, _unpack=INPUT_RECORD.unpack, _iter=INPUT_RECORD.iter_unpack,
+                  _size=INPUT_RECORD.size) -> List[Dict[str, Any]]:
+    """解析 MSG_INPUT 消息体中的输入事件"""
+    # 只有一条记录的消息（输入稀疏时的常见情况）不创建迭代器
+    if len(payload) == _size:
+        return [_decode_input(*_unpack(payload))]
+    return list(itertools.starmap(_decode_input, _iter(payload)))
@@ -0,0 +1,187 @@
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+from typing import Iterator, Optional, Set, Tuple
+from .frames import peek_frame
+from .protocol import MSG_FRAME
+from .tiles import FRAME_KEY
+
+# 会话录制文件格式：
+#   数据文件：文件头 SESSION_MAGIC，之后是追加写入的记录（记录头 + 消息体），
+#             消息体与网络上的消息体相同（帧消息、输入事件记录或控制消息）
+#   索引文件（数据文件名 + INDEX_SUFFIX）：每个关键帧一条定长索引项，按时间递增，可二分查找
+SESSION_MAGIC = b'RDSESS\x00\x01'
+# 记录头：时间戳（time.time()）、消息类型、消息体长度
+RECORD_HEADER = struct.Struct('!dBI')
+# 索引项：关键帧时间戳、记录在数据文件中的偏移量
+INDEX_ENTRY = struct.Struct('!dQ')
+INDEX_SUFFIX = '.idx'
+
+
+class SessionRecorder:
+    """
+    会话录制器：把帧消息和输入事件追加写入会话文件
+
+    record() 只把消息放入队列，文件写入和刷新在后台线程中完成，不会拖慢捕获和发送线程。
+    磁盘跟不上导致队列满时丢弃记录；丢弃帧之后同一画面流的增量帧同样丢弃，直到该画面流的下一个关键帧，
+    保证录制内容可以完整回放。
+    """
+
+    def __init__(self, path: str, max_queue: int = 256, flush_interval: float = 1.0):
+        """
+        Args:
+            path: 数据文件路径，索引写入 path + INDEX_SUFFIX
+            max_queue: 等待写入的最大记录数
+            flush_interval: 刷新到磁盘的间隔（秒）
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.records = 0
+        self.keyframes = 0
+        self.dropped = 0
+        self._file = open(path, 'wb', buffering=1 << 20)
+        self._file.write(SESSION_MAGIC)
+        self._index = open(path + INDEX_SUFFIX, 'wb')
+        self._queue: queue.Queue = queue.Queue(max_queue)
+        self._resync: Set[int] = set()  # 等待关键帧的画面流
+        self._closed = False
+        self._thread = threading.Thread(target=self._write_loop, name='session-recorder', daemon=True)
+        self._thread.start()
+
+    def record(self, msg_type: int, payload: bytes, timestamp: Optional[float] = None) -> None:
+        """记录一条消息（payload 须为不会再被修改的 bytes）"""
+        if self._closed:
+            return
+        is_key = False
+        stream = 0
+        if msg_type == MSG_FRAME:
+            frame_type, stream = peek_frame(payload)
+            is_key = frame_type == FRAME_KEY
+            if stream in self._resync and not is_key:
+                self.dropped += 1
+                return
+        try:
+            self._queue.put_nowait((timestamp or time.time(), msg_type, payload, is_key))
+            if is_key:
+                self._resync.discard(stream)
+        except queue.Full:
+            self.dropped += 1
+            if msg_type == MSG_FRAME:
+                self._resync.add(stream)
+
+    def _write_loop(self) -> None:
+        last_flush = time.time()
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            if item:
+                timestamp, msg_type, payload, is_key = item
+                if is_key:
+                    self._index.write(INDEX_ENTRY.pack(timestamp, self._file.tell()))
+                    self.keyframes += 1
+                self._file.write(RECORD_HEADER.pack(timestamp, msg_type, len(payload)))
+                self._file.write(payload)
+                self.records += 1
+            if time.time() - last_flush >= self.flush_interval:
+                self._flush()
+                last_flush = time.time()
+        self._flush()
+        self._file.close()
+        self._index.close()
+
+    def _flush(self) -> None:
+        # 先刷新数据再刷新索引，索引项不会指向尚未写入的记录
+        self._file.flush()
+        self._index.flush()
+
+    def close(self) -> None:
+        """写完队列中剩余的记录后关闭文件"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join()
+
+
+class SessionReader:
+    """会话文件读取器：通过 mmap 顺序读取记录，按时间戳在索引中二分查找关键帧"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._data[:len(SESSION_MAGIC)] != SESSION_MAGIC:
+            self.close()
+            raise ValueError(f"不是会话录制文件: {path}")
+
+        self._index_file = None
+        self._index = None
+        self.keyframes = 0
+        index_path = path + INDEX_SUFFIX
+        if os.path.exists(index_path) and os.path.getsize(index_path) >= INDEX_ENTRY.size:
+            self._index_file = open(index_path, 'rb')
+            self._index = mmap.mmap(self._index_file.fileno(), 0, access=mmap.ACCESS_READ)
+            # 录制中断时最后一项可能不完整
+            self.keyframes = len(self._index) // INDEX_ENTRY.size
+
+    @property
+    def start_time(self) -> Optional[float]:
+        """第一条记录的时间戳，没有记录时为 None"""
+        if len(self._data) < len(SESSION_MAGIC) + RECORD_HEADER.size:
+            return None
+        return RECORD_HEADER.unpack_from(self._data, len(SESSION_MAGIC))[0]
+
+    def seek(self, timestamp: float) -> int:
+        """
+        查找不晚于 timestamp 的最后一个关键帧，O(log n)
+
+        Returns:
+            从该关键帧开始回放的记录偏移量；没有更早的关键帧时为第一条记录的偏移量
+        """
+        low, high = 0, self.keyframes
+        while low < high:
+            middle = (low + high) // 2
+            if INDEX_ENTRY.unpack_from(self._index, middle * INDEX_ENTRY.size)[0] <= timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        if low == 0:
+            return len(SESSION_MAGIC)
+        return INDEX_ENTRY.unpack_from(self._index, (low - 1) * INDEX_ENTRY.size)[1]
+
+    def records(self, offset: Optional[int] = None) -> Iterator[Tuple[float, int, memoryview]]:
+        """
+        从 offset 开始顺序读取记录
+
+        Yields:
+            (时间戳, 消息类型, 消息体视图)；视图直接引用 mmap，在 close() 之前有效
+        """
+        view = memoryview(self._data)
+        size = len(view)
+        position = offset or len(SESSION_MAGIC)
+        while position + RECORD_HEADER.size <= size:
+            timestamp, msg_type, length = RECORD_HEADER.unpack_from(view, position)
+            start = position + RECORD_HEADER.size
+            end = start + length
+            if end > size:
+                # 录制中断，最后一条记录不完整
+                break
+            yield timestamp, msg_type, view[start:end]
+            position = end
+
+    def close(self) -> None:
+        for handle in (self._index, self._index_file, self._data, self._file):
+            if handle is None:
+                continue
+            try:
+                handle.close()
+            except BufferError:
+                # 仍有记录视图被引用，由垃圾回收释放
+                pass
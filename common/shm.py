@@ -0,0 +1,284 @@
+import os
+import struct
+import threading
+import time
+import numpy as np
+from multiprocessing import shared_memory
+from typing import Any, Dict, Optional
+from .tiles import FRAME_KEY
+
+# 本机共享内存帧环：捕获线程把原始帧写入 multiprocessing.shared_memory 中的环形缓冲区，
+# 同一台机器上的查看、录制或分析进程映射同一块内存直接读取像素，不需要编码、压缩和 socket 传输。
+# 写入端只有一个，读取端可以有任意多个，读取不会增加捕获开销。
+#
+# 内存布局：
+#   全局头（64 字节）：魔数、版本、槽位数、每个槽位的像素容量、最新帧序号、读取端最近一次轮询的时间、已关闭标志、
+#       写入端进程号
+#   槽位 i（64 字节槽位头 + 像素容量，按 64 字节对齐）：帧序号（写入过程中为 0）、宽、高、通道数、
+#       服务器屏幕宽、高、画面流编号、捕获时间戳
+# 帧 seq 写入槽位 seq % 槽位数。读取端读取像素前后各检查一次槽位的帧序号（顺序锁），
+# 不一致说明读取期间槽位被覆盖。零拷贝读取得到的视图在写入端写满一圈之前有效。
+# 写入端根据读取端的轮询时间判断是否还有读取端，没有时可以暂停捕获。
+SHM_MAGIC = b'RDSM'
+SHM_VERSION = 1
+SHM_HEADER = struct.Struct('<4sHHQQdB3xI')
+SHM_HEADER_SIZE = 64
+SLOT_HEADER = struct.Struct('<QHHHHHBd')
+SLOT_HEADER_SIZE = 64
+# 全局头中各字段的偏移量
+_SEQ_OFFSET = 16
+_LAST_READ_OFFSET = 24
+_CLOSED_OFFSET = 32
+_OWNER_OFFSET = 36
+
+# 映射时临时替换 resource_tracker.register（见 _attach），替换期间其它线程创建或映射共享内存须等待
+_tracker_lock = threading.Lock()
+
+
+def _slot_stride(capacity: int) -> int:
+    return (SLOT_HEADER_SIZE + capacity + 63) // 64 * 64
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """
+    映射已存在的共享内存
+
+    Python 3.13 之前，映射共享内存的进程也会把它登记到 resource_tracker，退出时由 resource_tracker 删除，
+    读取端退出会让写入端和其它读取端失去共享内存；multiprocessing 启动的子进程还与父进程共用 resource_tracker，
+    事后取消登记会连带取消写入端的登记。因此映射时跳过登记，只有创建者负责删除。
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    from multiprocessing import resource_tracker
+    with _tracker_lock:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None if rtype == 'shared_memory' else register(name, rtype)
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+def _owner_alive(pid: int) -> bool:
+    """写入端进程是否仍在运行；无法判断（进程号未知或不是 POSIX 系统）时视为仍在运行"""
+    if pid <= 0 or os.name != 'posix':
+        # Windows 上最后一个句柄关闭时共享内存即被删除，同名的共享内存总是有进程在使用
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _remove_stale(name: str) -> None:
+    """
+    删除写入端已退出而遗留的同名共享内存（写入端异常退出时不会删除）
+
+    Raises:
+        FileExistsError: 同名共享内存不是帧环，或写入端仍在运行（例如同一台机器上的另一个服务器）
+    """
+    stale = _attach(name)
+    try:
+        magic, _, _, _, _, _, _, owner = SHM_HEADER.unpack_from(stale.buf, 0)
+        if magic != SHM_MAGIC or _owner_alive(owner):
+            user = f"进程 {owner} " if magic == SHM_MAGIC and owner else "其它程序"
+            raise FileExistsError(f"共享内存 {name} 正被{user}使用，请换一个名称")
+    finally:
+        stale.close()
+    stale.unlink()
+
+
+class SharedFrameRing:
+    """共享内存帧环的写入端（创建者，关闭时删除共享内存）"""
+
+    def __init__(self, name: str, capacity: int, slots: int = 4):
+        """
+        Args:
+            name: 共享内存名称，读取端按名称映射
+            capacity: 每个槽位的像素容量（字节），更大的帧无法写入
+            slots: 槽位数，决定零拷贝读取的视图可以保留多久
+        """
+        self.name = name
+        self.capacity = capacity
+        self.slots = max(2, slots)
+        self.stride = _slot_stride(capacity)
+        size = SHM_HEADER_SIZE + self.slots * self.stride
+        try:
+            self.shm = self._create(name, size)
+        except FileExistsError:
+            # 上次异常退出遗留的同名共享内存；仍在使用时不删除
+            _remove_stale(name)
+            self.shm = self._create(name, size)
+        self.seq = 0
+        SHM_HEADER.pack_into(self.shm.buf, 0, SHM_MAGIC, SHM_VERSION, self.slots, capacity, 0, 0.0, 0,
+                             os.getpid())
+
+    @staticmethod
+    def _create(name: str, size: int) -> shared_memory.SharedMemory:
+        # 创建者需要登记到 resource_tracker，不能与 _attach 临时替换登记函数同时进行
+        with _tracker_lock:
+            return shared_memory.SharedMemory(name=name, create=True, size=size)
+
+    def fits(self, image: np.ndarray) -> bool:
+        return image.nbytes <= self.capacity
+
+    def publish(self, frame_data: Dict[str, Any]) -> int:
+        """
+        写入一帧（capture_screen() 等返回的帧数据）
+
+        Returns:
+            帧序号
+        """
+        image = frame_data['image']
+        if not self.fits(image):
+            raise ValueError(f"帧大小 {image.nbytes} 超过共享内存槽位容量 {self.capacity}")
+        seq = self.seq + 1
+        offset = SHM_HEADER_SIZE + (seq % self.slots) * self.stride
+        buf = self.shm.buf
+        height, width = image.shape[:2]
+        channels = image.shape[2] if image.ndim == 3 else 1
+        resolution = frame_data.get('resolution') or (width, height)
+        # 先把槽位标记为写入中，读取端看到 0 或序号变化时放弃这一帧
+        struct.pack_into('<Q', buf, offset, 0)
+        target = np.ndarray(image.shape, dtype=np.uint8, buffer=buf, offset=offset + SLOT_HEADER_SIZE)
+        np.copyto(target, image)
+        SLOT_HEADER.pack_into(buf, offset, seq, width, height, channels, resolution[0], resolution[1],
+                              frame_data.get('stream', 0), frame_data.get('timestamp') or time.time())
+        struct.pack_into('<Q', buf, _SEQ_OFFSET, seq)
+        self.seq = seq
+        return seq
+
+    def last_read(self) -> float:
+        """读取端最近一次轮询的时间（time.time()），从未有读取端时为 0"""
+        return struct.unpack_from('<d', self.shm.buf, _LAST_READ_OFFSET)[0]
+
+    def close(self) -> None:
+        """标记为已关闭（读取端据此重新映射同名的新帧环）并删除共享内存"""
+        try:
+            struct.pack_into('<B', self.shm.buf, _CLOSED_OFFSET, 1)
+        except (TypeError, ValueError):
+            pass
+        self.shm.close()
+        try:
+            self.shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class SharedFrameReader:
+    """
+    共享内存帧环的读取端
+
+    read() 返回与 decode_frame() 相同字段的关键帧数据（'type'、'image'、'resolution'、'timestamp'、'stream'），
+    另有 'seq' 帧序号。写入端重新创建帧环（例如画面变大）时自动重新映射。
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.shm: Optional[shared_memory.SharedMemory] = None
+        self.slots = 0
+        self.stride = 0
+        self.frames_read = 0
+        self.frames_torn = 0  # 读取期间被覆盖而放弃的帧
+        try:
+            self._attach()
+        except FileNotFoundError:
+            # 写入端尚未创建帧环，read() 时重试
+            pass
+
+    def _attach(self) -> None:
+        shm = _attach(self.name)
+        magic, version, slots, capacity, _, _, _, _ = SHM_HEADER.unpack_from(shm.buf, 0)
+        if magic != SHM_MAGIC or version != SHM_VERSION:
+            shm.close()
+            raise ValueError(f"{self.name} 不是共享内存帧环（或版本不兼容）")
+        self.shm = shm
+        self.slots = slots
+        self.stride = _slot_stride(capacity)
+
+    def close(self) -> None:
+        if self.shm:
+            try:
+                self.shm.close()
+            except BufferError:
+                # 仍有零拷贝读取的视图引用这块内存，随视图释放
+                pass
+            self.shm = None
+
+    def latest_seq(self) -> int:
+        """写入端最新一帧的序号，还没有帧时为 0"""
+        return struct.unpack_from('<Q', self.shm.buf, _SEQ_OFFSET)[0]
+
+    def valid(self, frame: Dict[str, Any]) -> bool:
+        """零拷贝读取的帧是否仍未被覆盖（使用视图之后调用，确认数据完整）"""
+        offset = SHM_HEADER_SIZE + (frame['seq'] % self.slots) * self.stride
+        return struct.unpack_from('<Q', self.shm.buf, offset)[0] == frame['seq']
+
+    def read(self, after: int = 0, timeout: Optional[float] = None, copy: bool = True,
+             poll_interval: float = 0.002) -> Optional[Dict[str, Any]]:
+        """
+        读取最新一帧
+
+        Args:
+            after: 只返回序号大于 after 的帧（传入上一次读取的 'seq'），没有新帧时等待
+            timeout: 等待新帧的最长时间（秒），为 None 时一直等待
+            copy: 为 False 时 'image' 是共享内存上的只读视图，不复制像素；
+                  视图在写入端写满一圈槽位之前有效，使用后可用 valid() 确认
+            poll_interval: 轮询新帧的间隔（秒）
+
+        Returns:
+            帧数据；超时仍没有新帧（包括写入端尚未创建或已退出）时返回 None
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            if self.shm is not None and self.shm.buf[_CLOSED_OFFSET]:
+                # 写入端重新创建了帧环（或已退出），序号从头开始
+                self.close()
+                after = 0
+            if self.shm is None:
+                try:
+                    self._attach()
+                except (FileNotFoundError, ValueError):
+                    self.shm = None
+            if self.shm is not None:
+                struct.pack_into('<d', self.shm.buf, _LAST_READ_OFFSET, time.time())
+                seq = self.latest_seq()
+                if seq > after:
+                    frame = self._read_slot(seq, copy)
+                    if frame is not None:
+                        self.frames_read += 1
+                        return frame
+                    self.frames_torn += 1
+                    continue
+            if deadline is not None and time.monotonic() >= deadline:
+                return None
+            time.sleep(poll_interval if self.shm is not None else 0.1)
+
+    def _read_slot(self, seq: int, copy: bool) -> Optional[Dict[str, Any]]:
+        offset = SHM_HEADER_SIZE + (seq % self.slots) * self.stride
+        buf = self.shm.buf
+        slot_seq, width, height, channels, res_width, res_height, stream, timestamp = \
+            SLOT_HEADER.unpack_from(buf, offset)
+        if slot_seq != seq:
+            return None
+        shape = (height, width, channels) if channels > 1 else (height, width)
+        image = np.ndarray(shape, dtype=np.uint8, buffer=buf, offset=offset + SLOT_HEADER_SIZE)
+        if copy:
+            image = image.copy()
+        else:
+            image.flags.writeable = False
+        if struct.unpack_from('<Q', buf, offset)[0] != seq:
+            return None
+        return {
+            'type': FRAME_KEY,
+            'image': image,
+            'resolution': (res_width, res_height),
+            'timestamp': timestamp,
+            'stream': stream,
+            'seq': seq,
+        }
@@ -0,0 +1,197 @@
+import collections
+import time
+import numpy as np
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+from .motion import CopyRect, apply_copy, changed_pixels, detect_motion
+
+# 帧类型
+FRAME_KEY = 'key'
+FRAME_DELTA = 'delta'
+
+DEFAULT_TILE_SIZE = 64
+
+
+def changed_tile_mask(prev: np.ndarray, curr: np.ndarray, tile_size: int) -> np.ndarray:
+    """
+    向量化比较两帧，返回每个分块是否发生变化的布尔矩阵
+
+    Args:
+        prev: 上一帧 (H, W, C)
+        curr: 当前帧 (H, W, C)
+        tile_size: 分块边长（像素）
+
+    Returns:
+        形状为 (rows, cols) 的布尔矩阵
+    """
+    return diff_tile_mask(changed_pixels(prev, curr), tile_size)
+
+
+def diff_tile_mask(diff: np.ndarray, tile_size: int) -> np.ndarray:
+    """把逐像素变化矩阵 (H, W) 汇总为每个分块是否变化的布尔矩阵 (rows, cols)"""
+    height, width = diff.shape
+    rows = -(-height // tile_size)
+    cols = -(-width // tile_size)
+    pad_h = rows * tile_size - height
+    pad_w = cols * tile_size - width
+    if pad_h or pad_w:
+        diff = np.pad(diff, ((0, pad_h), (0, pad_w)))
+    return diff.reshape(rows, tile_size, cols, tile_size).any(axis=(1, 3))
+
+
+class TileDiffer:
+    """服务端分块差异编码器：保存上一帧，只输出发生变化的分块"""
+
+    def __init__(self, tile_size: int = DEFAULT_TILE_SIZE, keyframe_interval: float = 5.0,
+                 detect_motion: bool = True, history: int = 256):
+        """
+        Args:
+            tile_size: 分块边长（像素）
+            keyframe_interval: 关键帧间隔（秒），客户端可借此重新同步
+            detect_motion: 是否检测滚动和拖动，把平移的内容编码为复制矩形
+            history: 保留的已发送帧记录数，客户端断线重连时据此补发它没有收到的分块
+        """
+        self.tile_size = tile_size
+        self.keyframe_interval = keyframe_interval
+        self.detect_motion = detect_motion
+        self._prev: Optional[np.ndarray] = None
+        self._last_keyframe_time = 0.0
+        self._invalid: Set[Tuple[int, int]] = set()
+        # 已发送帧的序号（从 1 开始按发送顺序编号）和记录：(序号, 分块位置, 复制矩形)，关键帧的分块位置为 None
+        self.sent_seq = 0
+        self._history: Deque[Tuple[int, Optional[List[Tuple[int, int]]], List[CopyRect]]] = \
+            collections.deque(maxlen=max(1, history))
+
+    def reset(self):
+        """丢弃参考帧，下一帧强制为关键帧"""
+        self._prev = None
+        self._invalid.clear()
+
+    def invalidate(self, positions: Iterable[Tuple[int, int]]):
+        """标记分块 (x, y) 在下一个增量帧中重新发送，例如对应的帧未能送达客户端"""
+        self._invalid.update(positions)
+
+    def invalidate_rect(self, x: int, y: int, width: int, height: int):
+        """标记与矩形重叠的所有分块在下一个增量帧中重新发送"""
+        ts = self.tile_size
+        self._invalid.update((col * ts, row * ts)
+                             for row in range(y // ts, -(-(y + height) // ts))
+                             for col in range(x // ts, -(-(x + width) // ts)))
+
+    def sent(self, frame_data: Dict[str, Any]) -> int:
+        """记录 encode() 输出的一帧已发送给客户端，返回它的帧序号"""
+        self.sent_seq += 1
+        if frame_data.get('type', FRAME_KEY) == FRAME_KEY:
+            # 关键帧之前的记录不再需要：没有收到关键帧的客户端只能重新接收整个画面
+            self._history.clear()
+            self._history.append((self.sent_seq, None, []))
+        else:
+            self._history.append((self.sent_seq, [(x, y) for x, y, _ in frame_data['tiles']],
+                                  list(frame_data.get('copies', ()))))
+        return self.sent_seq
+
+    def resume(self, seq: int) -> bool:
+        """
+        客户端断线重连，它的画面停留在第 seq 帧：把之后发送的帧涉及的分块标记为在下一帧重新发送，
+        并从 seq + 1 继续编号，关键帧间隔重新计时（否则断线较久时下一帧仍是关键帧）。
+        记录不足以恢复（已被淘汰、其中有关键帧或序号不符）时丢弃参考帧，下一帧为关键帧，返回 False
+        """
+        missed = [entry for entry in self._history if entry[0] > seq]
+        if (self._prev is None or not 0 <= seq <= self.sent_seq
+                or (missed and missed[0][0] != seq + 1)
+                or any(positions is None for _, positions, _ in missed)):
+            self.reset()
+            self._history.clear()
+            self.sent_seq = max(0, seq)
+            return False
+        for _, positions, copies in missed:
+            self.invalidate(positions)
+            for rect in copies:
+                self.invalidate_rect(*rect[2:])
+            self._history.pop()
+        self.sent_seq = seq
+        self._last_keyframe_time = time.time()
+        return True
+
+    def snapshot(self) -> Optional[np.ndarray]:
+        """返回参考帧（即客户端当前应显示内容）的副本，用于为新加入或落后的客户端生成关键帧"""
+        return None if self._prev is None else self._prev.copy()
+
+    def keyframe_due(self) -> bool:
+        """下一帧是否会是关键帧（没有参考帧或已到关键帧间隔），画面静止时据此仍按间隔发送关键帧"""
+        return self._prev is None or time.time() - self._last_keyframe_time >= self.keyframe_interval
+
+    def _keyframe_due(self, frame: np.ndarray) -> bool:
+        if self._prev is not None and self._prev.shape != frame.shape:
+            return True
+        return self.keyframe_due()
+
+    def encode(self, frame: np.ndarray) -> Dict[str, Any]:
+        """
+        编码一帧
+
+        Returns:
+            关键帧: {'type': 'key', 'image': frame}
+            增量帧: {'type': 'delta', 'copies': [复制矩形, ...], 'tiles': [(x, y, tile), ...]}，
+                    先应用复制矩形再应用分块；无变化时两者都为空
+        """
+        if self._keyframe_due(frame):
+            self._prev = frame.copy()
+            self._last_keyframe_time = time.time()
+            self._invalid.clear()
+            return {'type': FRAME_KEY, 'image': frame}
+
+        diff = changed_pixels(self._prev, frame)
+        copies: List[CopyRect] = []
+        # 客户端在失效分块处的内容与参考帧不同，复制矩形可能把过时的内容复制到别处，有失效分块时不检测平移
+        if self.detect_motion and not self._invalid:
+            copy = detect_motion(self._prev, frame, diff, self.tile_size)
+            if copy is not None:
+                # 参考帧按客户端的方式先复制，剩下的差异（新露出的部分等）再按分块发送
+                apply_copy(self._prev, copy)
+                copies.append(copy)
+                # 只有复制的目标区域发生了变化
+                _, _, x, y, width, height = copy
+                diff[y:y + height, x:x + width] = changed_pixels(self._prev[y:y + height, x:x + width],
+                                                                 frame[y:y + height, x:x + width])
+        mask = diff_tile_mask(diff, self.tile_size)
+        ts = self.tile_size
+        for x, y in self._invalid:
+            if y // ts < mask.shape[0] and x // ts < mask.shape[1]:
+                mask[y // ts, x // ts] = True
+        self._invalid.clear()
+        tiles: List[Tuple[int, int, np.ndarray]] = []
+        for row, col in zip(*np.nonzero(mask)):
+            y, x = int(row) * ts, int(col) * ts
+            tile = frame[y:y + ts, x:x + ts]
+            self._prev[y:y + ts, x:x + ts] = tile
+            tiles.append((x, y, np.ascontiguousarray(tile)))
+        return {'type': FRAME_DELTA, 'copies': copies, 'tiles': tiles}
+
+
+class FrameBuffer:
+    """客户端持久帧缓冲区：应用关键帧和增量分块"""
+
+    def __init__(self):
+        self.image: Optional[np.ndarray] = None
+
+    def apply(self, frame_data: Dict[str, Any]) -> Optional[np.ndarray]:
+        """
+        将收到的帧合并到缓冲区
+
+        Returns:
+            合并后的完整图像；尚未收到关键帧时返回 None
+        """
+        frame_type = frame_data.get('type', FRAME_KEY)
+        if frame_type == FRAME_KEY:
+            image = frame_data['image']
+            # 接收到的数组可能是只读的，复制一份以便后续打补丁
+            self.image = image if image.flags.writeable else image.copy()
+        elif frame_type == FRAME_DELTA:
+            if self.image is None:
+                return None
+            for rect in frame_data.get('copies', ()):
+                apply_copy(self.image, rect)
+            for x, y, tile in frame_data['tiles']:
+                h, w = tile.shape[:2]
+                self.image[y:y + h, x:x + w] = tile
+        return self.image
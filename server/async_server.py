@@ -0,0 +1,387 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+from .server import RemoteDesktopServer, ClientState
+from .utils import capture_screen, get_screen_resolution, list_monitors
+from .cursor import CursorTracker
+from .idle import IdleScheduler
+from common.tiles import TileDiffer, FRAME_KEY, FRAME_DELTA
+from common.codecs import DEFAULT_CODEC_PREFERENCE, available_codecs, create_codec
+from common.frames import encode_frame
+from common.cursor import encode_cursor
+from common.metrics import MetricsRegistry
+from common.protocol import MSG_FRAME, MSG_CURSOR, MessageDecoder, pack_message, async_send_json, async_recv_json
+
+# 观看者的发送缓冲区超过这个大小（字节）时不再写入指针消息，等缓冲区排空后只补发最新的指针
+CURSOR_BUFFER_LIMIT = 64 * 1024
+
+
+class SharedFrameSource:
+    """
+    共享帧源：每帧只捕获和编码一次，结果供所有订阅者使用
+
+    增量帧总是相对于上一帧的，跟不上的订阅者改为获取当前参考帧的关键帧。
+    """
+
+    def __init__(self, capture: Callable[[], Dict[str, Any]],
+                 encode: Callable[[Dict[str, Any]], bytes],
+                 differ: TileDiffer,
+                 metrics: Optional[MetricsRegistry] = None,
+                 scheduler: Optional[IdleScheduler] = None):
+        self.capture = capture
+        self.encode = encode
+        self.differ = differ
+        self.scheduler = scheduler
+        metrics = metrics or MetricsRegistry()
+        self.capture_time = metrics.histogram('capture')
+        self.encode_time = metrics.histogram('encode')
+        self.seq = 0
+        self.resolution: Tuple[int, int] = (0, 0)
+        self.timestamp = 0.0  # 参考帧的捕获时间
+        # 最新一帧: (序号, 是否关键帧, 帧消息)
+        self.latest: Optional[Tuple[int, bool, bytes]] = None
+
+        self._lock = threading.Lock()
+        self._keyframe_lock = threading.Lock()
+        self._keyframe: Optional[Tuple[int, bytes]] = None
+
+    def produce(self) -> bool:
+        """捕获并编码一帧（在线程池中执行），画面无变化时返回 False"""
+        start_time = time.perf_counter()
+        frame_data = self.capture()
+        encode_start = time.perf_counter()
+        self.capture_time.record(encode_start - start_time)
+        # 画面静止时仍按关键帧间隔编码关键帧
+        if (self.scheduler and not self.scheduler.changed(frame_data['image'])
+                and not self.differ.keyframe_due()):
+            return False
+        with self._lock:
+            frame_data.update(self.differ.encode(frame_data.pop('image')))
+            if frame_data['type'] == FRAME_DELTA and not frame_data['tiles'] and not frame_data['copies']:
+                return False
+            self.seq += 1
+            seq = self.seq
+            self.resolution = frame_data['resolution']
+            self.timestamp = frame_data.get('timestamp') or time.time()
+
+        message = self.encode(frame_data)
+        self.encode_time.record(time.perf_counter() - encode_start)
+        is_key = frame_data['type'] == FRAME_KEY
+        if is_key:
+            self._keyframe = (seq, message)
+        self.latest = (seq, is_key, message)
+        return True
+
+    def keyframe(self) -> Tuple[int, bytes]:
+        """返回当前参考帧编码后的关键帧，同一序号只编码一次"""
+        with self._keyframe_lock:
+            with self._lock:
+                seq = self.seq
+                if self._keyframe and self._keyframe[0] == seq:
+                    return self._keyframe
+                image = self.differ.snapshot()
+                resolution = self.resolution
+                timestamp = self.timestamp
+            message = self.encode({'type': FRAME_KEY, 'image': image, 'resolution': resolution,
+                                   'timestamp': timestamp})
+            self._keyframe = (seq, message)
+            return self._keyframe
+
+
+class Subscriber:
+    """一个观看者连接及其发送状态"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, addr: Any):
+        self.reader = reader
+        self.writer = writer
+        self.addr = addr
+        self.wakeup = asyncio.Event()
+        self.state = ClientState()
+        self.last_seq = 0
+        self.frames_sent = 0
+        self.keyframes_sent = 0
+        self.frames_skipped = 0
+        self.cursor_pending = False  # 因发送缓冲区积压跳过了指针更新，排空后补发最新的位置和形状
+
+
+class AsyncRemoteDesktopServer(RemoteDesktopServer):
+    """
+    基于 asyncio 的远程桌面服务器，支持多个观看者同时连接同一台主机
+
+    捕获和编码由单个生产者完成后分发给所有订阅者。每个订阅者有独立的发送缓冲区，
+    发送较慢的订阅者直接跳到最新帧，不会拖慢其他订阅者。
+    """
+
+    def __init__(self, host: str = '0.0.0.0', port: int = 9999,
+                 max_connections: int = 16,
+                 codec: Optional[str] = None,
+                 capture: Callable[[], Dict[str, Any]] = capture_screen,
+                 **kwargs):
+        """
+        Args:
+            max_connections: 最大同时观看者数量
+            codec: 所有观看者共用的编解码器，默认选择可用编解码器中最优先的一个
+            capture: 屏幕捕获函数
+            **kwargs: 其余参数同 RemoteDesktopServer
+        """
+        super().__init__(host=host, port=port, max_connections=max_connections, **kwargs)
+        if codec is None:
+            codec = next(name for name in DEFAULT_CODEC_PREFERENCE if name in available_codecs())
+        self.codec = create_codec(codec, self.compression_level)
+        self.capture = capture
+        # 所有观看者共用一次编码，不按单个观看者调整码率；较慢的观看者通过跳帧处理
+        self.adaptive_bitrate = False
+        self.subscribers: Set[Subscriber] = set()
+        self.source: Optional[SharedFrameSource] = None
+        self.scheduler = IdleScheduler(self.idle_interval) if self.idle_interval else None
+        self.cursor_tracker = CursorTracker()
+        self.executor = ThreadPoolExecutor(max_workers=max(1, self.encoder_workers))
+        # 输入事件在单独的线程中按顺序执行，不会排在编码任务之后
+        self.input_executor = ThreadPoolExecutor(max_workers=1)
+        self.send_time = self.metrics.histogram('send')
+
+    def stop(self):
+        """请求停止服务器，事件循环会在下一次检查时退出并清理资源"""
+        self.running = False
+        self.exit_event.set()
+        if self.scheduler:
+            self.scheduler.interrupt()
+
+    def start(self):
+        """启动服务器"""
+        self.running = True
+        self.start_time = time.time()
+        self._start_keyboard_listener()
+        self._start_metrics_server()
+        try:
+            asyncio.run(self._serve())
+        except Exception as e:
+            self.logger.error(f"服务器错误: {e}")
+        finally:
+            self.running = False
+            self.exit_event.set()
+            self.executor.shutdown(wait=False)
+            self.input_executor.shutdown(wait=False)
+            super().stop()
+
+    async def _serve(self):
+        self.source = SharedFrameSource(
+            capture=self.capture,
+            encode=lambda frame_data: encode_frame(frame_data, self.codec, self.quality),
+            differ=TileDiffer(self.tile_size, self.keyframe_interval, self.motion_detection),
+            metrics=self.metrics,
+            scheduler=self.scheduler
+        )
+        self.metrics.gauge('subscribers', lambda: len(self.subscribers))
+        self.metrics.gauge('frames_skipped', lambda: sum(s.frames_skipped for s in list(self.subscribers)))
+        server = await asyncio.start_server(self._handle_client, self.host, self.port,
+                                            backlog=self.max_connections)
+        self.logger.info(f"服务器正在监听 {self.host}:{self.port}（asyncio 模式，编解码器: {self.codec.name}）...")
+        # 所有观看者看到的是同一个帧流，整个服务器录制为一个会话
+        self._open_recorder('shared', {'codec': self.codec.name, 'screen': get_screen_resolution()})
+        producer = asyncio.create_task(self._produce_frames())
+        cursor = asyncio.create_task(self._produce_cursor()) if self.cursor_interval else None
+        try:
+            while self.running and not self.exit_event.is_set():
+                await asyncio.sleep(0.5)
+                if producer.done():
+                    producer.result()
+                if cursor and cursor.done():
+                    cursor.result()
+
+                # 定期打印统计信息
+                current_time = time.time()
+                if current_time - self.last_stats_time >= 5.0:  # 每5秒打印一次
+                    self._print_stats()
+                    self.last_stats_time = current_time
+        finally:
+            producer.cancel()
+            if cursor:
+                cursor.cancel()
+            server.close()
+            for subscriber in list(self.subscribers):
+                subscriber.writer.close()
+            await server.wait_closed()
+
+    async def _produce_frames(self):
+        """捕获和编码（画面静止时逐步放慢），有新帧时唤醒所有订阅者"""
+        loop = asyncio.get_running_loop()
+        while self.running:
+            start_time = time.perf_counter()
+            if self.subscribers:
+                if await loop.run_in_executor(self.executor, self.source.produce):
+                    if self.recorder:
+                        self.recorder.record(MSG_FRAME, self.source.latest[2])
+                    for subscriber in self.subscribers:
+                        subscriber.wakeup.set()
+            elapsed = time.perf_counter() - start_time
+            if self.scheduler:
+                # 在默认线程池中等待，收到输入时由 wake() 提前唤醒
+                delay = self.scheduler.interval(self.screen_capture_interval) - elapsed
+                await loop.run_in_executor(None, self.scheduler.wait, max(0.0, delay))
+            else:
+                await asyncio.sleep(max(0.0, self.screen_capture_interval - elapsed))
+
+    async def _produce_cursor(self):
+        """
+        轮询指针，位置或形状变化时发给需要远程指针的观看者（消息很小，直接写入发送缓冲区）
+
+        发送缓冲区积压的观看者跳过更新，不让缓冲区无限增长；缓冲区排空后补发一次最新的位置和完整形状
+        """
+        latest = None
+        while self.running:
+            viewers = [s for s in self.subscribers if s.state.cursor]
+            update = self.cursor_tracker.poll() if viewers else None
+            message = full = None
+            if update:
+                position, shape, shape_changed = update
+                latest = (position, shape)
+                width, height = get_screen_resolution()
+                payload = encode_cursor(0, position, (width, height), shape.shape_id, shape.hotspot,
+                                        shape.image if shape_changed else None)
+                message = pack_message(MSG_CURSOR, payload)
+                if shape_changed:
+                    full = message
+                if self.recorder:
+                    self.recorder.record(MSG_CURSOR, payload)
+            for subscriber in viewers:
+                if subscriber.writer.transport.get_write_buffer_size() > CURSOR_BUFFER_LIMIT:
+                    subscriber.cursor_pending = subscriber.cursor_pending or message is not None
+                    continue
+                if subscriber.cursor_pending and latest:
+                    if full is None:
+                        position, shape = latest
+                        full = pack_message(MSG_CURSOR, encode_cursor(0, position, get_screen_resolution(),
+                                                                      shape.shape_id, shape.hotspot, shape.image))
+                    subscriber.writer.write(full)
+                    subscriber.cursor_pending = False
+                elif message is not None:
+                    subscriber.writer.write(message)
+            await asyncio.sleep(self.cursor_interval)
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        addr = writer.get_extra_info('peername')
+        if len(self.subscribers) >= self.max_connections:
+            self.logger.warning(f"观看者数量已达上限，拒绝连接: {addr}")
+            writer.close()
+            return
+
+        subscriber = Subscriber(reader, writer, addr)
+        tasks = []
+        try:
+            hello = await async_recv_json(reader)
+            if self.codec.name not in hello.get('codecs', []):
+                await async_send_json(writer, {'error': f"客户端不支持编解码器 {self.codec.name}"})
+                self.logger.warning(f"客户端 {addr} 不支持编解码器 {self.codec.name}")
+                return
+            subscriber.state.update(hello)
+            await async_send_json(writer, {'codec': self.codec.name, 'screen': get_screen_resolution(),
+                                           'monitors': list_monitors()})
+
+            self.subscribers.add(subscriber)
+            self._wake_capture()
+            # 新观看者需要完整的指针位置和形状
+            self.cursor_tracker.reset()
+            self.logger.info(f"新观看者连接: {addr}，当前观看者: {len(self.subscribers)}")
+            subscriber.wakeup.set()
+            tasks = [asyncio.create_task(self._send_frames(subscriber)),
+                     asyncio.create_task(self._receive_input(subscriber))]
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() and self.running:
+                    self.logger.error(f"观看者 {addr} 连接错误: {task.exception()}")
+        except (ConnectionError, asyncio.IncompleteReadError) as e:
+            self.logger.info(f"观看者 {addr} 断开连接: {e}")
+        except asyncio.CancelledError:
+            # 服务器关闭
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            self.subscribers.discard(subscriber)
+            writer.close()
+            self.logger.info(f"观看者断开: {addr}，发送 {subscriber.frames_sent} 帧，"
+                             f"跳过 {subscriber.frames_skipped} 帧，关键帧 {subscriber.keyframes_sent}")
+
+    async def _send_frames(self, subscriber: Subscriber):
+        """向单个订阅者发送最新帧；落后时跳过中间帧并改发关键帧"""
+        loop = asyncio.get_running_loop()
+        while self.running:
+            await subscriber.wakeup.wait()
+            subscriber.wakeup.clear()
+            latest = self.source.latest
+            if latest is None or latest[0] == subscriber.last_seq:
+                continue
+
+            seq, is_key, message = latest
+            # 客户端丢弃了积压的帧时也改发关键帧
+            resync = subscriber.state.keyframe_requested
+            subscriber.state.keyframe_requested = False
+            if is_key:
+                subscriber.keyframes_sent += 1
+            elif resync or seq != subscriber.last_seq + 1:
+                if subscriber.last_seq:
+                    subscriber.frames_skipped += seq - subscriber.last_seq - 1
+                seq, message = await loop.run_in_executor(self.executor, self.source.keyframe)
+                subscriber.keyframes_sent += 1
+
+            send_start = time.perf_counter()
+            subscriber.writer.write(pack_message(MSG_FRAME, message))
+            await subscriber.writer.drain()
+            self.send_time.record(time.perf_counter() - send_start)
+            subscriber.last_seq = seq
+            subscriber.frames_sent += 1
+            self._count_frame(len(message))
+
+    async def _receive_input(self, subscriber: Subscriber):
+        """接收订阅者的输入事件（所有观看者共用一次编码，图像质量以最后一次调整为准）"""
+        loop = asyncio.get_running_loop()
+        decoder = MessageDecoder()
+        while self.running:
+            event_data = await subscriber.reader.read(self.buffer_size)
+            if not event_data:
+                return
+            for msg_type, payload in decoder.feed(event_data):
+                await loop.run_in_executor(self.input_executor, self.handle_message,
+                                           msg_type, payload, subscriber.state)
+
+    def handle_message(self, msg_type: int, payload: bytes, state: ClientState):
+        """处理观看者发来的一条消息"""
+        super().handle_message(msg_type, payload, state)
+        # 所有观看者共用同一画面，不支持单独的视口、查看区域和显示器订阅
+        state.viewport = None
+        state.roi = None
+        state.monitors = None
+
+    def _wake_capture(self):
+        """画面静止而放慢的捕获恢复全速"""
+        if self.scheduler:
+            self.scheduler.wake()
+
+    def _print_stats(self):
+        """打印统计信息"""
+        super()._print_stats()
+        if self.subscribers:
+            skipped = sum(s.frames_skipped for s in self.subscribers)
+            self.logger.info(f"观看者: {len(self.subscribers)}, 已生成帧: {self.source.seq}, 跳过帧: {skipped}")
+
+
+def main():
+    """主函数"""
+    try:
+        server = AsyncRemoteDesktopServer()
+        server.start()
+    except KeyboardInterrupt:
+        logging.info("收到键盘中断信号，程序正常退出")
+    except Exception as e:
+        logging.error(f"程序异常退出: {e}")
+    finally:
+        sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import logging
+import time
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class BitrateController:
+    """
+    服务器端自适应码率控制器
+
+    根据客户端反馈（解码耗时、显示帧率、接收吞吐量）和服务器发送阶段的阻塞时间估计端到端延迟，
+    超过目标延迟时依次降低图像质量、缩小画面、降低帧率；延迟持续充足时按相反顺序逐步恢复。
+    客户端显示帧率与两次反馈之间实际发送的帧率（frame_sent() 计数）比较，画面静止时发送的帧少不算积压。
+    """
+
+    def __init__(self, base_interval: float = 0.1, base_quality: int = 75,
+                 target_latency: float = 0.15,
+                 min_quality: int = 20, min_scale: float = 0.25, max_interval: float = 1.0,
+                 recover_after: int = 3):
+        """
+        Args:
+            base_interval: 正常情况下的捕获间隔（秒）
+            base_quality: 正常情况下的图像质量
+            target_latency: 目标延迟（秒）
+            min_quality: 图像质量下限
+            min_scale: 缩放比例下限
+            max_interval: 捕获间隔上限（秒）
+            recover_after: 连续多少次反馈延迟充足后才提升一级
+        """
+        self.base_interval = base_interval
+        self.base_quality = base_quality
+        self.target_latency = target_latency
+        self.min_quality = min_quality
+        self.min_scale = min_scale
+        self.max_interval = max_interval
+        self.recover_after = recover_after
+
+        self.quality = base_quality
+        self.scale = 1.0
+        self.interval = base_interval
+        self.latency = 0.0
+        self._healthy_reports = 0
+        self._frames_sent = 0
+        self._sent_since = time.monotonic()
+
+    def frame_sent(self) -> None:
+        """记录发送了一帧"""
+        self._frames_sent += 1
+
+    def estimate_latency(self, feedback: Dict[str, Any], send_time: float, frame_bytes: float) -> float:
+        """
+        估计单帧延迟（秒）：服务器发送阻塞 + 链路传输 + 客户端解码
+
+        Args:
+            feedback: 客户端反馈 {'fps', 'decode_ms', 'throughput'}
+            send_time: 服务器最近的平均发送耗时（秒），socket 缓冲区满时会明显增大
+            frame_bytes: 最近的平均帧大小
+        """
+        throughput = feedback.get('throughput', 0)
+        transfer = frame_bytes / throughput if throughput > 0 else 0.0
+        return send_time + transfer + feedback.get('decode_ms', 0) / 1000
+
+    def update(self, feedback: Dict[str, Any], send_time: float, frame_bytes: float) -> bool:
+        """
+        处理一次客户端反馈
+
+        Returns:
+            参数是否发生变化
+        """
+        self.latency = self.estimate_latency(feedback, send_time, frame_bytes)
+        fps = feedback.get('fps', 0)
+        now = time.monotonic()
+        elapsed = now - self._sent_since
+        sent_fps = self._frames_sent / elapsed if elapsed > 0 else 0.0
+        self._frames_sent, self._sent_since = 0, now
+        # 客户端显示帧率明显低于发送帧率也说明帧在链路或客户端积压；
+        # 画面没有变化的帧不发送，发送帧率可能远低于捕获间隔对应的帧率
+        lagging = fps > 0 and fps < 0.7 * min(1 / self.interval, sent_fps)
+
+        if self.latency > self.target_latency or lagging:
+            self._healthy_reports = 0
+            return self._degrade()
+        if self.latency < self.target_latency * 0.5:
+            self._healthy_reports += 1
+            if self._healthy_reports >= self.recover_after:
+                self._healthy_reports = 0
+                return self._recover()
+        else:
+            self._healthy_reports = 0
+        return False
+
+    def _degrade(self) -> bool:
+        if self.quality > self.min_quality:
+            self.quality = max(self.min_quality, int(self.quality * 0.8))
+        elif self.scale > self.min_scale:
+            self.scale = max(self.min_scale, round(self.scale * 0.75, 2))
+        elif self.interval < self.max_interval:
+            self.interval = min(self.max_interval, self.interval * 1.5)
+        else:
+            return False
+        logger.info(f"链路拥塞（估计延迟 {self.latency * 1000:.0f}ms），降低码率: "
+                    f"质量={self.quality}, 缩放={self.scale}, 间隔={self.interval:.2f}s")
+        return True
+
+    def _recover(self) -> bool:
+        if self.interval > self.base_interval:
+            self.interval = max(self.base_interval, self.interval / 1.5)
+        elif self.scale < 1.0:
+            self.scale = min(1.0, round(self.scale / 0.75, 2))
+        elif self.quality < self.base_quality:
+            self.quality = min(self.base_quality, self.quality + 5)
+        else:
+            return False
+        logger.info(f"链路恢复（估计延迟 {self.latency * 1000:.0f}ms），提高码率: "
+                    f"质量={self.quality}, 缩放={self.scale}, 间隔={self.interval:.2f}s")
+        return True
@@ -0,0 +1,244 @@
+import threading
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from mss import mss
+except ImportError:
+    mss = None
+
+try:
+    from PIL import ImageGrab
+except ImportError:
+    ImageGrab = None
+
+
+class CaptureBackend:
+    """
+    屏幕捕获后端基类
+
+    捕获结果写入轮换使用的预分配缓冲区，grab() 返回的数组在之后 buffers - 1 次 grab 内保持有效，
+    因此 buffers 应大于流水线中同时在途的帧数。每个画面流（整个屏幕或单个显示器）使用各自的缓冲区，
+同时捕获同一画面的多个使用方（例如 TCP 画面流和共享内存发布）应使用不同的 stream。
+    """
+
+    name = ''
+
+    def __init__(self, buffers: int = 4):
+        self.buffers = max(1, buffers)
+        self.allocations = 0  # 缓冲区分配次数（画面尺寸变化时才会重新分配）
+        self._rings: Dict[Any, List[np.ndarray]] = {}
+        self._indexes: Dict[Any, int] = {}
+        self._ring_lock = threading.Lock()
+
+    def _next_buffer(self, shape: Tuple[int, ...], stream: Any = 0) -> np.ndarray:
+        """取画面流 stream 的下一个可写缓冲区，画面尺寸变化时重新分配"""
+        with self._ring_lock:
+            ring = self._rings.get(stream)
+            if not ring or ring[0].shape != shape:
+                ring = self._rings[stream] = []
+                self._indexes[stream] = 0
+            if len(ring) < self.buffers:
+                ring.append(np.empty(shape, dtype=np.uint8))
+                self.allocations += 1
+                return ring[-1]
+            index = self._indexes[stream]
+            self._indexes[stream] = (index + 1) % self.buffers
+            return ring[index]
+
+    def monitors(self) -> List[Dict[str, int]]:
+        """
+        枚举显示器
+
+        Returns:
+            每个显示器一项 {'id', 'x', 'y', 'width', 'height', 'primary'}，坐标为虚拟桌面坐标；
+            不支持枚举时返回空列表
+        """
+        return []
+
+    def grab_monitor(self, monitor: Dict[str, int]) -> np.ndarray:
+        """捕获 monitors() 返回的一个显示器的画面"""
+        return self.grab((monitor['x'], monitor['y'], monitor['width'], monitor['height']))
+
+    def grab(self, region: Optional[Tuple[int, int, int, int]] = None, stream: Any = 0) -> np.ndarray:
+        """
+        捕获一帧
+
+        Args:
+            region: 只捕获画面中的区域 (x, y, 宽, 高)，为 None 时捕获整个画面
+            stream: 使用的缓冲区所属的画面流
+
+        Returns:
+            (H, W, 3) 的 RGB 数组
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class MssBackend(CaptureBackend):
+    """
+    基于持久 mss 会话的捕获后端，BGRA 原始数据直接转换到预分配的 RGB 缓冲区
+
+    mss 每次 grab 都会把像素复制到它新分配的原始数据缓冲区（不支持写入调用方的缓冲区），
+    因此每帧仍有一次这样的分配和复制；省去的是转换结果的分配和 PIL 图像的中间副本。
+    """
+
+    name = 'mss'
+
+    def __init__(self, buffers: int = 4, monitor: int = 1):
+        """
+        Args:
+            buffers: 缓冲区数量
+            monitor: mss 显示器编号，0 为所有显示器拼接的画面，1 为主显示器
+        """
+        super().__init__(buffers)
+        if mss is None:
+            raise RuntimeError("未安装 mss")
+        self.monitor = monitor
+        # mss 会话使用的系统句柄与线程绑定，每个捕获线程（每个画面流一个）使用自己的会话
+        self._local = threading.local()
+        self._sessions: List[Any] = []
+
+    def _get_session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = mss()
+            self._sessions.append(session)
+        return session
+
+    def _grab_rect(self, rect: Dict[str, int], stream: Any) -> np.ndarray:
+        shot = self._get_session().grab(rect)
+        bgra = np.frombuffer(shot.raw, dtype=np.uint8).reshape(shot.height, shot.width, 4)
+        frame = self._next_buffer((shot.height, shot.width, 3), stream)
+        np.copyto(frame, bgra[:, :, 2::-1])
+        return frame
+
+    def grab(self, region: Optional[Tuple[int, int, int, int]] = None, stream: Any = 0) -> np.ndarray:
+        monitor = self._get_session().monitors[self.monitor]
+        if region is not None:
+            x, y, width, height = region
+            monitor = {'left': monitor['left'] + x, 'top': monitor['top'] + y,
+                       'width': width, 'height': height}
+        return self._grab_rect(monitor, stream)
+
+    def monitors(self) -> List[Dict[str, int]]:
+        # mss 的 monitors[0] 是所有显示器拼接的画面，之后是各个显示器，编号与 mss 一致
+        monitors = self._get_session().monitors[1:]
+        return [{'id': index, 'x': m['left'], 'y': m['top'], 'width': m['width'], 'height': m['height'],
+                 'primary': index == 1}
+                for index, m in enumerate(monitors, start=1)]
+
+    def grab_monitor(self, monitor: Dict[str, int]) -> np.ndarray:
+        rect = {'left': monitor['x'], 'top': monitor['y'], 'width': monitor['width'], 'height': monitor['height']}
+        return self._grab_rect(rect, monitor['id'])
+
+    def close(self) -> None:
+        sessions, self._sessions = self._sessions, []
+        self._local = threading.local()
+        for session in sessions:
+            try:
+                session.close()
+            except Exception:
+                pass
+
+
+class ImageGrabBackend(CaptureBackend):
+    """PIL.ImageGrab 捕获后端（mss 不可用时的后备方案，每帧都会分配新的图像，不使用轮换缓冲区）"""
+
+    name = 'imagegrab'
+
+    def __init__(self, buffers: int = 4):
+        super().__init__(buffers)
+        if ImageGrab is None:
+            raise RuntimeError("未安装 pillow")
+
+    def grab(self, region: Optional[Tuple[int, int, int, int]] = None, stream: Any = 0) -> np.ndarray:
+        bbox = None
+        if region is not None:
+            x, y, width, height = region
+            bbox = (x, y, x + width, y + height)
+        frame = np.asarray(ImageGrab.grab(bbox=bbox))
+        if frame.ndim == 3 and frame.shape[2] == 4:
+            frame = frame[:, :, :3]
+        return frame
+
+
+class FakeBackend(CaptureBackend):
+    """合成画面捕获后端：静态背景上移动的方块，用于无显示器环境下的测试和基准测试"""
+
+    name = 'fake'
+
+    def __init__(self, buffers: int = 4, width: int = 1920, height: int = 1080, box: int = 64,
+                 monitors: int = 1):
+        """
+        Args:
+            monitors: 模拟的显示器数量，整个画面按宽度平分为左右排列的显示器
+        """
+        super().__init__(buffers)
+        self.width = width
+        self.height = height
+        self.box = box
+        self.monitor_count = max(1, monitors)
+        self.frame_count = 0
+        yy, xx = np.mgrid[0:height, 0:width]
+        self._background = np.stack([
+            (xx * 255 // max(1, width - 1)),
+            (yy * 255 // max(1, height - 1)),
+            np.full_like(xx, 128)
+        ], axis=2).astype(np.uint8)
+
+    def _render(self, stream: Any) -> np.ndarray:
+        self.frame_count += 1
+        frame = self._next_buffer(self._background.shape, stream)
+        np.copyto(frame, self._background)
+        x = (self.frame_count * 16) % (self.width - self.box)
+        y = (self.frame_count * 9) % (self.height - self.box)
+        frame[y:y + self.box, x:x + self.box] = 255
+        return frame
+
+    def grab(self, region: Optional[Tuple[int, int, int, int]] = None, stream: Any = 0) -> np.ndarray:
+        frame = self._render(stream)
+        if region is not None:
+            x, y, width, height = region
+            return frame[y:y + height, x:x + width]
+        return frame
+
+    def monitors(self) -> List[Dict[str, int]]:
+        if self.monitor_count == 1:
+            return []
+        width = self.width // self.monitor_count
+        return [{'id': index + 1, 'x': index * width, 'y': 0, 'width': width, 'height': self.height,
+                 'primary': index == 0}
+                for index in range(self.monitor_count)]
+
+    def grab_monitor(self, monitor: Dict[str, int]) -> np.ndarray:
+        frame = self._render(monitor['id'])
+        x, y = monitor['x'], monitor['y']
+        return frame[y:y + monitor['height'], x:x + monitor['width']]
+
+
+CAPTURE_BACKENDS = {
+    MssBackend.name: MssBackend,
+    ImageGrabBackend.name: ImageGrabBackend,
+    FakeBackend.name: FakeBackend,
+}
+
+
+def create_capture_backend(name: str = 'auto', buffers: int = 4, **kwargs) -> CaptureBackend:
+    """
+    创建捕获后端
+
+    Args:
+        name: 'auto'（优先 mss，失败时使用 ImageGrab）、'mss'、'imagegrab' 或 'fake'
+        buffers: 轮换缓冲区数量
+    """
+    if name != 'auto':
+        if name not in CAPTURE_BACKENDS:
+            raise ValueError(f"不支持的捕获后端: {name}")
+        return CAPTURE_BACKENDS[name](buffers, **kwargs)
+    try:
+        return MssBackend(buffers, **kwargs)
+    except RuntimeError:
+        return ImageGrabBackend(buffers)
@@ -0,0 +1,191 @@
+import sys
+import numpy as np
+import pyautogui
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 指针形状的像素图：'X' 为黑色描边，'.' 为白色填充，空格为透明
+_SHAPE_ART = {
+    'arrow': ((0, 0), [
+        "X",
+        "XX",
+        "X.X",
+        "X..X",
+        "X...X",
+        "X....X",
+        "X.....X",
+        "X......X",
+        "X.......X",
+        "X........X",
+        "X.........X",
+        "X......XXXXX",
+        "X...X..X",
+        "X..XX..X",
+        "X.X  X..X",
+        "XX   X..X",
+        "X     X..X",
+        "      X..X",
+        "       XX",
+    ]),
+    'ibeam': ((3, 8), [
+        "XXX XXX",
+        "X..X..X",
+        "XXX.XXX",
+        "  X.X",
+        "  X.X",
+        "  X.X",
+        "  X.X",
+        "  X.X",
+        "  X.X",
+        "  X.X",
+        "  X.X",
+        "  X.X",
+        "  X.X",
+        "  X.X",
+        "XXX.XXX",
+        "X..X..X",
+        "XXX XXX",
+    ]),
+    'cross': ((7, 7), [
+        "      XXX",
+        "      X.X",
+        "      X.X",
+        "      X.X",
+        "      X.X",
+        "      X.X",
+        "XXXXXXX.XXXXXXX",
+        "X.............X",
+        "XXXXXXX.XXXXXXX",
+        "      X.X",
+        "      X.X",
+        "      X.X",
+        "      X.X",
+        "      X.X",
+        "      XXX",
+    ]),
+    'hand': ((5, 0), [
+        "     XX",
+        "    X..X",
+        "    X..X",
+        "    X..X",
+        "    X..XXX",
+        "    X..X..XXX",
+        "    X..X..X..XX",
+        " XX X..X..X..X.X",
+        "X..XX.........X.X",
+        "X...X...........X",
+        " X..............X",
+        "  X.............X",
+        "  X............X",
+        "   X...........X",
+        "   X..........X",
+        "    X.........X",
+        "    X.........X",
+        "    XXXXXXXXXXX",
+    ]),
+    'hidden': ((0, 0), [" "]),
+}
+
+
+class CursorShape:
+    """指针形状：编号、热点和 RGBA 像素"""
+
+    def __init__(self, shape_id: int, name: str, hotspot: Tuple[int, int], image: np.ndarray):
+        self.shape_id = shape_id
+        self.name = name
+        self.hotspot = hotspot
+        self.image = image
+
+
+def _render_shape(shape_id: int, name: str, hotspot: Tuple[int, int], art: List[str]) -> CursorShape:
+    width = max(len(line) for line in art)
+    image = np.zeros((len(art), width, 4), dtype=np.uint8)
+    for y, line in enumerate(art):
+        for x, pixel in enumerate(line):
+            if pixel == 'X':
+                image[y, x] = (0, 0, 0, 255)
+            elif pixel == '.':
+                image[y, x] = (255, 255, 255, 255)
+    return CursorShape(shape_id, name, hotspot, image)
+
+
+# 名称 -> 形状，编号在所有连接中固定
+CURSOR_SHAPES: Dict[str, CursorShape] = {
+    name: _render_shape(shape_id, name, hotspot, art)
+    for shape_id, (name, (hotspot, art)) in enumerate(_SHAPE_ART.items())
+}
+
+
+def _pointer_query() -> Tuple[str, Tuple[int, int]]:
+    """通用实现：只查询位置，形状总是箭头"""
+    x, y = pyautogui.position()
+    return 'arrow', (int(x), int(y))
+
+
+def _windows_pointer_query() -> Callable[[], Tuple[str, Tuple[int, int]]]:
+    """Windows：GetCursorInfo 同时返回位置和指针句柄，系统标准指针映射为同名形状"""
+    import ctypes
+    from ctypes import wintypes
+
+    class CURSORINFO(ctypes.Structure):
+        _fields_ = [('cbSize', wintypes.DWORD), ('flags', wintypes.DWORD),
+                    ('hCursor', wintypes.HANDLE), ('ptScreenPos', wintypes.POINT)]
+
+    CURSOR_SHOWING = 0x1
+    user32 = ctypes.windll.user32
+    user32.LoadCursorW.argtypes = [wintypes.HINSTANCE, wintypes.LPVOID]
+    user32.LoadCursorW.restype = wintypes.HANDLE
+    # IDC_* 标准指针编号 -> 形状名称，没有对应形状的标准指针显示为箭头
+    standard = {32512: 'arrow', 32513: 'ibeam', 32515: 'cross', 32649: 'hand'}
+    handles = {user32.LoadCursorW(None, idc): name for idc, name in standard.items()}
+
+    def query() -> Tuple[str, Tuple[int, int]]:
+        info = CURSORINFO()
+        info.cbSize = ctypes.sizeof(info)
+        if not user32.GetCursorInfo(ctypes.byref(info)):
+            return _pointer_query()
+        position = (info.ptScreenPos.x, info.ptScreenPos.y)
+        if not info.flags & CURSOR_SHOWING:
+            return 'hidden', position
+        return handles.get(info.hCursor, 'arrow'), position
+
+    return query
+
+
+def default_pointer_query() -> Callable[[], Tuple[str, Tuple[int, int]]]:
+    """当前平台上查询指针形状名称和屏幕位置的函数"""
+    if sys.platform == 'win32':
+        try:
+            return _windows_pointer_query()
+        except (AttributeError, OSError):
+            pass
+    return _pointer_query
+
+
+class CursorTracker:
+    """指针跟踪：轮询位置和形状，只在变化时产生更新，形状只在变化时附带"""
+
+    def __init__(self, query: Optional[Callable[[], Tuple[str, Tuple[int, int]]]] = None):
+        """
+        Args:
+            query: 返回 (形状名称, 屏幕位置) 的函数，默认按平台选择
+        """
+        self.query = query or default_pointer_query()
+        self._position: Optional[Tuple[int, int]] = None
+        self._shape: Optional[str] = None
+
+    def reset(self) -> None:
+        """下一次 poll() 重新发送位置和形状，例如有新的画面流"""
+        self._position = None
+        self._shape = None
+
+    def poll(self) -> Optional[Tuple[Tuple[int, int], CursorShape, bool]]:
+        """
+        Returns:
+            (屏幕位置, 当前形状, 形状是否变化)；位置和形状都没有变化时返回 None
+        """
+        name, position = self.query()
+        shape_changed = name != self._shape
+        if position == self._position and not shape_changed:
+            return None
+        self._position, self._shape = position, name
+        return position, CURSOR_SHAPES.get(name, CURSOR_SHAPES['arrow']), shape_changed
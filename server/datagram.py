@@ -0,0 +1,126 @@
+import logging
+import socket
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from common.datagram import DATAGRAM_KEY, DATAGRAM_LAST, REGISTER_DATAGRAM, pack_datagram
+
+logger = logging.getLogger(__name__)
+
+
+class DatagramSender:
+    """
+    数据报发送端：每个连接一个 UDP 套接字
+
+    客户端先从自己的 UDP 端口发送登记数据报（会话令牌），服务器把帧数据报发往登记的地址，
+    因此客户端位于 NAT 之后也可以接收。每个数据报分配递增的序号，最近的数据报包含哪些分块
+    保存在环形历史中，客户端报告丢失的序号时据此找出需要重新发送的分块。
+    """
+
+    def __init__(self, host: str, token: int, history: int = 8192,
+                 on_register: Optional[Callable[[], None]] = None,
+                 send_buffer: int = 4 * 1024 * 1024):
+        """
+        Args:
+            host: 监听地址（与 TCP 监听地址相同）
+            token: 会话令牌，握手时告知客户端，用于识别登记数据报和客户端校验帧数据报
+            history: 保留分块位置的最近数据报数，更早的丢失报告只能等关键帧修复
+            on_register: 客户端登记（或地址变化）时调用，通常请求关键帧
+            send_buffer: 套接字发送缓冲区大小，关键帧会一次发出大量数据报
+        """
+        self.token = token
+        self.on_register = on_register
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, send_buffer)
+        except OSError:
+            pass
+        self.sock.bind((host, 0))
+        # 登记线程定期检查是否已关闭
+        self.sock.settimeout(0.5)
+        self.port = self.sock.getsockname()[1]
+        self.address: Optional[Tuple[str, int]] = None
+
+        self.datagrams_sent = 0
+        self.bytes_sent = 0
+        self._seq = 0
+        self._frame_seq = 0
+        # 数据报序号 % history -> (序号, 画面流编号, 分块位置列表)
+        self._history: List[Optional[Tuple[int, int, List[Tuple[int, int]]]]] = [None] * history
+        self._lock = threading.Lock()
+        self._running = True
+        self._thread = threading.Thread(target=self._register_loop, name='datagram-register', daemon=True)
+        self._thread.start()
+
+    def _register_loop(self) -> None:
+        """接收客户端的登记数据报"""
+        while self._running:
+            try:
+                data, address = self.sock.recvfrom(64)
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            if len(data) != REGISTER_DATAGRAM.size or REGISTER_DATAGRAM.unpack(data)[0] != self.token:
+                continue
+            if address != self.address:
+                logger.info(f"客户端登记数据报地址: {address[0]}:{address[1]}")
+                self.address = address
+                if self.on_register:
+                    self.on_register()
+
+    def send(self, frame: Dict[str, Any]) -> int:
+        """
+        发送 encode_datagrams() 打包的一帧；客户端尚未登记时丢弃（登记后会请求关键帧）
+
+        Returns:
+            发送的字节数
+        """
+        address = self.address
+        if address is None:
+            return 0
+        packets = frame['packets']
+        size = 0
+        with self._lock:
+            self._frame_seq = (self._frame_seq + 1) & 0xFFFFFFFF
+            for index, (positions, body) in enumerate(packets):
+                self._seq = (self._seq + 1) & 0xFFFFFFFF
+                flags = DATAGRAM_KEY if frame['key'] else 0
+                if index == len(packets) - 1:
+                    flags |= DATAGRAM_LAST
+                datagram = pack_datagram(self.token, self._seq, self._frame_seq, frame, flags, len(positions), body)
+                self._history[self._seq % len(self._history)] = (self._seq, frame['stream'], positions)
+                try:
+                    self.sock.sendto(datagram, address)
+                except OSError as e:
+                    # 发送缓冲区满等情况按丢失处理，由客户端的丢失报告修复
+                    logger.debug(f"发送数据报失败: {e}")
+                    continue
+                size += len(datagram)
+            self.datagrams_sent += len(packets)
+            self.bytes_sent += size
+        return size
+
+    def lost(self, seqs: Iterable[int]) -> Tuple[Dict[int, List[Tuple[int, int]]], int]:
+        """
+        查找丢失的数据报包含的分块
+
+        Returns:
+            (画面流编号 -> 分块位置列表, 已不在历史中的数据报数)
+        """
+        positions: Dict[int, List[Tuple[int, int]]] = {}
+        expired = 0
+        with self._lock:
+            for seq in seqs:
+                entry = self._history[int(seq) % len(self._history)]
+                if entry is None or entry[0] != seq:
+                    expired += 1
+                    continue
+                positions.setdefault(entry[1], []).extend(entry[2])
+        return positions, expired
+
+    def close(self) -> None:
+        self._running = False
+        try:
+            self.sock.close()
+        except OSError:
+            pass
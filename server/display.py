@@ -0,0 +1,82 @@
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+
+class DisplayGeometry:
+    """显示器几何信息缓存：只查询一次，捕获到的画面尺寸变化时才重新查询"""
+
+    def __init__(self, query: Callable[[], Tuple[int, int]], probe_interval: float = 1.0):
+        """
+        Args:
+            query: 查询当前屏幕分辨率的函数（例如 pyautogui.size）
+            probe_interval: 只捕获区域时，每隔多少秒需要捕获一次完整画面以检测显示器变化
+        """
+        self._query = query
+        self.probe_interval = probe_interval
+        self._resolution: Optional[Tuple[int, int]] = None
+        self._frame_shape: Optional[Tuple[int, int]] = None
+        self._observed_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def resolution(self) -> Tuple[int, int]:
+        """缓存的屏幕分辨率 (宽, 高)"""
+        resolution = self._resolution
+        if resolution is None:
+            resolution = self.refresh()
+        return resolution
+
+    @property
+    def frame_size(self) -> Optional[Tuple[int, int]]:
+        """最近一次完整捕获的画面尺寸 (宽, 高)，高 DPI 下可能与屏幕分辨率不同"""
+        if self._frame_shape is None:
+            return None
+        return self._frame_shape[1], self._frame_shape[0]
+
+    def to_frame_region(self, region: Tuple[int, int, int, int]) -> Optional[Tuple[int, int, int, int]]:
+        """
+        将屏幕坐标下的区域 (x, y, 宽, 高) 换算为画面像素坐标，并裁剪到画面范围内
+
+        Returns:
+            换算后的区域；尚未捕获过完整画面时返回 None
+        """
+        frame_size = self.frame_size
+        if frame_size is None:
+            return None
+        screen_width, screen_height = self.resolution
+        sx = frame_size[0] / screen_width
+        sy = frame_size[1] / screen_height
+        x = min(max(0, int(region[0] * sx)), frame_size[0] - 1)
+        y = min(max(0, int(region[1] * sy)), frame_size[1] - 1)
+        width = max(1, min(int(region[2] * sx), frame_size[0] - x))
+        height = max(1, min(int(region[3] * sy), frame_size[1] - y))
+        return x, y, width, height
+
+    def probe_due(self) -> bool:
+        """距上一次完整捕获是否已超过 probe_interval（区域捕获看不到完整画面的尺寸）"""
+        return time.monotonic() - self._observed_at >= self.probe_interval
+
+    def refresh(self) -> Tuple[int, int]:
+        """重新查询屏幕分辨率"""
+        with self._lock:
+            width, height = self._query()
+            self._resolution = (int(width), int(height))
+            return self._resolution
+
+    def observe_frame(self, shape: Tuple[int, ...]) -> bool:
+        """
+        根据捕获到的画面尺寸检测显示器变化
+
+        Returns:
+            画面尺寸与上一次不同时返回 True（此时已刷新分辨率）
+        """
+        self._observed_at = time.monotonic()
+        frame_shape = (shape[0], shape[1])
+        if frame_shape == self._frame_shape:
+            return False
+        changed = self._frame_shape is not None
+        self._frame_shape = frame_shape
+        if changed or self._resolution is None:
+            self.refresh()
+        return changed
@@ -0,0 +1,114 @@
+import threading
+import time
+import zlib
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+
+def sampled_checksum(image: np.ndarray, step: int = 4, phase: int = 0) -> int:
+    """
+    抽样校验和：从第 phase 行开始每隔 step 行取一整行计算 CRC32
+
+    整行在内存中是连续的，抽样读取的数据量约为整帧的 1/step；
+    文字、光标等变化通常跨越多行，一次抽样即可发现。
+    """
+    rows = image[phase::step]
+    if not rows.flags.c_contiguous:
+        rows = np.ascontiguousarray(rows)
+    return zlib.crc32(rows)
+
+
+class IdleScheduler:
+    """
+    画面静止检测与捕获调度
+
+    每次捕获后用抽样校验和判断画面是否变化，没有变化的帧不进入差异计算和编码。
+    画面静止超过 idle_after 秒后，每次捕获的间隔在基础间隔上加倍，直到 max_interval（心跳间隔）；
+    检测到变化或调用 wake()（收到输入、需要重新发送分块等）后立即恢复到基础间隔。
+
+    全速捕获时每帧只检查一组抽样行（轮换 step 组，step 帧内覆盖所有行），
+    放慢捕获后每帧检查所有行，不会漏掉只涉及个别行的变化。
+    """
+
+    def __init__(self, max_interval: float = 1.0, idle_after: float = 0.5, step: int = 4):
+        """
+        Args:
+            max_interval: 画面静止时捕获间隔的上限（秒）
+            idle_after: 画面静止多久（秒）后开始放慢捕获
+            step: 抽样的行间隔
+        """
+        self.max_interval = max_interval
+        self.idle_after = idle_after
+        self.step = max(1, step)
+        self.unchanged = 0  # 没有变化的帧数
+        self._backoff = 0  # 当前间隔相对基础间隔的加倍次数
+        self._last_active = time.monotonic()
+        self._checksums: Dict[int, int] = {}
+        self._shape: Optional[Tuple[int, ...]] = None
+        self._phase = 0
+        self._force = False
+        self._wakeup = threading.Event()
+
+    @property
+    def idle(self) -> bool:
+        """是否已放慢捕获"""
+        return self._backoff > 0
+
+    def wake(self, force: bool = False) -> None:
+        """
+        立即恢复全速捕获
+
+        Args:
+            force: 下一帧无论画面是否变化都进入编码，例如需要发送关键帧或重新发送丢失的分块
+        """
+        if force:
+            self._force = True
+        idle = self._backoff > 0
+        self._backoff = 0
+        self._last_active = time.monotonic()
+        # 全速捕获时按原有节奏进行，只提前结束放慢后的较长等待
+        if idle:
+            self._wakeup.set()
+
+    def interrupt(self) -> None:
+        """立即结束当前的等待，例如停止捕获"""
+        self._wakeup.set()
+
+    def changed(self, image: np.ndarray) -> bool:
+        """记录捕获到的一帧，返回它是否需要编码"""
+        force, self._force = self._force, False
+        if image.shape != self._shape:
+            self._shape = image.shape
+            self._checksums.clear()
+        if self._backoff:
+            phases = range(self.step)
+        else:
+            phases = (self._phase,)
+            self._phase = (self._phase + 1) % self.step
+        changed = False
+        for phase in phases:
+            checksum = sampled_checksum(image, self.step, phase)
+            if self._checksums.get(phase) != checksum:
+                self._checksums[phase] = checksum
+                changed = True
+        now = time.monotonic()
+        if changed:
+            self._backoff = 0
+            self._last_active = now
+        else:
+            self.unchanged += 1
+            if now - self._last_active >= self.idle_after:
+                # 加倍次数足以达到任何心跳间隔，不再增加
+                self._backoff = min(self._backoff + 1, 32)
+        return changed or force
+
+    def interval(self, base: float) -> float:
+        """下一次捕获的间隔（秒）"""
+        if not self._backoff:
+            return base
+        return min(max(base, self.max_interval), base * 2 ** self._backoff)
+
+    def wait(self, timeout: float) -> None:
+        """等待到下一次捕获，放慢捕获时的 wake() 或 interrupt() 会提前返回"""
+        self._wakeup.wait(timeout)
+        self._wakeup.clear()
@@ -0,0 +1,100 @@
+import logging
+import threading
+import time
+from typing import Any, Dict, Optional
+from .utils import capture_screen
+from common.shm import SharedFrameRing
+from common.metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class SharedMemoryPublisher:
+    """
+    本机共享内存发布：独立的捕获线程把整个屏幕的原始帧写入共享内存帧环，
+    同一台机器上的进程用 common.shm.SharedFrameReader 按名称读取，不经过编码和 socket
+
+    每帧只捕获一次，读取端的数量不影响捕获开销；没有读取端轮询超过 idle_timeout 秒时暂停捕获。
+    """
+
+    def __init__(self, name: str, interval: float = 0.1, slots: int = 4, idle_timeout: float = 2.0,
+                 metrics: Optional[MetricsRegistry] = None):
+        """
+        Args:
+            name: 共享内存名称
+            interval: 捕获间隔（秒）
+            slots: 帧环的槽位数
+            idle_timeout: 读取端停止轮询多久（秒）后暂停捕获
+        """
+        self.name = name
+        self.interval = interval
+        self.slots = slots
+        self.idle_timeout = idle_timeout
+        self.ring: Optional[SharedFrameRing] = None
+        self.frames_published = 0
+        self.paused = False
+        self.error: Optional[BaseException] = None
+        self.metrics = metrics or MetricsRegistry()
+        self.publish_time = self.metrics.histogram('shm_publish')
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> 'SharedMemoryPublisher':
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='shm-publisher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=2.0)
+            self._thread = None
+        if self.ring:
+            self.ring.close()
+            self.ring = None
+
+    def _idle(self) -> bool:
+        """帧环已创建且没有读取端在轮询"""
+        return self.ring is not None and time.time() - self.ring.last_read() > self.idle_timeout
+
+    def _run(self) -> None:
+        next_time = time.perf_counter()
+        while not self._stop.is_set():
+            if self._idle():
+                if not self.paused:
+                    self.paused = True
+                    logger.info(f"共享内存帧环 {self.name} 没有读取端，暂停捕获")
+                self._stop.wait(0.05)
+                next_time = time.perf_counter()
+                continue
+            if self.paused:
+                self.paused = False
+                logger.info(f"共享内存帧环 {self.name} 有读取端，恢复捕获")
+            try:
+                # 与 TCP 画面流（可能只捕获客户端查看的区域）使用不同的捕获缓冲区
+                self._publish(capture_screen(stream='shm'))
+            except Exception as e:
+                self.error = e
+                logger.error(f"共享内存发布出错: {e}")
+                self._stop.wait(1.0)
+            next_time += self.interval
+            delay = next_time - time.perf_counter()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                # 落后时不追赶，从当前时间重新计时
+                next_time = time.perf_counter()
+
+    def _publish(self, frame_data: Dict[str, Any]) -> None:
+        image = frame_data['image']
+        if self.ring is None or not self.ring.fits(image):
+            # 画面变大时按新尺寸重新创建，读取端看到旧帧环的关闭标志后重新映射
+            if self.ring:
+                self.ring.close()
+            self.ring = SharedFrameRing(self.name, image.nbytes, self.slots)
+            logger.info(f"共享内存帧环 {self.name}: {image.shape[1]}x{image.shape[0]}，{self.slots} 个槽位")
+        start = time.perf_counter()
+        self.ring.publish(frame_data)
+        self.publish_time.record(time.perf_counter() - start)
+        self.frames_published += 1
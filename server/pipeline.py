@@ -0,0 +1,282 @@
+import collections
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from common.tiles import TileDiffer, FRAME_KEY, FRAME_DELTA
+from common.metrics import MetricsRegistry
+from .idle import IdleScheduler
+
+
+class DropOldestQueue:
+    """有界队列：队列满时丢弃最旧的元素而不是阻塞生产者"""
+
+    def __init__(self, maxsize: int = 2, on_drop: Optional[Callable[[Any], None]] = None):
+        self.maxsize = maxsize
+        self.on_drop = on_drop
+        self.dropped = 0
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+        self._closed = False
+
+    def put(self, item: Any) -> None:
+        dropped = None
+        with self._cond:
+            if len(self._items) >= self.maxsize:
+                dropped = self._items.popleft()
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+        if dropped is not None and self.on_drop:
+            self.on_drop(dropped)
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Any]:
+        """取出最旧的元素；超时或队列已关闭时返回 None"""
+        with self._cond:
+            if not self._items and not self._closed:
+                self._cond.wait(timeout)
+            if not self._items:
+                return None
+            return self._items.popleft()
+
+    def close(self) -> None:
+        """唤醒所有等待的消费者"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class FramePipeline:
+    """
+    屏幕帧流水线：捕获线程 -> 编码线程池 -> 发送线程
+
+    各阶段之间通过 DropOldestQueue 连接，链路较慢时丢弃旧帧而不是积压延迟。
+    捕获的帧按捕获顺序编号，分块差异计算在编码阶段加锁严格按捕获顺序执行（比已计算的帧更早捕获的帧直接丢弃），
+    编码本身并行（zlib 和 cv2 会释放 GIL），编码完成的帧按序号依次进入发送队列。发送队列丢弃的增量帧会让对应分块在下一帧重新发送，
+    发送成功的帧记入分块差异编码器的已发送记录，客户端断线重连时据此补发。
+    设置了 scheduler 时，画面没有变化的帧在捕获线程中直接丢弃（到了关键帧间隔的帧除外），画面静止时逐步放慢捕获。
+    """
+
+    def __init__(self, capture: Callable[[], Dict[str, Any]],
+                 encode: Callable[[Dict[str, Any]], bytes],
+                 send: Callable[[bytes], None],
+                 differ: Optional[TileDiffer] = None,
+                 interval: float = 0.1,
+                 workers: int = 2,
+                 queue_size: int = 2,
+                 metrics: Optional[MetricsRegistry] = None,
+                 name: str = '',
+                 scheduler: Optional[IdleScheduler] = None):
+        """
+        Args:
+            capture: 捕获一帧，返回包含 'image' 的帧数据
+            encode: 将帧数据编码为帧消息
+            send: 发送一条帧消息
+            differ: 分块差异编码器，为 None 时总是发送完整帧
+            interval: 捕获间隔（秒）
+            workers: 编码线程数
+            queue_size: 各阶段队列容量
+            metrics: 记录各阶段耗时直方图和丢帧数的统计注册表，为 None 时单独创建
+            name: 画面流名称，多条流水线共用一个统计注册表时用于区分丢帧计数和线程名
+            scheduler: 画面静止检测与捕获调度，为 None 时按固定间隔捕获并编码每一帧
+        """
+        self.capture = capture
+        self.encode = encode
+        self.send = send
+        self.differ = differ
+        self.interval = interval
+        self.workers = max(1, workers)
+        self.name = name
+        self.scheduler = scheduler
+
+        self.raw_queue = DropOldestQueue(queue_size)
+        self.send_queue = DropOldestQueue(queue_size, on_drop=self._on_send_drop)
+        self.metrics = metrics or MetricsRegistry()
+        self.stage_stats = {name: self.metrics.histogram(name) for name in ('capture', 'encode', 'send')}
+        suffix = f'.{name}' if name else ''
+        self.metrics.gauge(f'dropped_raw{suffix}', lambda: self.raw_queue.dropped)
+        self.metrics.gauge(f'dropped_send{suffix}', lambda: self.send_queue.dropped)
+        self.metrics.gauge(f'dropped_stale{suffix}', lambda: self.stale)
+        if scheduler:
+            self.metrics.gauge(f'capture_interval{suffix}', lambda: scheduler.interval(self.interval))
+            self.metrics.gauge(f'frames_unchanged{suffix}', lambda: scheduler.unchanged)
+        self.error: Optional[Exception] = None
+        self.stale = 0  # 编码线程取到时已有更新的帧计算过差异而丢弃的帧数
+
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._diff_lock = threading.Lock()
+        self._order = threading.Condition()
+        self._next_seq = 0
+        self._next_put = 0
+        self._captured = 0
+        self._last_diffed = -1
+
+    def start(self) -> None:
+        suffix = f'-{self.name}' if self.name else ''
+        self._threads = [threading.Thread(target=self._capture_loop, name=f'capture{suffix}')]
+        self._threads += [threading.Thread(target=self._encode_loop, name=f'encoder{suffix}-{i}')
+                          for i in range(self.workers)]
+        self._threads.append(threading.Thread(target=self._send_loop, name=f'sender{suffix}'))
+        for thread in self._threads:
+            thread.daemon = True
+            thread.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+        if self.scheduler:
+            self.scheduler.interrupt()
+        self.raw_queue.close()
+        self.send_queue.close()
+        with self._order:
+            self._order.notify_all()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=1.0)
+        # 没有发送出去的帧已经更新了参考帧，按丢弃处理，分块差异编码器可以继续用于恢复的会话
+        while True:
+            item = self.send_queue.get(timeout=0)
+            if item is None:
+                break
+            self._on_send_drop(item)
+
+    def is_alive(self) -> bool:
+        return not self._stop_event.is_set()
+
+    def stats(self) -> Dict[str, Any]:
+        """各阶段耗时及丢帧统计"""
+        stats: Dict[str, Any] = {name: s.snapshot() for name, s in self.stage_stats.items()}
+        stats['dropped'] = {'raw': self.raw_queue.dropped, 'send': self.send_queue.dropped, 'stale': self.stale}
+        if self.scheduler:
+            stats['unchanged'] = self.scheduler.unchanged
+            stats['interval'] = self.scheduler.interval(self.interval)
+        return stats
+
+    def wake(self, force: bool = False) -> None:
+        """恢复全速捕获，例如收到了输入；force 为 True 时下一帧无论画面是否变化都编码"""
+        if self.scheduler:
+            self.scheduler.wake(force)
+
+    def request_keyframe(self) -> None:
+        """让下一帧成为关键帧，例如客户端丢弃了积压的帧需要重新同步"""
+        if self.differ is None:
+            return
+        with self._diff_lock:
+            self.differ.reset()
+        self.wake(force=True)
+
+    def invalidate(self, positions: Iterable[Tuple[int, int]]) -> None:
+        """让这些位置的分块在下一帧重新发送，例如数据报传输中丢失的分块"""
+        if self.differ is None:
+            return
+        with self._diff_lock:
+            self.differ.invalidate(positions)
+        self.wake(force=True)
+
+    def _fail(self, error: Exception) -> None:
+        if self.error is None:
+            self.error = error
+        self._stop_event.set()
+        self.raw_queue.close()
+        self.send_queue.close()
+        with self._order:
+            self._order.notify_all()
+
+    def _capture_loop(self) -> None:
+        try:
+            while not self._stop_event.is_set():
+                start_time = time.perf_counter()
+                frame_data = self.capture()
+                elapsed = time.perf_counter() - start_time
+                self.stage_stats['capture'].record(elapsed)
+                captured = self._captured
+                self._captured += 1
+                if self.scheduler is None:
+                    self.raw_queue.put((captured, frame_data))
+                    if elapsed < self.interval:
+                        self._stop_event.wait(self.interval - elapsed)
+                    continue
+                # 画面静止时仍按关键帧间隔放行一帧：数据报传输中最后一帧丢失的分块没有后续的帧暴露，只能靠关键帧恢复
+                changed = self.scheduler.changed(frame_data['image'])
+                if changed or (self.differ is not None and self.differ.keyframe_due()):
+                    self.raw_queue.put((captured, frame_data))
+                interval = self.scheduler.interval(self.interval)
+                if elapsed < interval:
+                    self.scheduler.wait(interval - elapsed)
+        except Exception as e:
+            self._fail(e)
+
+    def _encode_loop(self) -> None:
+        while not self._stop_event.is_set():
+            entry = self.raw_queue.get(timeout=0.5)
+            if entry is None:
+                continue
+            captured, frame_data = entry
+            start_time = time.perf_counter()
+            item = None
+            with self._diff_lock:
+                # 另一个编码线程已经用更新的帧更新了参考帧，旧帧会把参考帧和客户端画面退回旧内容
+                if captured <= self._last_diffed:
+                    self.stale += 1
+                    continue
+                self._last_diffed = captured
+                seq = self._next_seq
+                self._next_seq += 1
+                if self.differ is not None:
+                    frame_data.update(self.differ.encode(frame_data.pop('image')))
+            try:
+                # 画面无变化时不发送
+                if frame_data.get('type') != FRAME_DELTA or frame_data['tiles'] or frame_data.get('copies'):
+                    item = (frame_data, self.encode(frame_data))
+                    self.stage_stats['encode'].record(time.perf_counter() - start_time)
+            except Exception as e:
+                self._on_send_drop((frame_data, None))
+                self._fail(e)
+            finally:
+                self._put_in_order(seq, item)
+
+    def _put_in_order(self, seq: int, item: Optional[Any]) -> None:
+        """按序号顺序放入发送队列，保证增量帧不会乱序到达客户端"""
+        with self._order:
+            while self._next_put != seq and not self._stop_event.is_set():
+                self._order.wait(0.5)
+            if item is not None:
+                self.send_queue.put(item)
+            self._next_put = seq + 1
+            self._order.notify_all()
+
+    def _on_send_drop(self, item: Any) -> None:
+        """发送队列丢弃帧后，让客户端缺失的内容在下一帧重新发送"""
+        frame_data, _ = item
+        if self.differ is None:
+            return
+        with self._diff_lock:
+            if frame_data.get('type', FRAME_KEY) == FRAME_KEY:
+                self.differ.reset()
+            else:
+                self.differ.invalidate((x, y) for x, y, _ in frame_data['tiles'])
+                # 复制矩形未送达时，客户端整个目标区域都与参考帧不同
+                for rect in frame_data.get('copies', ()):
+                    self.differ.invalidate_rect(*rect[2:])
+        self.wake(force=True)
+
+    def _send_loop(self) -> None:
+        try:
+            while not self._stop_event.is_set():
+                item = self.send_queue.get(timeout=0.5)
+                if item is None:
+                    continue
+                start_time = time.perf_counter()
+                try:
+                    self.send(item[1])
+                except Exception:
+                    self._on_send_drop(item)
+                    raise
+                self.stage_stats['send'].record(time.perf_counter() - start_time)
+                if self.differ is not None:
+                    with self._diff_lock:
+                        self.differ.sent(item[0])
+        except Exception as e:
+            self._fail(e)
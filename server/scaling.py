@@ -0,0 +1,35 @@
+import numpy as np
+from typing import Optional, Tuple
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+
+def scaled_size(width: int, height: int, scale: float) -> Tuple[int, int]:
+    """按比例缩放后的尺寸 (宽, 高)"""
+    return max(1, int(round(width * scale))), max(1, int(round(height * scale)))
+
+
+def fit_scale(width: int, height: int, viewport: Optional[Tuple[int, int]]) -> float:
+    """保持宽高比缩小到视口内所需的比例（不放大）"""
+    if not viewport:
+        return 1.0
+    return min(1.0, viewport[0] / width, viewport[1] / height)
+
+
+def resize_frame(frame: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    """
+    将画面缩放到 size (宽, 高)
+
+    安装了 opencv 时使用 INTER_AREA（缩小时质量最好），否则使用向量化的最近邻采样
+    """
+    width, height = size
+    if frame.shape[1] == width and frame.shape[0] == height:
+        return frame
+    if cv2 is not None:
+        return cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+    rows = np.arange(height) * frame.shape[0] // height
+    cols = np.arange(width) * frame.shape[1] // width
+    return frame[rows[:, None], cols]
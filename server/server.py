@@ -1,21 +1,154 @@
+import json
+import os
+import secrets
 import socket
-import zlib
-import pickle
 import signal
 import sys
 import threading
 import logging
 import time
 import keyboard
-from typing import Optional, Tuple
-from .utils import capture_screen, handle_input
+from typing import Any, Dict, List, Optional, Tuple
+from .utils import (capture_screen, capture_monitor, list_monitors, handle_inputs, get_screen_resolution,
+                    set_capture_backend, INPUT_LOG_FILE)
+from .capture import create_capture_backend
+from .bitrate import BitrateController
+from .scaling import fit_scale, resize_frame, scaled_size
+from .pipeline import FramePipeline
+from .idle import IdleScheduler
+from .cursor import CursorTracker
+from .datagram import DatagramSender
+from .local import SharedMemoryPublisher
+from common.tiles import TileDiffer
+from common.codecs import Codec, create_codec, negotiate_codec
+from common.frames import encode_frame
+from common.cursor import encode_cursor
+from common.datagram import encode_datagrams
+from common.recording import SessionRecorder
+from common.metrics import MetricsRegistry, MetricsServer
+from common.logs import setup_logging, add_log_file
+from common.protocol import (MSG_FRAME, MSG_INPUT, MSG_CONTROL, MSG_CURSOR, MessageDecoder, send_json, recv_json,
+                             send_message, decode_control, decode_inputs, enable_keepalive)
+
+class ClientState:
+    """单个客户端连接的状态，在握手和控制消息中更新"""
+
+    def __init__(self, screen: Optional[Tuple[int, int]] = None):
+        # 客户端屏幕分辨率，用于换算鼠标坐标
+        self.screen = screen
+        # 客户端显示画面的视口大小，服务器按此缩小画面
+        self.viewport: Optional[Tuple[int, int]] = None
+        # 客户端放大查看的区域 (x, y, 宽, 高)，服务器坐标；为 None 时为整个屏幕
+        self.roi: Optional[Tuple[int, int, int, int]] = None
+        # 客户端丢弃了积压的帧，等待关键帧重新同步
+        self.keyframe_requested = False
+        # 订阅的显示器：编号 -> 捕获间隔（秒，None 为服务器默认间隔）；为 None 时只发送整个屏幕
+        self.monitors: Optional[Dict[int, Optional[float]]] = None
+        # 输入事件映射到的显示器，为 None 时使用第一个订阅的显示器
+        self.input_monitor: Optional[int] = None
+        # 订阅的显示器发生变化，需要重新创建画面流
+        self.streams_changed = False
+        # 客户端自行绘制远程指针，需要发送指针消息
+        self.cursor = False
+
+    def update(self, message: dict):
+        """应用客户端发来的几何信息变更"""
+        if 'screen' in message:
+            width, height = message['screen']
+            self.screen = (int(width), int(height))
+        if 'viewport' in message:
+            viewport = message['viewport']
+            self.viewport = (int(viewport[0]), int(viewport[1])) if viewport else None
+        if 'roi' in message:
+            roi = message['roi']
+            self.roi = tuple(int(value) for value in roi) if roi else None
+        if message.get('keyframe'):
+            self.keyframe_requested = True
+        if 'monitors' in message:
+            self.monitors = parse_monitors(message['monitors'])
+            self.streams_changed = True
+        if 'cursor' in message:
+            self.cursor = bool(message['cursor'])
+        if 'input_monitor' in message:
+            monitor = message['input_monitor']
+            self.input_monitor = int(monitor) if monitor is not None else None
+
+class Session:
+    """
+    客户端会话：连接断开后在 resume_timeout 秒内保留各画面流的分块差异编码器（参考帧和已发送帧记录），
+    客户端带着会话令牌重连时从它最后合并的帧继续，只接收断线期间发生变化的分块
+    """
+
+    def __init__(self):
+        self.token = secrets.token_hex(16)
+        # 画面流编号 -> 分块差异编码器，连接断开时保存
+        self.differs: Dict[int, TileDiffer] = {}
+        # 断开后保留到的时间（time.monotonic()），连接期间为 0
+        self.expires = 0.0
+
+    def suspend(self, differs: Dict[int, TileDiffer], timeout: float):
+        """连接断开：保存画面流状态，timeout 秒内可以恢复"""
+        self.differs = differs
+        self.expires = time.monotonic() + timeout
+
+    def resumable(self, token: Any) -> bool:
+        """token 是这个会话的令牌且仍在保留期内"""
+        return bool(self.expires) and token == self.token and time.monotonic() < self.expires
+
+    def resume(self, frames: Dict[int, int]) -> Dict[int, Tuple[TileDiffer, bool]]:
+        """
+        按客户端报告的各画面流最后合并的帧序号恢复
+
+        Returns:
+            画面流编号 -> (分块差异编码器, 是否只需补发断线期间的分块)；客户端没有报告的画面流重新开始
+        """
+        return {stream: (differ, differ.resume(frames[stream]))
+                for stream, differ in self.differs.items() if stream in frames}
+
+def parse_monitors(subscription: Optional[List[Any]]) -> Optional[Dict[int, Optional[float]]]:
+    """
+    解析客户端订阅的显示器列表
+
+    Args:
+        subscription: 显示器编号，或 {'id': 编号, 'interval': 捕获间隔（秒）} 的列表；为空时表示整个屏幕
+    """
+    if not subscription:
+        return None
+    monitors: Dict[int, Optional[float]] = {}
+    for item in subscription:
+        if isinstance(item, dict):
+            interval = item.get('interval')
+            monitors[int(item['id'])] = float(interval) if interval else None
+        else:
+            monitors[int(item)] = None
+    return monitors
 
 class RemoteDesktopServer:
     def __init__(self, host: str = '0.0.0.0', port: int = 9999, 
                  screen_capture_interval: float = 0.1,
+                 idle_interval: float = 1.0,
                  buffer_size: int = 1024,
                  max_connections: int = 1,
-                 compression_level: int = 6):
+                 compression_level: int = 6,
+                 delta_encoding: bool = True,
+                 tile_size: int = 64,
+                 motion_detection: bool = True,
+                 cursor_interval: float = 1 / 60,
+                 udp: bool = False,
+                 shared_memory: Optional[str] = None,
+                 resume_timeout: float = 30.0,
+                 keyframe_interval: float = 5.0,
+                 quality: int = 75,
+                 encoder_workers: int = 2,
+                 queue_size: int = 2,
+                 exit_key: Optional[str] = 'q',
+                 capture_backend: str = 'auto',
+                 adaptive_bitrate: bool = True,
+                 target_latency: float = 0.15,
+                 record_dir: Optional[str] = None,
+                 metrics_port: Optional[int] = None,
+                 metrics_file: Optional[str] = None,
+                 debug: bool = False):
         """
         初始化远程桌面服务器
         
@@ -23,35 +156,117 @@ class RemoteDesktopServer:
             host: 服务器监听地址
             port: 服务器监听端口
             screen_capture_interval: 屏幕捕获间隔（秒）
+            idle_interval: 画面静止时捕获间隔逐步放慢到的上限（秒），收到输入或画面变化时立即恢复；
+                没有变化的帧不编码也不发送。为 0 时按固定间隔捕获和编码
             buffer_size: 接收缓冲区大小
             max_connections: 最大连接数
-            compression_level: 压缩级别（0-9）
+            compression_level: 无损编解码器的压缩级别（0-9）
+            delta_encoding: 是否只发送发生变化的分块
+            tile_size: 分块边长（像素）
+            motion_detection: 是否检测滚动和窗口拖动，平移的内容只发送复制指令和新露出的部分
+            cursor_interval: 指针位置的轮询间隔（秒），指针作为单独的消息发送；为 0 时不发送
+            udp: 是否允许客户端通过 UDP 数据报接收帧分块：丢失的分块不重传，在下一帧发送最新内容；
+                输入和控制消息仍通过 TCP 连接。数据报模式下不检测滚动（复制指令依赖按序到达），也不录制帧
+            shared_memory: 本机共享内存帧环的名称，为 None 时不启用；启用后独立于客户端连接，
+                把整个屏幕的原始帧写入该共享内存，本机进程用 common.shm.SharedFrameReader 读取
+            resume_timeout: 客户端断线后保留会话（各画面流的参考帧和已发送帧记录）的时长（秒），
+                期间带着会话令牌重连的客户端只接收它断线后没有收到的内容，而不是完整画面；为 0 时不保留
+            keyframe_interval: 关键帧间隔（秒）
+            quality: 有损编解码器的初始图像质量（1-100），客户端可在运行时调整
+            encoder_workers: 编码线程数
+            queue_size: 流水线各阶段队列容量，满时丢弃最旧的帧
+            exit_key: 退出热键，为 None 时不监听键盘（例如无桌面环境下运行）
+            capture_backend: 屏幕捕获后端：'auto'、'mss'、'imagegrab' 或 'fake'
+            adaptive_bitrate: 是否根据客户端反馈自动调整图像质量、缩放比例和帧率
+            target_latency: 自适应码率的目标延迟（秒）
+            record_dir: 会话录制目录，为 None 时不录制；每个连接写入一个会话文件（发送的帧和收到的输入）
+            metrics_port: 本地 HTTP 统计端点端口（仅监听 127.0.0.1），为 None 时不启动
+            metrics_file: 停止时把统计信息写入的 JSON 文件，为 None 时不写入
+            debug: 是否输出调试日志（包括逐个输入事件的跟踪）
         """
         self.host = host
         self.port = port
         self.screen_capture_interval = screen_capture_interval
+        self.idle_interval = idle_interval
         self.buffer_size = buffer_size
         self.max_connections = max_connections
         self.compression_level = compression_level
+        self.delta_encoding = delta_encoding
+        self.tile_size = tile_size
+        self.motion_detection = motion_detection
+        self.cursor_interval = cursor_interval
+        self.udp = udp
+        self.shared_memory = shared_memory
+        self.resume_timeout = resume_timeout
+        self.keyframe_interval = keyframe_interval
+        self.quality = quality
+        self.codec: Optional[Codec] = None
+        self.encoder_workers = encoder_workers
+        self.queue_size = queue_size
+        self.exit_key = exit_key
+        
+        # 捕获缓冲区数量需覆盖流水线中所有在途的帧：队列中的、编码中的以及正在捕获的；
+        # 共享内存发布线程也从整个屏幕的缓冲区中轮换取用，缓冲区数量加倍
+        buffers = queue_size + encoder_workers + 2
+        set_capture_backend(create_capture_backend(capture_backend, buffers=buffers * 2 if shared_memory else buffers))
+        
+        # 自适应码率，每个连接重新创建
+        self.adaptive_bitrate = adaptive_bitrate
+        self.target_latency = target_latency
+        self.bitrate: Optional[BitrateController] = None
+        
+        # 会话录制
+        self.record_dir = record_dir
+        self.recorder: Optional[SessionRecorder] = None
         
         # 状态标志
         self.running = False
         self.connected = False
         self.exit_event = threading.Event()
+        # 当前连接已断开（输入线程发现客户端断开），屏幕线程据此立即结束，尽快接受重连
+        self.disconnected = threading.Event()
         
         # 资源
         self.server_socket: Optional[socket.socket] = None
         self.client_socket: Optional[socket.socket] = None
         self.screen_thread: Optional[threading.Thread] = None
         self.input_thread: Optional[threading.Thread] = None
+        self.cursor_thread: Optional[threading.Thread] = None
+        # 当前连接的数据报发送端，客户端没有请求数据报传输时为 None
+        self.datagrams: Optional[DatagramSender] = None
+        self.publisher: Optional[SharedMemoryPublisher] = None
+        self.client_state = ClientState()
+        # 当前（或断线后保留中的）会话，resume_timeout 为 0 时为 None
+        self.session: Optional[Session] = None
+        # 恢复会话时沿用的分块差异编码器，启动对应的画面流时取用
+        self._resumed: Dict[int, TileDiffer] = {}
+        # 显示器编号 -> 显示器信息，握手时枚举
+        self.monitors: Dict[int, Dict[str, Any]] = {}
+        # 画面流编号（0 为整个屏幕，其它为显示器编号）-> 流水线及其基础捕获间隔
+        self.pipelines: Dict[int, FramePipeline] = {}
+        # 屏幕线程启动、停止画面流时修改 pipelines，其它线程通过 _pipelines() 取快照
+        self.pipelines_lock = threading.Lock()
+        self.stream_intervals: Dict[int, float] = {}
+        # 多个画面流的发送线程共用一个连接，消息须整条写入
+        self.send_lock = threading.Lock()
         
         # 统计信息
         self.start_time: Optional[float] = None
         self.frames_sent = 0
         self.bytes_sent = 0
+        self.recent_frame_bytes = 0.0
         self.last_stats_time = 0
+        self.metrics = MetricsRegistry()
+        self.frame_rate = self.metrics.rate('frames_sent')
+        self.frame_bytes = self.metrics.size_histogram('frame_bytes')
+        self.input_rate = self.metrics.rate('input_events')
+        self.input_apply = self.metrics.histogram('input_apply')
+        self.metrics_port = metrics_port
+        self.metrics_file = metrics_file
+        self.metrics_server: Optional[MetricsServer] = None
         
         # 设置日志
+        self.debug = debug
         self._setup_logging()
         
         # 设置信号处理
@@ -59,15 +274,9 @@ class RemoteDesktopServer:
         signal.signal(signal.SIGTERM, self.signal_handler)
         
     def _setup_logging(self):
-        """配置日志记录"""
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.StreamHandler(),
-                logging.FileHandler('remote_desktop_server.log')
-            ]
-        )
+        """配置日志记录：控制台和文件写入在后台线程完成，不阻塞捕获和输入线程"""
+        setup_logging('remote_desktop_server.log', debug=self.debug)
+        add_log_file(INPUT_LOG_FILE, 'server.utils')
         self.logger = logging.getLogger(__name__)
 
     def signal_handler(self, signum: int, frame):
@@ -87,6 +296,8 @@ class RemoteDesktopServer:
             self.screen_thread.join(timeout=1.0)
         if self.input_thread and self.input_thread.is_alive():
             self.input_thread.join(timeout=1.0)
+        if self.cursor_thread and self.cursor_thread.is_alive():
+            self.cursor_thread.join(timeout=1.0)
             
         # 关闭socket
         if self.client_socket:
@@ -103,6 +314,20 @@ class RemoteDesktopServer:
                 self.logger.error(f"关闭服务器socket时出错: {e}")
             self.server_socket = None
             
+        self._close_recorder()
+        
+        if self.publisher:
+            self.publisher.stop()
+            self.publisher = None
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        if self.metrics_file:
+            try:
+                self.metrics.dump(self.metrics_file)
+            except OSError as e:
+                self.logger.error(f"写入统计文件失败: {e}")
+            
         # 打印统计信息
         if self.start_time:
             duration = time.time() - self.start_time
@@ -116,61 +341,381 @@ class RemoteDesktopServer:
         self.logger.info("服务器已停止")
 
     def handle_screen_capture(self):
-        """处理屏幕捕获和发送"""
+        """处理屏幕捕获和发送：每个画面流的捕获、编码、发送分别在独立线程中流水线执行"""
+        self._sync_streams()
+        
+        while (self.running and self.connected and not self.exit_event.is_set()
+               and all(pipeline.is_alive() for pipeline in self.pipelines.values())):
+            self.disconnected.wait(0.5)
+            if self.client_state.streams_changed:
+                self._sync_streams()
+            
+            # 定期打印统计信息
+            current_time = time.time()
+            if current_time - self.last_stats_time >= 5.0:  # 每5秒打印一次
+                self._print_stats()
+                self.last_stats_time = current_time
+        
+        with self.pipelines_lock:
+            pipelines, self.pipelines = self.pipelines, {}
+        error = next((pipeline.error for pipeline in pipelines.values() if pipeline.error), None)
+        if error and not self.exit_event.is_set():
+            self.logger.error(f"屏幕捕获/发送错误: {error}")
+        # 关闭连接，让输入线程和客户端都能及时退出，阻塞在发送上的线程也随之返回
+        self.connected = False
+        try:
+            self.client_socket.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        for pipeline in pipelines.values():
+            pipeline.stop()
+        if self.session and not self.exit_event.is_set():
+            # 流水线停止时没有发送出去的帧已记为失效分块，分块差异编码器与客户端实际收到的内容一致
+            self.session.suspend({stream: pipeline.differ for stream, pipeline in pipelines.items()
+                                  if pipeline.differ is not None}, self.resume_timeout)
+            self.logger.info(f"会话保留 {self.resume_timeout:.0f} 秒，客户端可以重连恢复")
+
+    def _requested_streams(self) -> Dict[int, float]:
+        """客户端订阅的画面流及其捕获间隔；没有订阅显示器（或订阅的显示器都不存在）时为整个屏幕"""
+        monitors = self.client_state.monitors or {}
+        streams = {monitor: interval or self.screen_capture_interval
+                   for monitor, interval in monitors.items() if monitor in self.monitors}
+        unknown = set(monitors) - set(streams)
+        if unknown:
+            self.logger.warning(f"客户端订阅了不存在的显示器: {sorted(unknown)}")
+        return streams or {0: self.screen_capture_interval}
+
+    def _stream_interval(self, interval: float) -> float:
+        """画面流的实际捕获间隔：基础间隔按自适应码率降低帧率的比例放大"""
+        if self.bitrate:
+            return interval * self.bitrate.interval / self.screen_capture_interval
+        return interval
+
+    def _sync_streams(self):
+        """按客户端订阅启动或停止画面流，每个画面流有独立的分块差异（参考帧）和捕获间隔"""
+        self.client_state.streams_changed = False
+        streams = self._requested_streams()
+        with self.pipelines_lock:
+            removed = [self.pipelines.pop(stream) for stream in list(self.pipelines) if stream not in streams]
+        for pipeline in removed:
+            pipeline.stop()
+        self.stream_intervals = streams
+        for stream, interval in streams.items():
+            if stream in self.pipelines:
+                self.pipelines[stream].interval = self._stream_interval(interval)
+                continue
+            # 每个画面流独立维护参考帧，新订阅的画面流总是先发送关键帧；恢复的会话沿用断线前的参考帧
+            differ = self._resumed.pop(stream, None)
+            if differ is None and self.delta_encoding:
+                differ = TileDiffer(self.tile_size, self.keyframe_interval,
+                                    self.motion_detection and self.datagrams is None)
+            pipeline = FramePipeline(
+                capture=lambda stream=stream: self._capture_frame(stream),
+                encode=self._encode_frame,
+                send=self._send_frame,
+                differ=differ,
+                interval=self._stream_interval(interval),
+                workers=self.encoder_workers,
+                queue_size=self.queue_size,
+                metrics=self.metrics,
+                name=f'monitor{stream}' if stream else '',
+                scheduler=IdleScheduler(self.idle_interval) if self.idle_interval else None
+            )
+            pipeline.start()
+            with self.pipelines_lock:
+                self.pipelines[stream] = pipeline
+        # 客户端不再订阅的画面流不必保留
+        self._resumed = {}
+        if self.client_state.monitors:
+            self.logger.info(f"发送显示器画面: {', '.join(f'{m}({1 / i:.0f} FPS)' for m, i in streams.items())}")
+
+    def _pipelines(self) -> Dict[int, FramePipeline]:
+        """画面流的快照，供屏幕线程以外的线程遍历"""
+        with self.pipelines_lock:
+            return dict(self.pipelines)
+
+    def _capture_frame(self, stream: int = 0):
+        """
+        捕获画面流 stream 的一帧：整个屏幕时只捕获客户端查看的区域，显示器时捕获该显示器；
+        并缩小到客户端视口大小（再乘以自适应码率的缩放比例）
+        """
+        state = self.client_state
+        if stream:
+            frame_data = capture_monitor(self.monitors[stream])
+        else:
+            frame_data = capture_screen(state.roi)
+        frame_data['stream'] = stream
+        image = frame_data['image']
+        height, width = image.shape[:2]
+        scale = fit_scale(width, height, state.viewport)
+        if self.bitrate:
+            scale *= self.bitrate.scale
+        if scale < 1.0:
+            frame_data['image'] = resize_frame(image, scaled_size(width, height, scale))
+        height, width = frame_data['image'].shape[:2]
+        frame_data['size'] = (width, height)
+        return frame_data
+
+    def frame_quality(self) -> int:
+        """当前编码质量：客户端设置的质量为上限，拥塞时由自适应码率进一步降低"""
+        if self.bitrate:
+            return min(self.quality, self.bitrate.quality)
+        return self.quality
+
+    def _encode_frame(self, frame_data: Dict[str, Any]) -> Any:
+        """编码一帧：帧消息，或数据报模式下打包好的分块数据报"""
+        if self.datagrams:
+            return encode_datagrams(frame_data, self.codec, self.frame_quality(), self.tile_size)
+        return encode_frame(frame_data, self.codec, self.frame_quality())
+
+    def _send_frame(self, img_data: Any):
+        """发送一条帧消息（数据报模式下发送一帧的数据报）"""
+        if self.datagrams:
+            size = self.datagrams.send(img_data)
+            if size:
+                self._count_frame(size)
+            return
+        with self.send_lock:
+            send_message(self.client_socket, MSG_FRAME, img_data)
+            if self.recorder:
+                self.recorder.record(MSG_FRAME, img_data)
+        self._count_frame(len(img_data))
+
+    def _count_frame(self, size: int):
+        """更新发送统计"""
+        self.frames_sent += 1
+        self.bytes_sent += size
+        self.recent_frame_bytes += 0.2 * (size - self.recent_frame_bytes)
+        self.frame_rate.add(size)
+        self.frame_bytes.record(size)
+        if self.bitrate:
+            self.bitrate.frame_sent()
+
+    def _stream_region(self, stream: int) -> Tuple[int, int, int, int]:
+        """画面流覆盖的屏幕区域 (x, y, 宽, 高)"""
+        if stream in self.monitors:
+            monitor = self.monitors[stream]
+            return monitor['x'], monitor['y'], monitor['width'], monitor['height']
+        width, height = get_screen_resolution()
+        return self.client_state.roi or (0, 0, width, height)
+
+    def handle_cursor(self):
+        """指针通道：位置或形状变化时发送轻量的指针消息，客户端在最后一帧上自行绘制，指针移动不会产生新帧"""
+        tracker = CursorTracker()
+        streams: List[int] = []
         while self.running and self.connected and not self.exit_event.is_set():
             try:
-                start_time = time.time()
-                
-                # 捕获屏幕
-                frame_data = capture_screen()
-                img_data = zlib.compress(pickle.dumps(frame_data), level=self.compression_level)
-                
-                # 发送数据
-                self.client_socket.sendall(len(img_data).to_bytes(4, 'big'))
-                self.client_socket.sendall(img_data)
-                
-                # 更新统计信息
-                self.frames_sent += 1
-                self.bytes_sent += len(img_data)
-                
-                # 控制帧率
-                elapsed = time.time() - start_time
-                if elapsed < self.screen_capture_interval:
-                    time.sleep(self.screen_capture_interval - elapsed)
-                    
-                # 定期打印统计信息
-                current_time = time.time()
-                if current_time - self.last_stats_time >= 5.0:  # 每5秒打印一次
-                    self._print_stats()
-                    self.last_stats_time = current_time
-                    
+                current = list(self._pipelines())
+                if current != streams:
+                    # 新的画面流（窗口）需要完整的位置和形状
+                    streams = current
+                    tracker.reset()
+                update = tracker.poll()
+                if update:
+                    position, shape, shape_changed = update
+                    for stream in streams:
+                        x, y, width, height = self._stream_region(stream)
+                        payload = encode_cursor(stream, (position[0] - x, position[1] - y), (width, height),
+                                                shape.shape_id, shape.hotspot, shape.image if shape_changed else None)
+                        with self.send_lock:
+                            send_message(self.client_socket, MSG_CURSOR, payload)
+                            if self.recorder:
+                                self.recorder.record(MSG_CURSOR, payload)
             except Exception as e:
-                if not self.exit_event.is_set():
-                    self.logger.error(f"屏幕捕获/发送错误: {e}")
-                break
+                # 连接断开时循环条件会结束线程，其它错误只影响这一次更新
+                if self.connected and not self.exit_event.is_set():
+                    self.logger.error(f"发送指针消息时出错: {e}")
+            self.exit_event.wait(self.cursor_interval)
 
     def handle_input_events(self):
         """处理输入事件"""
+        decoder = MessageDecoder()
         while self.running and self.connected and not self.exit_event.is_set():
             try:
                 event_data = self.client_socket.recv(self.buffer_size)
                 if not event_data:
                     self.logger.info("客户端断开连接")
                     break
-                event = pickle.loads(event_data)
-                handle_input(event)
+                for msg_type, payload in decoder.feed(event_data):
+                    self.handle_message(msg_type, payload, self.client_state)
             except Exception as e:
                 if not self.exit_event.is_set():
                     self.logger.error(f"输入处理错误: {e}")
                 break
+        # 画面静止时不发送帧，发送线程可能迟迟发现不了断开，由这里通知其它线程结束
+        self.connected = False
+        self.disconnected.set()
+
+    def handle_message(self, msg_type: int, payload: bytes, state: ClientState):
+        """处理客户端发来的一条消息"""
+        if self.recorder:
+            self.recorder.record(msg_type, payload)
+        if msg_type == MSG_INPUT:
+            start_time = time.perf_counter()
+            events = decode_inputs(payload)
+            handle_inputs(events, state.screen, self._input_region(state))
+            self.input_apply.record(time.perf_counter() - start_time)
+            self.input_rate.add(len(events))
+            # 输入通常马上引起画面变化
+            self._wake_capture()
+        elif msg_type == MSG_CONTROL:
+            message = decode_control(payload)
+            state.update(message)
+            if 'roi' in message or 'viewport' in message:
+                self._wake_capture()
+            if 'quality' in message:
+                self.quality = max(1, min(100, int(message['quality'])))
+                self.logger.info(f"客户端调整图像质量: {self.quality}")
+            if state.keyframe_requested and self._pipelines():
+                state.keyframe_requested = False
+                self._request_keyframes()
+            if 'lost' in message and self.datagrams:
+                self._resend_lost(message['lost'])
+            if 'feedback' in message and self.bitrate:
+                self._apply_feedback(message['feedback'])
+        else:
+            self.logger.warning(f"未知的消息类型: {msg_type}")
+
+    def _wake_capture(self):
+        """画面静止而放慢捕获的画面流恢复全速捕获"""
+        for pipeline in self._pipelines().values():
+            pipeline.wake()
+
+    def _request_keyframes(self):
+        """让所有画面流的下一帧成为关键帧"""
+        for pipeline in self._pipelines().values():
+            pipeline.request_keyframe()
+
+    def _resend_lost(self, seqs: List[int]):
+        """客户端报告丢失的数据报：其中的分块在下一帧发送最新内容（而不是重传旧内容）"""
+        positions, expired = self.datagrams.lost(seqs)
+        pipelines = self._pipelines()
+        for stream, tiles in positions.items():
+            pipeline = pipelines.get(stream)
+            if pipeline:
+                pipeline.invalidate(tiles)
+        if expired:
+            # 已不在历史中，不知道丢失了哪些分块
+            self._request_keyframes()
+        self.logger.debug(f"客户端报告丢失数据报 {len(seqs)} 个，过期 {expired} 个")
+
+    def _input_region(self, state: ClientState) -> Optional[Tuple[int, int, int, int]]:
+        """客户端屏幕对应的服务器屏幕区域：订阅了显示器时为输入显示器，否则为查看区域（None 为整个屏幕）"""
+        if state.monitors:
+            monitor_id = state.input_monitor if state.input_monitor in state.monitors else next(iter(state.monitors))
+            monitor = self.monitors.get(monitor_id)
+            if monitor:
+                return monitor['x'], monitor['y'], monitor['width'], monitor['height']
+        return state.roi
+
+    def _apply_feedback(self, feedback: dict):
+        """根据客户端反馈调整码率"""
+        send_time = self.metrics.histogram('send').recent
+        if self.bitrate.update(feedback, send_time, self.recent_frame_bytes):
+            for stream, pipeline in self._pipelines().items():
+                pipeline.interval = self._stream_interval(self.stream_intervals.get(stream, self.screen_capture_interval))
+
+    def _handshake(self):
+        """与新连接的客户端协商编解码器和初始图像质量，并交换屏幕几何信息"""
+        hello = recv_json(self.client_socket)
+        codec_name = negotiate_codec(hello.get('codecs', []))
+        self.codec = create_codec(codec_name, self.compression_level)
+        self.quality = max(1, min(100, int(hello.get('quality', self.quality))))
+        self.client_state = ClientState()
+        self.client_state.update(hello)
+        if self.adaptive_bitrate:
+            self.bitrate = BitrateController(self.screen_capture_interval, self.quality, self.target_latency)
+        monitors = list_monitors()
+        self.monitors = {monitor['id']: monitor for monitor in monitors}
+        reply = {'codec': codec_name, 'screen': get_screen_resolution(), 'monitors': monitors}
+        if self.udp and hello.get('udp'):
+            # 客户端登记地址后再发送，登记时请求关键帧
+            self.datagrams = DatagramSender(self.host, secrets.randbits(32), on_register=self._request_keyframes)
+            reply['udp'] = {'port': self.datagrams.port, 'token': self.datagrams.token}
+            self.logger.info(f"帧分块通过 UDP 端口 {self.datagrams.port} 发送")
+        resumed = self._resume_session(hello.get('resume'))
+        if self.session:
+            reply['session'] = self.session.token
+            reply['resumed'] = {str(stream): seq for stream, seq in resumed.items()}
+        send_json(self.client_socket, reply)
+        self.logger.info(f"协商编解码器: {codec_name}, 图像质量: {self.quality}, 显示器: {len(monitors)} 个")
+
+    def _resume_session(self, resume: Optional[dict]) -> Dict[int, int]:
+        """
+        客户端带着有效的会话令牌重连时恢复之前的画面流状态，否则开始新的会话
+
+        帧序号不在帧消息中传输：TCP 按序可靠送达，服务器按发送顺序、客户端按接收顺序分别为每个画面流的帧计数，
+        两端的序号一致。数据报传输的帧可能丢失，这时不恢复（客户端登记时会收到关键帧）。
+
+        Returns:
+            恢复的画面流编号 -> 两端继续编号的起点（客户端最后合并的帧序号）
+        """
+        self._resumed = {}
+        session = self.session
+        if (resume and session and session.resumable(resume.get('session'))
+                and self.delta_encoding and self.datagrams is None):
+            frames = {int(stream): int(seq) for stream, seq in (resume.get('frames') or {}).items()}
+            restored = session.resume(frames)
+            self._resumed = {stream: differ for stream, (differ, _) in restored.items()}
+            incremental = [stream for stream, (_, ok) in restored.items() if ok]
+            self.logger.info(f"恢复会话: 画面流 {sorted(restored)}，其中 {sorted(incremental)} 只补发断线期间变化的分块")
+            return {stream: frames[stream] for stream in restored}
+        if resume:
+            self.logger.info("会话已过期或不存在，重新发送完整画面")
+        # 保留中的旧会话到此结束
+        self._close_recorder()
+        self.session = Session() if self.resume_timeout > 0 else None
+        return {}
+
+    def _expire_session(self):
+        """丢弃超过保留时间的会话（参考帧占用的内存随之释放）"""
+        if self.session and self.session.expires and time.monotonic() >= self.session.expires:
+            self.logger.info("会话保留超时，丢弃画面流状态")
+            self.session = None
+            self._close_recorder()
+
+    def _open_recorder(self, name: str, info: dict):
+        """开始录制一个会话，info 作为第一条控制记录写入，便于审计"""
+        if not self.record_dir:
+            return
+        os.makedirs(self.record_dir, exist_ok=True)
+        path = os.path.join(self.record_dir, f"session-{time.strftime('%Y%m%d-%H%M%S')}-{name}.rds")
+        self.recorder = SessionRecorder(path)
+        self.recorder.record(MSG_CONTROL, json.dumps({'session': info}).encode('utf-8'))
+        self.logger.info(f"开始录制会话: {path}")
+
+    def _close_recorder(self):
+        """写完剩余记录并关闭会话文件"""
+        recorder, self.recorder = self.recorder, None
+        if recorder:
+            recorder.close()
+            self.logger.info(f"会话录制结束: {recorder.path}，记录 {recorder.records} 条，"
+                             f"关键帧 {recorder.keyframes} 个，丢弃 {recorder.dropped} 条")
 
     def _print_stats(self):
         """打印统计信息"""
-        if self.start_time:
-            duration = time.time() - self.start_time
-            fps = self.frames_sent / duration if duration > 0 else 0
-            bandwidth = self.bytes_sent / duration / 1024 / 1024 if duration > 0 else 0
-            self.logger.info(f"状态: FPS={fps:.2f}, 带宽={bandwidth:.2f} MB/s")
+        if not self.start_time:
+            return
+        rates = self.frame_rate.rates()
+        frame_bytes = self.frame_bytes.snapshot()
+        self.logger.info(f"状态: FPS={rates['per_sec']:.2f}, 带宽={rates['amount_per_sec']/1024/1024:.2f} MB/s"
+                         f"（最近 {self.frame_rate.window} 秒）, 每帧 {frame_bytes['avg_bytes']/1024:.1f} KB")
+        stages = []
+        for name in ('capture', 'encode', 'send', 'input_apply'):
+            histogram = self.metrics.histograms.get(name)
+            if histogram and histogram.count:
+                stats = histogram.snapshot()
+                stages.append(f"{name}={stats['p50_ms']:.1f}/{stats['p99_ms']:.1f}ms")
+        if stages:
+            self.logger.info(f"阶段耗时 p50/p99: {', '.join(stages)}")
+        for stream, pipeline in self._pipelines().items():
+            name = f"显示器 {stream} " if stream else ""
+            stats = pipeline.stats()
+            idle = f", 静止帧={stats['unchanged']}, 捕获间隔={stats['interval']:.2f}s" if 'unchanged' in stats else ""
+            self.logger.info(f"{name}丢帧={stats['dropped']}{idle}")
+        if self.publisher:
+            state = '暂停（没有读取端）' if self.publisher.paused else '运行中'
+            self.logger.info(f"共享内存帧环: {state}，已写入 {self.publisher.frames_published} 帧")
 
     def start(self):
         """启动服务器"""
@@ -181,14 +726,11 @@ class RemoteDesktopServer:
             self.server_socket.listen(self.max_connections)
             
             self.logger.info(f"服务器正在监听 {self.host}:{self.port}...")
-            self.logger.info("按 'q' 键可以优雅退出")
-            
-            # 启动键盘监听线程
-            keyboard_thread = threading.Thread(target=self._keyboard_listener)
-            keyboard_thread.daemon = True
-            keyboard_thread.start()
             
             self.running = True
+            self._start_keyboard_listener()
+            self._start_metrics_server()
+            self._start_publisher()
             self.start_time = time.time()
             
             while self.running and not self.exit_event.is_set():
@@ -196,7 +738,29 @@ class RemoteDesktopServer:
                     self.server_socket.settimeout(1.0)  # 设置超时，以便能够检查exit_event
                     self.client_socket, addr = self.server_socket.accept()
                     self.connected = True
+                    self.disconnected.clear()
                     self.logger.info(f"新客户端连接: {addr}")
+                    enable_keepalive(self.client_socket)
+                    try:
+                        # 握手期间客户端断开（例如重连超时后放弃）只影响这个连接
+                        self.client_socket.settimeout(10.0)
+                        self._handshake()
+                        self.client_socket.settimeout(None)
+                        if self.session:
+                            # 连接期间会话不会过期
+                            self.session.expires = 0.0
+                    except (OSError, ValueError) as e:
+                        self.logger.warning(f"与客户端 {addr} 握手失败: {e}")
+                        continue
+                    # 恢复的会话继续写入原来的会话文件
+                    if self.recorder is None:
+                        self._open_recorder(str(addr[1]), {
+                            'client': f"{addr[0]}:{addr[1]}",
+                            'codec': self.codec.name,
+                            'screen': get_screen_resolution(),
+                            'client_screen': self.client_state.screen,
+                            'monitors': list(self.monitors.values()),
+                        })
                     
                     # 启动线程
                     self.screen_thread = threading.Thread(target=self.handle_screen_capture)
@@ -207,12 +771,19 @@ class RemoteDesktopServer:
                     
                     self.screen_thread.start()
                     self.input_thread.start()
+                    if self.cursor_interval and self.client_state.cursor:
+                        self.cursor_thread = threading.Thread(target=self.handle_cursor, daemon=True)
+                        self.cursor_thread.start()
                     
                     # 等待线程结束
                     self.screen_thread.join()
                     self.input_thread.join()
+                    if self.cursor_thread:
+                        self.cursor_thread.join()
+                        self.cursor_thread = None
                     
                 except socket.timeout:
+                    self._expire_session()
                     continue
                 except socket.error as e:
                     if self.running and not self.exit_event.is_set():
@@ -220,6 +791,11 @@ class RemoteDesktopServer:
                     break
                 finally:
                     self.connected = False
+                    if not (self.session and self.session.expires):
+                        self._close_recorder()
+                    if self.datagrams:
+                        self.datagrams.close()
+                        self.datagrams = None
                     if self.client_socket:
                         try:
                             self.client_socket.close()
@@ -232,11 +808,35 @@ class RemoteDesktopServer:
         finally:
             self.stop()
 
+    def _start_metrics_server(self):
+        """启动本地 HTTP 统计端点"""
+        if self.metrics_port is None:
+            return
+        self.metrics_server = MetricsServer(self.metrics, self.metrics_port).start()
+        self.logger.info(f"统计信息: http://127.0.0.1:{self.metrics_server.port}/metrics")
+
+    def _start_publisher(self):
+        """启动本机共享内存发布线程"""
+        if not self.shared_memory:
+            return
+        self.publisher = SharedMemoryPublisher(self.shared_memory, self.screen_capture_interval,
+                                               metrics=self.metrics).start()
+        self.logger.info(f"本机共享内存帧环: {self.shared_memory}")
+
+    def _start_keyboard_listener(self):
+        """启动键盘监听线程"""
+        if not self.exit_key:
+            return
+        self.logger.info(f"按 '{self.exit_key}' 键可以优雅退出")
+        keyboard_thread = threading.Thread(target=self._keyboard_listener)
+        keyboard_thread.daemon = True
+        keyboard_thread.start()
+
     def _keyboard_listener(self):
         """监听键盘输入"""
         while self.running and not self.exit_event.is_set():
-            if keyboard.is_pressed('q'):
-                self.logger.info("检测到'q'键按下，正在关闭服务器...")
+            if keyboard.is_pressed(self.exit_key):
+                self.logger.info(f"检测到'{self.exit_key}'键按下，正在关闭服务器...")
                 self.exit_event.set()
                 break
             time.sleep(0.1)
@@ -1,85 +1,179 @@
-from mss import mss
-import numpy as np
 from pynput.mouse import Button, Controller as MouseController
 from pynput.keyboard import Controller as KeyboardController, Key
 import pyautogui
-from PIL import ImageGrab
-from typing import Tuple, Dict, Any
+from typing import Tuple, Dict, Any, List, Optional
 import logging
+import time
+from .display import DisplayGeometry
+from .capture import CaptureBackend, create_capture_backend
+from common.logs import EventSampler
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler('remote_desktop_server_input.log')
-    ]
-)
+# 日志由服务器通过 common.logs.setup_logging 配置，输入相关日志另外写入 INPUT_LOG_FILE
+INPUT_LOG_FILE = 'remote_desktop_server_input.log'
 logger = logging.getLogger(__name__)
 
+# 输入事件按类型计数，定期汇总为一行日志；逐个事件的跟踪只在调试级别输出
+input_events = EventSampler(logger, "输入事件统计")
+
 # 初始化输入控制器
 mouse = MouseController()
 keyboard = KeyboardController()
 
+# pyautogui 默认在每次调用后暂停 0.1 秒，远程输入由客户端控制节奏，不需要额外延迟
+pyautogui.PAUSE = 0
+
+# 屏幕分辨率只查询一次，捕获到的画面尺寸变化时才刷新
+screen_geometry = DisplayGeometry(pyautogui.size)
+
 def get_screen_resolution() -> Tuple[int, int]:
-    """获取屏幕分辨率"""
-    width, height = pyautogui.size()
-    return width, height
-
-def capture_screen() -> Dict[str, Any]:
-    """捕获屏幕并返回图像数据和分辨率信息"""
-    screenshot = ImageGrab.grab()
-    frame = np.array(screenshot)
+    """获取屏幕分辨率（缓存）"""
+    return screen_geometry.resolution
+
+# 屏幕捕获后端，首次捕获时按默认配置创建
+capture_backend: Optional[CaptureBackend] = None
+
+def set_capture_backend(backend: CaptureBackend) -> None:
+    """设置屏幕捕获后端"""
+    global capture_backend
+    if capture_backend is not None and capture_backend is not backend:
+        capture_backend.close()
+    capture_backend = backend
+
+def _get_capture_backend() -> CaptureBackend:
+    if capture_backend is None:
+        set_capture_backend(create_capture_backend())
+    return capture_backend
+
+def list_monitors() -> List[Dict[str, Any]]:
+    """
+    枚举显示器，每个显示器一项 {'id', 'x', 'y', 'width', 'height', 'primary'}，坐标为屏幕坐标
+
+    捕获后端不支持枚举时，整个屏幕作为编号 1 的唯一显示器
+    """
+    monitors = _get_capture_backend().monitors()
+    if not monitors:
+        width, height = get_screen_resolution()
+        monitors = [{'id': 1, 'x': 0, 'y': 0, 'width': width, 'height': height, 'primary': True}]
+    return monitors
+
+def capture_monitor(monitor: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    捕获单个显示器（list_monitors() 返回的一项），分辨率为该显示器的大小
+
+    捕获后端不支持枚举显示器时捕获整个屏幕
+    """
+    backend = _get_capture_backend()
+    if not backend.monitors():
+        return capture_screen()
+    timestamp = time.time()
+    frame = backend.grab_monitor(monitor)
+    return {
+        'image': frame,
+        'resolution': (monitor['width'], monitor['height']),
+        'timestamp': timestamp
+    }
+
+def capture_screen(region: Optional[Tuple[int, int, int, int]] = None, stream: Any = 0) -> Dict[str, Any]:
+    """
+    捕获屏幕并返回图像数据和分辨率信息
+
+    mss 和 fake 后端的图像位于轮换使用的缓冲区中，不会为每帧分配新的数组（mss 自身仍会为
+    原始数据分配一次）；imagegrab 后端每帧返回新的数组
+
+    Args:
+        region: 只捕获屏幕坐标下的区域 (x, y, 宽, 高)，为 None 时捕获整个屏幕
+        stream: 捕获缓冲区所属的画面流，同时捕获屏幕的不同使用方各用一个
+    """
+    _get_capture_backend()
+    timestamp = time.time()
+    # 显示器变化只能通过完整画面的尺寸检测，只捕获区域时也定期捕获一次完整画面
+    frame_region = None
+    if region and not screen_geometry.probe_due():
+        frame_region = screen_geometry.to_frame_region(region)
+    if frame_region is None:
+        frame = capture_backend.grab(stream=stream)
+        screen_geometry.observe_frame(frame.shape)
+        if region:
+            frame_region = screen_geometry.to_frame_region(region)
+            x, y, width, height = frame_region
+            frame = frame[y:y + height, x:x + width]
+    else:
+        # 区域画面使用单独的缓冲区，避免与定期的完整画面交替导致缓冲区反复重新分配
+        frame = capture_backend.grab(frame_region, (stream, 'region'))
     width, height = get_screen_resolution()
     return {
         'image': frame,
-        'resolution': (width, height)
+        'resolution': (width, height),
+        'timestamp': timestamp
     }
 
-# 处理输入事件
-def handle_input(event: Dict[str, Any]) -> None:
-    """处理输入事件"""
-    try:
-        if event['type'] == 'mouse':
-            screen_width, screen_height = get_screen_resolution()
-            client_x = event.get('x', 0)
-            client_y = event.get('y', 0)
-            client_width = event.get('screen_width', screen_width)
-            client_height = event.get('screen_height', screen_height)
-
-            # 计算实际坐标
-            x = int((client_x * screen_width) / client_width)
-            y = int((client_y * screen_height) / client_height)
-
-            if event['action'] == 'move':
-                logger.info(f"收到鼠标移动事件，目标坐标: ({x}, {y})")
-                pyautogui.moveTo(x, y)
-                logger.info(f"鼠标已移动到坐标: ({x}, {y})")
-            elif event['action'] in ['press', 'release']:
-                button = event['button'].lower()
-                action_str = '按下' if event['action'] == 'press' else '释放'
-                logger.info(f"收到鼠标 {action_str} 事件，按钮: {button}，坐标: ({x}, {y})")
-                if event['action'] == 'press':
-                    pyautogui.mouseDown(x, y, button=button)
-                else:
-                    pyautogui.mouseUp(x, y, button=button)
-                logger.info(f"鼠标 {action_str} 事件处理完成，按钮: {button}，坐标: ({x}, {y})")
-            elif event['action'] == 'scroll':
-                dy = event.get('dy', 0)
-                logger.info(f"收到鼠标滚动事件，滚动值: {dy}")
-                pyautogui.scroll(dy)
-                logger.info(f"鼠标滚动事件处理完成，滚动值: {dy}")
-
-        elif event['type'] == 'keyboard':
-            key = event['key'].strip("'")
-            action_str = '按下' if event['action'] == 'press' else '释放'
-            logger.info(f"收到键盘 {action_str} 事件，键: {key}")
+def _scale_position(event: Dict[str, Any], client_screen: Optional[Tuple[int, int]],
+                    region: Optional[Tuple[int, int, int, int]] = None) -> Tuple[int, int]:
+    """将客户端坐标换算为服务器屏幕坐标，客户端屏幕对应服务器上的 region（默认为整个屏幕）"""
+    screen_width, screen_height = get_screen_resolution()
+    left, top, width, height = region or (0, 0, screen_width, screen_height)
+    client_width, client_height = client_screen or (screen_width, screen_height)
+    x = left + int((event.get('x', 0) * width) / client_width)
+    y = top + int((event.get('y', 0) * height) / client_height)
+    return x, y
+
+def apply_input(event: Dict[str, Any], client_screen: Optional[Tuple[int, int]] = None,
+                region: Optional[Tuple[int, int, int, int]] = None) -> None:
+    """
+    执行输入事件（不记录日志，用于热路径）
+
+    Args:
+        event: 输入事件
+        client_screen: 客户端屏幕分辨率，在连接握手时获得；为 None 时按服务器分辨率处理
+        region: 客户端正在查看的区域（屏幕坐标），为 None 时为整个屏幕
+    """
+    if event['type'] == 'mouse':
+        if event['action'] == 'move':
+            pyautogui.moveTo(*_scale_position(event, client_screen, region))
+        elif event['action'] in ['press', 'release']:
+            x, y = _scale_position(event, client_screen, region)
+            button = event['button'].lower()
             if event['action'] == 'press':
-                pyautogui.keyDown(key)
+                pyautogui.mouseDown(x, y, button=button)
             else:
-                pyautogui.keyUp(key)
-            logger.info(f"键盘 {action_str} 事件处理完成，键: {key}")
+                pyautogui.mouseUp(x, y, button=button)
+        elif event['action'] == 'scroll':
+            pyautogui.scroll(event.get('dy', 0))
+
+    elif event['type'] == 'keyboard':
+        key = event['key'].strip("'")
+        if event['action'] == 'press':
+            pyautogui.keyDown(key)
+        else:
+            pyautogui.keyUp(key)
 
+# 处理输入事件
+def handle_input(event: Dict[str, Any], client_screen: Optional[Tuple[int, int]] = None) -> None:
+    """处理输入事件"""
+    try:
+        input_events.trace("收到输入事件: %s", event)
+        apply_input(event, client_screen)
+        input_events.count(f"{event['type']}.{event['action']}")
     except Exception as e:
-        logger.error(f"处理输入事件时出错: {e}")
\ No newline at end of file
+        logger.error(f"处理输入事件时出错: {e}")
+
+def handle_inputs(events: List[Dict[str, Any]], client_screen: Optional[Tuple[int, int]] = None,
+                  region: Optional[Tuple[int, int, int, int]] = None) -> None:
+    """批量处理输入事件：连续的鼠标移动只执行最后一个；事件只计数，逐个跟踪仅在调试级别输出"""
+    applied = 0
+    merged = 0
+    for index, event in enumerate(events):
+        if (event['type'] == 'mouse' and event['action'] == 'move' and index + 1 < len(events)
+                and events[index + 1]['type'] == 'mouse' and events[index + 1]['action'] == 'move'):
+            merged += 1
+            continue
+        try:
+            input_events.trace("收到输入事件: %s", event)
+            apply_input(event, client_screen, region)
+            input_events.count(f"{event['type']}.{event['action']}")
+            applied += 1
+        except Exception as e:
+            logger.error(f"处理输入事件时出错: {e}, 事件: {event}")
+    if merged:
+        input_events.count('mouse.move(合并)', merged)
+    input_events.trace("处理输入批次: 收到 %d 个事件，执行 %d 个", len(events), applied)